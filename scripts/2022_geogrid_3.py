@@ -9,9 +9,13 @@ from branca.colormap import LinearColormap
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 
+from stage_trace import stage
+
 # Load the processed data and county shapefile
-gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
-county_gdf = gpd.read_file('../Base_Map/tl_2024_us_county.shp')
+with stage('read_gpkg') as s:
+    gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+    county_gdf = gpd.read_file('../Base_Map/tl_2024_us_county.shp')
+    s.rows = len(gdf)
 
 # Filter for LA County and 2022 Part I offenses
 gdf['Year'] = gdf['DATE OCC'].dt.year
@@ -26,10 +30,11 @@ def create_hex_grid(lat, lon):
         print(f"Error: {e}")
         return None
 
-gdf_2022['h3_index'] = gdf_2022.apply(
-    lambda row: create_hex_grid(row.geometry.y, row.geometry.x), 
-    axis=1
-)
+with stage('h3_index', rows=len(gdf_2022)):
+    gdf_2022['h3_index'] = gdf_2022.apply(
+        lambda row: create_hex_grid(row.geometry.y, row.geometry.x), 
+        axis=1
+    )
 
 # Count crimes per hexagon
 hex_counts = gdf_2022.groupby('h3_index').size().reset_index(name='count')
@@ -40,11 +45,13 @@ def h3_to_polygon(h3_index):
     return Polygon(coords)
 
 hex_counts = hex_counts.copy()
-hex_counts['geometry'] = hex_counts['h3_index'].apply(h3_to_polygon)
+with stage('hex_polygons', rows=len(hex_counts)):
+    hex_counts['geometry'] = hex_counts['h3_index'].apply(h3_to_polygon)
 hex_gdf = gpd.GeoDataFrame(hex_counts, geometry='geometry', crs='EPSG:4269')
 
 # Clip hexagons to LA County boundary
-hex_gdf = gpd.overlay(hex_gdf, la_county, how='intersection')
+with stage('overlay', rows=len(hex_gdf)):
+    hex_gdf = gpd.overlay(hex_gdf, la_county, how='intersection')
 
 # Create map
 m = folium.Map(
@@ -112,7 +119,8 @@ title_html = '''
 m.get_root().html.add_child(folium.Element(title_html))
 
 # Save map
-m.save('../maps/la_part1_offenses_2022_with_county.html')
+with stage('save_map'):
+    m.save('../maps/la_part1_offenses_2022_with_county.html')
 
 print("Bins used:", bins)
 print("Color scheme:", colors)
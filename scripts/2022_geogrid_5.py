@@ -7,8 +7,12 @@ import numpy as np
 import json
 from branca.colormap import LinearColormap
 
+from stage_trace import stage
+
 # Load the processed data
-gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+with stage('read_gpkg') as s:
+    gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+    s.rows = len(gdf)
 
 # Filter for 2022 and Part I offenses
 gdf['Year'] = gdf['DATE OCC'].dt.year
@@ -30,10 +34,11 @@ def create_hex_grid(lat, lon):
         print(f"Error: {e}")
         return None
 
-gdf_2022['h3_index'] = gdf_2022.apply(
-    lambda row: create_hex_grid(row.geometry.y, row.geometry.x), 
-    axis=1
-)
+with stage('h3_index', rows=len(gdf_2022)):
+    gdf_2022['h3_index'] = gdf_2022.apply(
+        lambda row: create_hex_grid(row.geometry.y, row.geometry.x), 
+        axis=1
+    )
 
 # Count crimes per hexagon
 hex_counts = gdf_2022.groupby('h3_index').size().reset_index(name='count')
@@ -46,7 +51,8 @@ def h3_to_polygon(h3_index):
     return Polygon(coords)
 
 hex_counts = hex_counts.copy()
-hex_counts['geometry'] = hex_counts['h3_index'].apply(h3_to_polygon)
+with stage('hex_polygons', rows=len(hex_counts)):
+    hex_counts['geometry'] = hex_counts['h3_index'].apply(h3_to_polygon)
 hex_gdf = gpd.GeoDataFrame(hex_counts, geometry='geometry', crs='EPSG:4326')
 
 # Create map
@@ -105,7 +111,8 @@ title_html = '''
 m.get_root().html.add_child(folium.Element(title_html))
 
 # Save map
-m.save('../maps/la_all_offenses_2022_5sq.html')
+with stage('save_map'):
+    m.save('../maps/la_all_offenses_2022_5sq.html')
 
 print("Bins used:", bins)
 print("Color scheme:", colors)
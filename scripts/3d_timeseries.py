@@ -1,22 +1,35 @@
 import geopandas as gpd
 import pandas as pd
 import pydeck as pdk
-import numpy as np
 import os
+import argparse
+from hex_layers import aggregated_layer, cell_counts, cell_layer
+from deck_html import save_deck, year_slider_html
+from stage_trace import stage
+
+parser = argparse.ArgumentParser(description='3D time series map of LA offenses')
+parser.add_argument('--aggregate', choices=['browser', 'h3', 'hex'], default='browser',
+                    help="'browser' embeds sampled incidents for HexagonLayer; 'h3' or 'hex' pre-aggregate "
+                         "the full data to per-cell counts in Python")
+parser.add_argument('--full', action='store_true',
+                    help='production mode: all incidents, one pre-aggregated layer per year and a year slider '
+                         '(uses h3 unless --aggregate hex is given)')
+parser.add_argument('--labels-per-year', type=int, default=10,
+                    help='number of busiest Part I cells labelled per year in --full mode')
+args = parser.parse_args()
 
 # Set your Mapbox API key
 MAPBOX_API_KEY = "<Your_MapBox_Api_Key>"
 os.environ['MAPBOX_ACCESS_TOKEN'] = MAPBOX_API_KEY
 
 # Load the data
-gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
-county_gdf = gpd.read_file('../Base_Map/tl_2024_us_county.shp')
-
-# Sample a subset of data for testing
-gdf = gdf.sample(n=10000, random_state=42)
+with stage('read_gpkg') as s:
+    gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+    s.rows = len(gdf)
 
-# Filter for LA County and prepare data
-la_county = county_gdf[county_gdf['COUNTYNS'] == '00277283']
+# Sample a subset of data for testing; pre-aggregated layers can use it all
+if args.aggregate == 'browser' and not args.full:
+    gdf = gdf.sample(n=10000, random_state=42)
 
 # Create DataFrame with coordinates and counts
 df = pd.DataFrame({
@@ -33,58 +46,143 @@ part1_df = df[df['offense_type'] == 1]
 print("Year distribution in part1_df:")
 print(part1_df['year'].value_counts().sort_index())
 
-# Aggregate data by year and location for text labels
-year_aggregates = part1_df.groupby(['year', 'latitude', 'longitude']).size().reset_index(name='count')
-
-print("\nYear aggregates sample:")
-print(year_aggregates.head())
-print("\nYear aggregates columns:", year_aggregates.columns)
-print("\nTotal aggregated records:", len(year_aggregates))
-
-# Create text layer for years
-text_layer = pdk.Layer(
-    'TextLayer',
-    data=year_aggregates,
-    get_position=['longitude', 'latitude'],
-    get_text='year',
-    get_size=32,  # Increased size
-    get_color=[255, 255, 255],  # White color
-    get_angle=0,
-    pickable=True,
-    get_alignment_baseline="bottom"  # Try to align text better
-)
-# Modify hexagon layers
-total_hex_layer = pdk.Layer(
-    'HexagonLayer',
-    data=df,
-    get_position=['longitude', 'latitude'],
-    radius=200,
-    elevation_scale=50,
-    elevation_range=[0, 1000],
-    pickable=True,
-    extruded=True,
-    coverage=1,
-    aggregation='sum',
-    get_elevation='count',
-    get_year='year'  # Add year to aggregation
-)
+if args.full:
+    method = 'h3' if args.aggregate == 'browser' else args.aggregate
 
-part1_hex_layer = pdk.Layer(
-    'HexagonLayer',
-    data=part1_df,
-    get_position=['longitude', 'latitude'],
-    radius=200,
-    elevation_scale=50,
-    elevation_range=[0, 1000],
-    pickable=True,
-    extruded=True,
-    coverage=1,
-    color_range=[[255,237,160], [240,59,32]],
-    aggregation='sum',
-    get_elevation='count',
-    get_year='year',  # Add year to aggregation
-    get_tooltip=['year', 'count']  # Add year to tooltip
-)
+    # Pre-aggregate counts by year x cell in one pass per offense class
+    with stage('aggregate_cells', rows=len(df) + len(part1_df)):
+        total_cells = cell_counts(df, method, radius_m=200, by={'year': df['year']})
+        part1_cells = cell_counts(part1_df, method, radius_m=200, by={'year': part1_df['year']})
+    years = sorted(total_cells['year'].unique())
+
+    print("\nCells per year:")
+    print(total_cells.groupby('year').size())
+    print("\nTotal aggregated records:", len(total_cells) + len(part1_cells))
+
+    # Shared count domains keep heights and colors comparable across years
+    total_domain = (total_cells['count'].min(), total_cells['count'].max())
+    part1_domain = (part1_cells['count'].min(), part1_cells['count'].max())
+
+    # One compact layer per year; only the latest year is visible initially,
+    # the slider switches layers by their "-<year>" id suffix
+    layers = []
+    for year in years:
+        visible = bool(year == years[-1])
+        layers.append(cell_layer(
+            total_cells[total_cells['year'] == year],
+            method,
+            radius_m=200,
+            elevation_scale=50,
+            domain=total_domain,
+            id=f'total-{year}',
+            visible=visible
+        ))
+        layers.append(cell_layer(
+            part1_cells[part1_cells['year'] == year],
+            method,
+            radius_m=200,
+            elevation_scale=50,
+            color_range=[[255,237,160], [240,59,32]],
+            domain=part1_domain,
+            id=f'part1-{year}',
+            visible=visible
+        ))
+
+        # Label the busiest Part I cells of the year at their cell centers
+        labels = part1_cells[part1_cells['year'] == year].nlargest(args.labels_per_year, 'count')
+        layers.append(pdk.Layer(
+            'TextLayer',
+            data=labels[['latitude', 'longitude', 'year', 'count']],
+            id=f'labels-{year}',
+            visible=visible,
+            get_position=['longitude', 'latitude'],
+            get_text='count',
+            get_size=16,
+            get_color=[255, 255, 255],
+            get_angle=0,
+            pickable=True,
+            get_alignment_baseline="bottom"
+        ))
+
+    tooltip_html = '<b>Year:</b> {year}<br><b>Count:</b> {count}'
+    output_file = '../maps/la_offenses_3d_timeseries_full.html'
+    extra_html = year_slider_html(years)
+else:
+    # Aggregate data by year and location for text labels
+    if args.aggregate == 'browser':
+        year_aggregates = part1_df.groupby(['year', 'latitude', 'longitude']).size().reset_index(name='count')
+    else:
+        # One label per year and cell, placed at the cell center
+        with stage('aggregate_cells', rows=len(part1_df)):
+            year_aggregates = cell_counts(part1_df, args.aggregate, radius_m=200, by={'year': part1_df['year']})
+
+    print("\nYear aggregates sample:")
+    print(year_aggregates.head())
+    print("\nYear aggregates columns:", year_aggregates.columns)
+    print("\nTotal aggregated records:", len(year_aggregates))
+
+    # Create text layer for years
+    text_layer = pdk.Layer(
+        'TextLayer',
+        data=year_aggregates,
+        get_position=['longitude', 'latitude'],
+        get_text='year',
+        get_size=32,  # Increased size
+        get_color=[255, 255, 255],  # White color
+        get_angle=0,
+        pickable=True,
+        get_alignment_baseline="bottom"  # Try to align text better
+    )
+    # Modify hexagon layers
+    if args.aggregate == 'browser':
+        total_hex_layer = pdk.Layer(
+            'HexagonLayer',
+            data=df,
+            get_position=['longitude', 'latitude'],
+            radius=200,
+            elevation_scale=50,
+            elevation_range=[0, 1000],
+            pickable=True,
+            extruded=True,
+            coverage=1,
+            aggregation='sum',
+            get_elevation='count',
+            get_year='year'  # Add year to aggregation
+        )
+
+        part1_hex_layer = pdk.Layer(
+            'HexagonLayer',
+            data=part1_df,
+            get_position=['longitude', 'latitude'],
+            radius=200,
+            elevation_scale=50,
+            elevation_range=[0, 1000],
+            pickable=True,
+            extruded=True,
+            coverage=1,
+            color_range=[[255,237,160], [240,59,32]],
+            aggregation='sum',
+            get_elevation='count',
+            get_year='year',  # Add year to aggregation
+            get_tooltip=['year', 'count']  # Add year to tooltip
+        )
+        tooltip_html = '<b>Count:</b> {elevationValue}'
+    else:
+        # Only per-cell counts are written to the HTML
+        with stage('aggregate_cells', rows=len(df) + len(part1_df)):
+            total_hex_layer = aggregated_layer(df, args.aggregate, radius_m=200, elevation_scale=50)
+            part1_hex_layer = aggregated_layer(
+                part1_df,
+                args.aggregate,
+                radius_m=200,
+                elevation_scale=50,
+                color_range=[[255,237,160], [240,59,32]]
+            )
+        tooltip_html = '<b>Count:</b> {count}'
+
+    layers = [total_hex_layer, part1_hex_layer, text_layer]
+    output_file = '../maps/la_offenses_3d_timeseries.html'
+    extra_html = ''
 
 # Create view state
 view_state = pdk.ViewState(
@@ -99,15 +197,13 @@ view_state = pdk.ViewState(
 
 # Create deck with all layers
 r = pdk.Deck(
-    layers=[total_hex_layer, part1_hex_layer, text_layer],
+    layers=layers,
     initial_view_state=view_state,
     map_provider='mapbox',
     map_style='mapbox://styles/mapbox/streets-v11',
     api_keys={'mapbox': MAPBOX_API_KEY},
     tooltip={
-        'html': '''
-            <b>Count:</b> {elevationValue}
-        ''',
+        'html': tooltip_html,
         'style': {
             'backgroundColor': 'steelblue',
             'color': 'white'
@@ -116,4 +212,5 @@ r = pdk.Deck(
 )
 
 # Save visualization
-r.to_html('../maps/la_offenses_3d_timeseries.html')
\ No newline at end of file
+with stage('save_deck'):
+    save_deck(r, output_file, extra_html)
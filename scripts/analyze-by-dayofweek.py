@@ -1,30 +1,34 @@
 import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
-import seaborn as sns
+
+from stage_trace import stage
 
 # Load the processed GeoPackage file
-gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
-
-# Create a mapping of numeric values to day names
-day_map = {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday', 4: 'Friday', 5: 'Saturday', 6: 'Sunday'}
-
-# Map the numeric values to day names
-gdf['DayOfWeek'] = gdf['DayOfWeek'].map(day_map)
-
-# Analysis by Day of the Week
-day_summary = gdf.groupby('DayOfWeek').agg(
-    Total_Offenses=('DATE OCC', 'size'),
-    Part_I_Offenses=('Part 1-2', lambda x: (x == 1).sum()),
-    Part_II_Offenses=('Part 1-2', lambda x: (x == 2).sum()),
-    Adult_Arrests=('Status Desc', lambda x: (x == 'Adult Arrest').sum()),
-    Juvenile_Arrests=('Status Desc', lambda x: (x == 'Juv Arrest').sum())
-).reset_index()
-
-# Ensure day names are in the correct order for consistent plotting
-day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-day_summary['DayOfWeek'] = pd.Categorical(day_summary['DayOfWeek'], categories=day_order, ordered=True)
-day_summary = day_summary.sort_values('DayOfWeek')
+with stage('read_gpkg') as s:
+    gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+    s.rows = len(gdf)
+
+with stage('summarize_by_dayofweek', rows=len(gdf)):
+    # Create a mapping of numeric values to day names
+    day_map = {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday', 4: 'Friday', 5: 'Saturday', 6: 'Sunday'}
+
+    # Map the numeric values to day names
+    gdf['DayOfWeek'] = gdf['DayOfWeek'].map(day_map)
+
+    # Analysis by Day of the Week
+    day_summary = gdf.groupby('DayOfWeek').agg(
+        Total_Offenses=('DATE OCC', 'size'),
+        Part_I_Offenses=('Part 1-2', lambda x: (x == 1).sum()),
+        Part_II_Offenses=('Part 1-2', lambda x: (x == 2).sum()),
+        Adult_Arrests=('Status Desc', lambda x: (x == 'Adult Arrest').sum()),
+        Juvenile_Arrests=('Status Desc', lambda x: (x == 'Juv Arrest').sum())
+    ).reset_index()
+
+    # Ensure day names are in the correct order for consistent plotting
+    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    day_summary['DayOfWeek'] = pd.Categorical(day_summary['DayOfWeek'], categories=day_order, ordered=True)
+    day_summary = day_summary.sort_values('DayOfWeek')
 
 # Create a figure
 plt.figure(figsize=(12, 6))
@@ -1,24 +1,28 @@
 import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
-import seaborn as sns
+
+from stage_trace import stage
 
 # Load the processed GeoPackage file
-gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+with stage('read_gpkg') as s:
+    gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+    s.rows = len(gdf)
 
-# Analysis by Hour
-hourly_summary = gdf.groupby('Hour').agg(
-    Total_Offenses=('DATE OCC', 'size'),
-    Part_I_Offenses=('Part 1-2', lambda x: (x == 1).sum()),
-    Part_II_Offenses=('Part 1-2', lambda x: (x == 2).sum())
-).reset_index()
+with stage('summarize_by_hour', rows=len(gdf)):
+    # Analysis by Hour
+    hourly_summary = gdf.groupby('Hour').agg(
+        Total_Offenses=('DATE OCC', 'size'),
+        Part_I_Offenses=('Part 1-2', lambda x: (x == 1).sum()),
+        Part_II_Offenses=('Part 1-2', lambda x: (x == 2).sum())
+    ).reset_index()
 
-# Analysis by Hour for Adult and Juvenile Arrests
-hourly_arrests = gdf.groupby('Hour').agg(
-    Total_Offenses=('DATE OCC', 'size'),  # Include total offenses for reference
-    Adult_Arrests=('Status Desc', lambda x: (x == 'Adult Arrest').sum()),
-    Juvenile_Arrests=('Status Desc', lambda x: (x == 'Juv Arrest').sum())
-).reset_index()
+    # Analysis by Hour for Adult and Juvenile Arrests
+    hourly_arrests = gdf.groupby('Hour').agg(
+        Total_Offenses=('DATE OCC', 'size'),  # Include total offenses for reference
+        Adult_Arrests=('Status Desc', lambda x: (x == 'Adult Arrest').sum()),
+        Juvenile_Arrests=('Status Desc', lambda x: (x == 'Juv Arrest').sum())
+    ).reset_index()
 
 # Plot: Total Crimes vs Part I vs Part II by Hour
 plt.figure(figsize=(12, 6))
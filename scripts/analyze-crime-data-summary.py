@@ -2,30 +2,36 @@ import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
 
+from stage_trace import stage
+
 # Load the processed GeoPackage file
-gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+with stage('read_gpkg') as s:
+    gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+    s.rows = len(gdf)
 
-# Ensure DATE OCC is in datetime format
-gdf['DATE OCC'] = pd.to_datetime(gdf['DATE OCC'])
+with stage('summarize_by_year', rows=len(gdf)):
+    # Ensure DATE OCC is in datetime format
+    gdf['DATE OCC'] = pd.to_datetime(gdf['DATE OCC'])
 
-# Extract the year from DATE OCC
-gdf['Year'] = gdf['DATE OCC'].dt.year
+    # Extract the year from DATE OCC
+    gdf['Year'] = gdf['DATE OCC'].dt.year
 
-# Group by Year and calculate the required counts
-summary_table = gdf.groupby('Year').agg(
-    Total_Offenses=('DATE OCC', 'size'),
-    Part_I_Offenses=('Part 1-2', lambda x: (x == 1).sum()),
-    Part_II_Offenses=('Part 1-2', lambda x: (x == 2).sum()),
-    Adult_Arrests=('Status Desc', lambda x: (x == 'Adult Arrest').sum()),
-    Juvenile_Arrests=('Status Desc', lambda x: (x == 'Juv Arrest').sum())
-).reset_index()
+    # Group by Year and calculate the required counts
+    summary_table = gdf.groupby('Year').agg(
+        Total_Offenses=('DATE OCC', 'size'),
+        Part_I_Offenses=('Part 1-2', lambda x: (x == 1).sum()),
+        Part_II_Offenses=('Part 1-2', lambda x: (x == 2).sum()),
+        Adult_Arrests=('Status Desc', lambda x: (x == 'Adult Arrest').sum()),
+        Juvenile_Arrests=('Status Desc', lambda x: (x == 'Juv Arrest').sum())
+    ).reset_index()
 
-# Sort the table by Year in ascending order
-summary_table = summary_table.sort_values(by='Year')
+    # Sort the table by Year in ascending order
+    summary_table = summary_table.sort_values(by='Year')
 
 # Save the summary table as an HTML file with borders and headers
 html_file_path = '../maps/crime_summary_table.html'
-summary_table.to_html(html_file_path, index=False, border=1)
+with stage('write_table'):
+    summary_table.to_html(html_file_path, index=False, border=1)
 
 print(f"Summary table saved as {html_file_path}")
 
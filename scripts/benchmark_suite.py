@@ -0,0 +1,191 @@
+"""End-to-end benchmark of the repo's scripts on synthetic data.
+
+Generates synthetic LAPD exports (``synthetic_data.py``) once per size into
+a self-contained workspace, then runs each stage script unmodified with its
+working directory inside that workspace, so every ``../data``, ``../maps``,
+``../models`` and ``../Base_Map`` path the scripts use resolves to the workspace instead
+of the real data:
+
+    ../data/benchmarks/suite/<size>/
+        data/         synthetic exports, processed GeoPackage, feature store
+        Base_Map/     synthetic county outline
+        maps/         maps and tables written by the analysis stages
+        models/       bundles saved by the model stages
+        run/          working directory of the stages
+        logs/         output of each stage
+
+Each stage runs in its own process; its wall time and peak memory are
+recorded. Results are appended to ``../data/benchmarks/suite_history.csv``
+with the git commit, so each run is compared with the last run of the same
+stage and size on another commit and slowdowns beyond ``--threshold`` are
+flagged as regressions.
+
+    python benchmark_suite.py --size 10k
+    python benchmark_suite.py --size 1M --stages ingest feature_store train_decision_tree
+    python benchmark_suite.py --size 20M --skip train_neural train_brf
+    python benchmark_suite.py --history --size 1M
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+OUTPUT_DIR = '../data/benchmarks'
+SUITE_DIR = os.path.join(OUTPUT_DIR, 'suite')
+HISTORY_FILE = os.path.join(OUTPUT_DIR, 'suite_history.csv')
+SIZES = ['10k', '1M', '20M']
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (stage, script, arguments), in dependency order
+STAGES = [
+    ('ingest', 'process-crime-data.py', []),
+    ('feature_store', 'feature_store.py', ['--force']),
+    ('summary', 'analyze-crime-data-summary.py', []),
+    ('summary_by_hour', 'analyze-by-hour.py', []),
+    ('summary_by_dayofweek', 'analyze-by-dayofweek.py', []),
+    ('h3_geogrid', '2022_geogrid_1.py', []),
+    ('kde_heatmap', 'kde_heatmap.py', []),
+    ('map_top_n', 'top_n_maps.py', ['--aggregate', 'h3']),
+    ('map_timeseries', '3d_timeseries.py', ['--aggregate', 'h3']),
+    ('train_decision_tree', 'decision-tree-classifier-part-I.py', []),
+    ('train_brf', 'rfbc_partone.py', []),
+    ('train_gradient_boost', 'gradient-boost-part-I.py', ['--engine', 'exact']),
+    ('train_hist_gradient_boost', 'gradient-boost-part-I.py', ['--engine', 'hist']),
+    ('train_neural', 'neural-classifier-part-I.py', [])
+]
+
+
+def git_commit():
+    """Short commit hash of the scripts, with ``+dirty`` when they have uncommitted changes."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no', '--', '.'], cwd=SCRIPT_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{commit}+dirty' if dirty else commit
+
+
+def prepare_workspace(size, seed=42, regenerate=False):
+    """Workspace directory for ``size`` with synthetic exports, generated on first use."""
+    from synthetic_data import GENERATOR_VERSION, parse_rows, write_exports
+
+    workspace = os.path.abspath(os.path.join(SUITE_DIR, size))
+    for sub in ('run', 'logs', 'maps'):
+        os.makedirs(os.path.join(workspace, sub), exist_ok=True)
+    manifest_path = os.path.join(workspace, 'synthetic.json')
+    if os.path.exists(manifest_path) and not regenerate:
+        with open(manifest_path) as file:
+            # Data from an older generator is regenerated
+            regenerate = json.load(file).get('generator_version') != GENERATOR_VERSION
+    if regenerate or not os.path.exists(manifest_path):
+        logging.info(f"Generating {size} synthetic incidents in {workspace}")
+        write_exports(parse_rows(size), workspace, seed)
+    return workspace
+
+
+def run_stage(workspace, stage, script, arguments, timeout=None):
+    """Run one stage script in ``workspace``; returns (status, seconds, peak RSS MB)."""
+    env = dict(os.environ, MPLBACKEND='Agg', PYTHONUNBUFFERED='1')
+    log_path = os.path.join(workspace, 'logs', f'{stage}.log')
+    with open(log_path, 'w') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(SCRIPT_DIR, script)] + arguments,
+                                   cwd=os.path.join(workspace, 'run'), env=env, stdout=log,
+                                   stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        killed = threading.Event()
+        timer = threading.Timer(timeout, lambda: (killed.set(), process.kill())) if timeout else None
+        if timer:
+            timer.start()
+        # wait4 reports the resource usage of this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+        if timer:
+            timer.cancel()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode == 0:
+        result = 'ok'
+    elif killed.is_set():
+        result = 'timeout'
+    else:
+        result = 'failed'
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = usage.ru_maxrss / 2 ** 20 if sys.platform == 'darwin' else usage.ru_maxrss / 2 ** 10
+    return result, seconds, peak
+
+
+def compare_with_history(results, history, threshold):
+    """Add the previous commit's time of each stage and flag slowdowns beyond ``threshold``."""
+    previous = history[(history['status'] == 'ok') & (history['commit'] != results['commit'].iloc[0])]
+    previous = previous.drop_duplicates(['size', 'stage'], keep='last')
+    previous = previous[['size', 'stage', 'commit', 'seconds']].rename(
+        columns={'commit': 'previous_commit', 'seconds': 'previous_seconds'})
+    compared = results.merge(previous, on=['size', 'stage'], how='left')
+    compared['change'] = compared['seconds'] / compared['previous_seconds'] - 1
+    compared['regression'] = (compared['status'] == 'ok') & (compared['change'] > threshold)
+    return compared
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    stage_names = [stage for stage, _, _ in STAGES]
+    parser = argparse.ArgumentParser(description='Benchmark the scripts end to end on synthetic data')
+    parser.add_argument('--size', default='10k', help=f"synthetic incidents, e.g. {', '.join(SIZES)}")
+    parser.add_argument('--stages', nargs='+', choices=stage_names, default=stage_names)
+    parser.add_argument('--skip', nargs='+', choices=stage_names, default=[])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--regenerate', action='store_true', help='regenerate the synthetic exports')
+    parser.add_argument('--timeout', type=float, default=None, help='seconds before a stage is killed')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown over the previous commit flagged as a regression (0.2 = 20%%)')
+    parser.add_argument('--history', action='store_true', help='print the stored results for --size and exit')
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    history = pd.read_csv(HISTORY_FILE) if os.path.exists(HISTORY_FILE) else pd.DataFrame()
+    if args.history:
+        runs = history[history['size'] == args.size] if len(history) else history
+        if not len(runs):
+            print(f"No stored results for size {args.size}")
+            return
+        print(runs.pivot_table(index=['run', 'commit'], columns='stage', values='seconds', sort=False)
+              .round(2).to_string())
+        return
+
+    workspace = prepare_workspace(args.size, args.seed, args.regenerate)
+    commit, run_id = git_commit(), datetime.now().isoformat(timespec='seconds')
+    results = []
+    for stage, script, arguments in STAGES:
+        if stage not in args.stages or stage in args.skip:
+            continue
+        status, seconds, peak = run_stage(workspace, stage, script, arguments, args.timeout)
+        level = logging.INFO if status == 'ok' else logging.WARNING
+        logging.log(level, f"{stage}: {status} in {seconds:.2f}s, peak {peak:.0f} MB")
+        results.append({'run': run_id, 'commit': commit, 'size': args.size, 'stage': stage, 'status': status,
+                        'seconds': round(seconds, 3), 'peak_rss_mb': round(peak, 1),
+                        'python': platform.python_version(), 'cpus': os.cpu_count()})
+
+    results = pd.DataFrame(results)
+    compared = compare_with_history(results, history, args.threshold) if len(history) else results
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    results.to_csv(HISTORY_FILE, mode='a', header=not os.path.exists(HISTORY_FILE), index=False)
+
+    columns = [col for col in ['stage', 'status', 'seconds', 'peak_rss_mb', 'previous_commit', 'previous_seconds',
+                               'change', 'regression'] if col in compared.columns]
+    print(compared[columns].round(3).to_string(index=False))
+    if 'regression' in compared.columns and compared['regression'].any():
+        logging.warning(f"Regressions beyond {args.threshold:.0%}: "
+                        f"{', '.join(compared.loc[compared['regression'], 'stage'])}")
+    logging.info(f"Results appended to {HISTORY_FILE}; stage logs in {os.path.join(workspace, 'logs')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Parallel, cached cross-validation for the classifier scripts.
+
+``cross_val_score`` runs the folds one after another and throws the fitted
+fold models away. ``cross_validate_cached`` fits the folds in a process pool
+instead. The training matrix is written once to ``.npy`` files in a temporary
+folder, and every worker memory-maps it, so the matrix is not pickled for
+each fold. The fold models, predictions and Part I probabilities are returned
+in a ``CVResult``, so any metric or plot can be computed from them without
+refitting.
+
+With ``cache_dir`` the fold results are also stored on disk under a hash of
+the estimator parameters, the data and the fold indices. A rerun with the
+same model and data loads them instead of fitting again.
+
+``cross_validate_many`` cross-validates several estimators on the same data,
+with every (estimator, fold) fit in one pool, which can also be shared
+between calls.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import clone, is_classifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import check_cv
+
+CACHE_DIR = '../data/cv_cache'
+
+
+@dataclass
+class CVResult:
+    """Fitted fold models with their test-fold predictions and fit seconds."""
+    y: np.ndarray
+    folds: list
+    models: list
+    predictions: list
+    probabilities: list
+    seconds: list = None
+
+    def scores(self, metric=accuracy_score, proba=False):
+        """Score each fold; ``proba=True`` passes Part I probabilities to ``metric``."""
+        outputs = self.probabilities if proba else self.predictions
+        return np.array([metric(self.y[test], output) for (_, test), output in zip(self.folds, outputs)])
+
+    def out_of_fold_proba(self):
+        """Part I probability of every row from the fold model that did not see it."""
+        proba = np.full(len(self.y), np.nan)
+        for (_, test), fold_proba in zip(self.folds, self.probabilities):
+            proba[test] = fold_proba
+        return proba
+
+
+def _arrays(X):
+    if sparse.issparse(X):
+        X = X.tocsr()
+        return {'data': X.data, 'indices': X.indices, 'indptr': X.indptr}
+    return {'X': np.ascontiguousarray(X)}
+
+
+def _share(X, y, folder):
+    """Write X and y to ``folder`` and return what a worker needs to map them."""
+    for name, array in {**_arrays(X), 'y': y}.items():
+        np.save(os.path.join(folder, name + '.npy'), array)
+    return {'folder': folder, 'sparse': sparse.issparse(X), 'shape': X.shape}
+
+
+def _attach(spec):
+    def load(name):
+        return np.load(os.path.join(spec['folder'], name + '.npy'), mmap_mode='r')
+
+    if spec['sparse']:
+        X = sparse.csr_matrix((load('data'), load('indices'), load('indptr')), shape=spec['shape'], copy=False)
+    else:
+        X = load('X')
+    return X, load('y')
+
+
+def _fit_fold(estimator, X, y, train, test):
+    start = time.perf_counter()
+    model = clone(estimator).fit(X[train], y[train])
+    X_test = X[test]
+    proba = model.predict_proba(X_test)[:, 1] if hasattr(model, 'predict_proba') else None
+    return model, model.predict(X_test), proba, time.perf_counter() - start
+
+
+def _fit_shared_fold(estimator, spec, train, test):
+    X, y = _attach(spec)
+    return _fit_fold(estimator, X, y, train, test)
+
+
+def _fit_all(fits, X, y, n_jobs=None, executor=None):
+    """Results of ``_fit_fold`` for each ``(estimator, train, test)`` in ``fits``.
+
+    The fits run in ``executor`` when given, else in a new pool of ``n_jobs``
+    processes, or in this process when that is 1.
+    """
+    if executor is None:
+        n_jobs = effective_n_jobs(n_jobs, len(fits))
+        if n_jobs == 1:
+            return [_fit_fold(estimator, X, y, train, test) for estimator, train, test in fits]
+    with tempfile.TemporaryDirectory(prefix='cv_harness_') as folder:
+        spec = _share(X, y, folder)
+        if executor is not None:
+            futures = [executor.submit(_fit_shared_fold, estimator, spec, train, test)
+                       for estimator, train, test in fits]
+            return [future.result() for future in futures]
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(_fit_shared_fold, estimator, spec, train, test)
+                       for estimator, train, test in fits]
+            return [future.result() for future in futures]
+
+
+def fingerprint(estimator, X, y, folds):
+    """Hash of the estimator parameters, the data and the fold split."""
+    h = hashlib.sha256()
+    params = {'estimator': type(estimator).__name__, 'params': estimator.get_params(deep=False)}
+    h.update(json.dumps(params, sort_keys=True, default=repr).encode())
+    for name, array in {**_arrays(X), 'y': y}.items():
+        h.update(name.encode())
+        h.update(str(array.dtype).encode())
+        h.update(np.ascontiguousarray(array).data)
+    for _, test in folds:
+        h.update(np.asarray(test, dtype=np.int64).data)
+    return h.hexdigest()[:16]
+
+
+def effective_n_jobs(n_jobs, n_tasks):
+    """Number of worker processes: ``None`` means 1 and ``-1`` all cores."""
+    if n_jobs is None:
+        n_jobs = 1
+    elif n_jobs < 0:
+        n_jobs = max(os.cpu_count() + 1 + n_jobs, 1)
+    return max(min(n_jobs, n_tasks), 1)
+
+
+def cross_validate_cached(estimator, X, y, cv=5, n_jobs=None, cache_dir=None):
+    """Fit ``estimator`` on each fold in parallel and keep the fold results.
+
+    ``cv`` is resolved like ``cross_val_score`` resolves it (stratified
+    K-fold for classifiers), so ``result.scores()`` equals its output.
+    Worker processes may re-import the calling script (the spawn and
+    forkserver start methods do), so a script that passes ``n_jobs`` other
+    than 1 must keep its work in ``main()`` behind an ``__name__`` guard.
+    """
+    if isinstance(X, pd.DataFrame):
+        X = X.to_numpy()
+    y = np.asarray(y)
+    folds = list(check_cv(cv, y, classifier=is_classifier(estimator)).split(X, y))
+    results = [None] * len(folds)
+
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, fingerprint(estimator, X, y, folds))
+        for k in range(len(folds)):
+            fold_file = os.path.join(cache_path, f'fold_{k}.joblib')
+            if os.path.exists(fold_file):
+                results[k] = joblib.load(fold_file)
+        cached = sum(result is not None for result in results)
+        if cached:
+            logging.info(f"Loaded {cached} of {len(folds)} folds from {cache_path}")
+
+    todo = [k for k, result in enumerate(results) if result is None]
+    if todo:
+        fitted = _fit_all([(estimator, *folds[k]) for k in todo], X, y, n_jobs)
+        for k, result in zip(todo, fitted):
+            results[k] = result
+
+    for k in todo:
+        logging.info(f"Fold {k + 1}/{len(folds)} fitted in {results[k][3]:.1f}s")
+        if cache_path is not None:
+            os.makedirs(cache_path, exist_ok=True)
+            joblib.dump(results[k], os.path.join(cache_path, f'fold_{k}.joblib'))
+
+    models, predictions, probabilities, seconds = zip(*results)
+    return CVResult(y, folds, list(models), list(predictions), list(probabilities), list(seconds))
+
+
+def cross_validate_many(estimators, X, y, cv=5, n_jobs=None, executor=None):
+    """``CVResult`` of each of ``estimators`` on the same folds, without caching.
+
+    All (estimator, fold) fits are submitted together, to ``executor`` when
+    given (e.g. a pool shared by several calls) or else to a new pool of
+    ``n_jobs`` processes, so the pool is busy even when there are fewer
+    folds than processes. The same ``__name__`` guard requirement as for
+    ``cross_validate_cached`` applies.
+    """
+    if isinstance(X, pd.DataFrame):
+        X = X.to_numpy()
+    y = np.asarray(y)
+    folds = list(check_cv(cv, y, classifier=is_classifier(estimators[0])).split(X, y))
+    fitted = _fit_all([(estimator, train, test) for estimator in estimators for train, test in folds],
+                      X, y, n_jobs, executor)
+
+    results = []
+    for i in range(len(estimators)):
+        models, predictions, probabilities, seconds = zip(*fitted[i * len(folds):(i + 1) * len(folds)])
+        results.append(CVResult(y, folds, list(models), list(predictions), list(probabilities), list(seconds)))
+    return results
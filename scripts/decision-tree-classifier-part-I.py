@@ -1,49 +1,118 @@
-import pandas as pd
-import numpy as np
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-import matplotlib.pyplot as plt
-import seaborn as sns
-import geopandas as gpd
-
-# Load the data
-gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
-
-# Create target variable
-gdf['Part_I_Offense'] = (gdf['Part 1-2'] == 1).astype(int)
-
-# Select features
-features = ['Hour', 'DayOfWeek', 'Month', 'AREA NAME', 'Vict Age', 'Vict Sex', 'Vict Descent', 'Premis Cd', 'Weapon Used Cd']
-
-# Prepare the data
-X = pd.get_dummies(gdf[features], columns=['AREA NAME', 'Vict Sex', 'Vict Descent'])
-y = gdf['Part_I_Offense']
-
-# Split the data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Train decision tree
-dt_classifier = DecisionTreeClassifier(random_state=42)
-dt_classifier.fit(X_train, y_train)
-
-# Get feature importance
-feature_importance = dt_classifier.feature_importances_
-feature_importance_df = pd.DataFrame({'Feature': X.columns, 'Importance': feature_importance})
-feature_importance_df = feature_importance_df.sort_values('Importance', ascending=False)
-
-print(feature_importance_df)
-
-# Correlation heatmap
-plt.figure(figsize=(12, 10))
-sns.heatmap(X.corr(), annot=False, cmap='coolwarm')
-plt.title("Feature Correlation Heatmap")
-plt.tight_layout()
-plt.show()
-
-# Distribution of offenses by hour
-plt.figure(figsize=(10, 6))
-sns.countplot(x='Hour', data=gdf[gdf['Part_I_Offense'] == 1])
-plt.title("Distribution of Part I Offenses by Hour")
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+import argparse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--encoding', choices=['dense', 'sparse'], default='dense',
+                        help="'sparse' trains on a float32 CSR matrix from a fitted encoder (missing numeric "
+                             "values median-imputed, numeric columns scaled)")
+    parser.add_argument('--corr-sample', type=int, default=None,
+                        help='estimate the correlation heatmap from this many random rows instead of all rows')
+    parser.add_argument('--n-jobs', type=int, default=-1,
+                        help='worker processes for the permutation importance (-1 uses all cores)')
+    args = parser.parse_args(argv)
+
+    # pandas, scikit-learn and matplotlib take seconds to import, so they are loaded
+    # only once the arguments are valid
+    import pandas as pd
+    import numpy as np
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.model_selection import train_test_split
+    from sklearn.metrics import accuracy_score, roc_auc_score
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from scipy import sparse
+    from feature_store import load_features, load_raw_features
+    from sparse_features import SparseFeatureEncoder
+    from streaming_correlation import streaming_correlation, fisher_interval
+    from model_artifacts import DenseFeaturePipeline, save_bundle
+    from group_importance import grouped_permutation_importance
+    from stage_trace import stage
+
+    if args.encoding == 'dense':
+        # Load the cached feature matrix (built from the GeoPackage on first use)
+        with stage('load') as s:
+            X, y = load_features()
+            s.rows = len(y)
+
+        # Split the data
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        feature_names = X.columns
+        preprocessor = DenseFeaturePipeline.from_store(impute=False)
+        hours = X['Hour']
+    else:
+        # Un-encoded features: float32 numeric columns and categorical codes
+        with stage('load') as s:
+            raw, y = load_raw_features()
+            s.rows = len(y)
+
+        # Split the data
+        raw_train, raw_test, y_train, y_test = train_test_split(raw, y, test_size=0.2, random_state=42)
+        with stage('encode', rows=len(y)):
+            preprocessor = SparseFeatureEncoder().fit(raw_train)
+            X_train = preprocessor.transform(raw_train)
+            X_test = preprocessor.transform(raw_test)
+        feature_names = preprocessor.get_feature_names_out()
+        hours = raw['Hour']
+
+    # Train decision tree
+    dt_classifier = DecisionTreeClassifier(random_state=42)
+    with stage('fit', rows=len(y_train)):
+        dt_classifier.fit(X_train, y_train)
+
+    # Get feature importance
+    feature_importance = dt_classifier.feature_importances_
+    feature_importance_df = pd.DataFrame({'Feature': feature_names, 'Importance': feature_importance})
+    feature_importance_df = feature_importance_df.sort_values('Importance', ascending=False)
+
+    print(feature_importance_df)
+
+    # Save the model with its preprocessing so batch_score.py can reuse it
+    y_pred_proba = dt_classifier.predict_proba(X_test)[:, 1]
+    with stage('save_bundle'):
+        bundle_path = save_bundle('decision_tree', dt_classifier, preprocessor,
+                                  metrics={'accuracy': accuracy_score(y_test, dt_classifier.predict(X_test)),
+                                           'roc_auc': roc_auc_score(y_test, y_pred_proba)})
+    print(f"Model bundle saved to {bundle_path}")
+
+    # Permutation importance of the original features on a test subsample,
+    # with the test predictions above as the unpermuted baseline
+    with stage('permutation_importance', rows=len(y_test)):
+        permutation_importance = grouped_permutation_importance(dt_classifier, X_test, y_test, feature_names,
+                                                                baseline_proba=y_pred_proba, n_jobs=args.n_jobs)
+    print("Permutation importance (ROC AUC drop):")
+    print(permutation_importance.round(4).to_string())
+
+    plt.figure(figsize=(10, 6))
+    sns.barplot(x=permutation_importance['mean'], y=permutation_importance.index)
+    plt.xlabel("ROC AUC drop when permuted")
+    plt.title("Permutation Importance for Part I Offenses (Decision Tree)")
+    plt.tight_layout()
+    plt.show()
+
+    # Correlation heatmap, accumulated chunk by chunk from the memory-mapped
+    # features (or the encoded sparse matrix)
+    corr_input = X if args.encoding == 'dense' else sparse.vstack([X_train, X_test], format='csr')
+    with stage('correlation', rows=len(y)):
+        corr = streaming_correlation(corr_input, columns=feature_names, sample_rows=args.corr_sample)
+    if args.corr_sample is not None:
+        lower, upper = fisher_interval(corr, corr.attrs['n'])
+        print(f"Correlations from {args.corr_sample} sampled rows, "
+              f"largest 95% interval half-width: {np.nanmax(upper - lower) / 2:.4f}")
+
+    plt.figure(figsize=(12, 10))
+    sns.heatmap(corr, annot=False, cmap='coolwarm')
+    plt.title("Feature Correlation Heatmap")
+    plt.tight_layout()
+    plt.show()
+
+    # Distribution of offenses by hour
+    plt.figure(figsize=(10, 6))
+    sns.countplot(x=hours[y == 1].dropna().astype(int))
+    plt.title("Distribution of Part I Offenses by Hour")
+    plt.tight_layout()
+    plt.show()
+
+
+if __name__ == '__main__':
+    main()
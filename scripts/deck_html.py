@@ -0,0 +1,49 @@
+"""Write pydeck maps with extra HTML controls in a single pass.
+
+The deck JSON is embedded without pydeck's indentation, which roughly halves
+the size of maps that carry tens of thousands of cells.
+
+pydeck's page template creates the deck in a ``<script>`` placed after
+``</body>`` and keeps it in the ``deckInstance`` variable, so controls that
+talk to the deck are inserted just before ``</html>``.
+"""
+import json
+
+
+def save_deck(deck, output_file, extra_html=''):
+    """Render ``deck`` to HTML, append ``extra_html`` and write it once."""
+    deck_json = deck.to_json()
+    html = deck.to_html(as_string=True)
+    html = html.replace(deck_json, json.dumps(json.loads(deck_json), separators=(',', ':')), 1)
+    html = html.replace('</html>', f'{extra_html}</html>')
+    with open(output_file, 'w') as file:
+        file.write(html)
+    return output_file
+
+
+def year_slider_html(years, initial=None):
+    """Slider that shows only the layers whose id ends in ``-<year>``.
+
+    Layers without a year suffix are left untouched.
+    """
+    years = [int(year) for year in years]
+    initial = years[-1] if initial is None else int(initial)
+    return f"""
+<div style="position: absolute; bottom: 10px; left: 50%; transform: translateX(-50%);
+            background-color: rgba(255, 255, 255, 0.8); padding: 10px; border-radius: 5px; text-align: center;">
+    <b>Year: <span id="year-label">{initial}</span></b><br>
+    <input type="range" id="year-slider" min="{years[0]}" max="{years[-1]}" step="1" value="{initial}" style="width: 300px;">
+</div>
+<script>
+  const availableYears = {years};
+  function showYear(year) {{
+    const layers = deckInstance.props.layers.map(layer => {{
+      const match = layer.id.match(/-(\\d{{4}})$/);
+      return match ? layer.clone({{visible: Number(match[1]) === year}}) : layer;
+    }});
+    deckInstance.setProps({{layers}});
+    document.getElementById('year-label').textContent = availableYears.includes(year) ? year : year + ' (no data)';
+  }}
+  document.getElementById('year-slider').addEventListener('input', event => showYear(Number(event.target.value)));
+</script>
+"""
@@ -0,0 +1,178 @@
+"""Cached feature matrix shared by the Part I classifier scripts.
+
+Every classifier selects the same nine features, one-hot encodes
+``AREA NAME``, ``Vict Sex`` and ``Vict Descent`` with ``pd.get_dummies`` and
+targets ``Part 1-2 == 1``. This module does that once and stores the result
+as plain ``.npy`` files (float32 X, int8 y) plus a JSON manifest, under a key
+that hashes the data version and the feature spec. Later runs memory-map the
+arrays instead of re-reading the GeoPackage.
+
+Missing values are kept as NaN in the store; the per-column medians that
+``SimpleImputer(strategy='median')`` would use are stored alongside so
+``load_features(impute=True)`` reproduces the imputed matrix without
+refitting.
+
+The un-encoded features are stored too (float32 numeric columns and int16
+category codes) for the sparse encoding path in ``sparse_features.py``;
+``load_raw_features`` returns them as a compact DataFrame.
+
+Build or refresh the store from the command line with:
+
+    python feature_store.py [--force]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from stage_trace import nested_stage
+
+DATA_PATH = '../data/processed_crime_data_2010_2023.gpkg'
+STORE_DIR = '../data/feature_store'
+
+FEATURES = ['Hour', 'DayOfWeek', 'Month', 'AREA NAME', 'Vict Age', 'Vict Sex', 'Vict Descent', 'Premis Cd',
+            'Weapon Used Cd']
+CATEGORICAL_FEATURES = ['AREA NAME', 'Vict Sex', 'Vict Descent']
+NUMERIC_FEATURES = [col for col in FEATURES if col not in CATEGORICAL_FEATURES]
+TARGET = 'Part_I_Offense'
+
+# Bump ``version`` whenever the encoding below changes
+FEATURE_SPEC = {
+    'version': 2,
+    'features': FEATURES,
+    'categorical': CATEGORICAL_FEATURES,
+    'target': 'Part 1-2 == 1',
+    'dtype': 'float32'
+}
+
+
+def data_version(data_path=DATA_PATH):
+    """Identify a data file by its size and modification time."""
+    stat = os.stat(data_path)
+    return f'{stat.st_size}-{stat.st_mtime_ns}'
+
+
+def store_key(data_path=DATA_PATH, spec=FEATURE_SPEC):
+    """Hash of the data version and the feature spec."""
+    payload = json.dumps({'data': data_version(data_path), 'spec': spec}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def encode_features(df):
+    """One-hot encode the selected features the way the classifier scripts do."""
+    X = pd.get_dummies(df[FEATURES], columns=CATEGORICAL_FEATURES)
+    y = (df['Part 1-2'] == 1).astype(np.int8)
+    return X, y
+
+
+def materialize(data_path=DATA_PATH, store_dir=STORE_DIR, force=False):
+    """Build the feature store entry for ``data_path`` if it does not exist.
+
+    Returns the directory holding the entry.
+    """
+    path = os.path.join(store_dir, store_key(data_path))
+    if not force and os.path.exists(os.path.join(path, 'manifest.json')):
+        return path
+
+    import geopandas as gpd
+
+    logging.info(f"Building feature store entry {path}")
+    with nested_stage('read_gpkg') as s:
+        gdf = gpd.read_file(data_path)
+        s.rows = len(gdf)
+    with nested_stage('encode_features', rows=len(gdf)):
+        X, y = encode_features(gdf)
+    columns = [str(col) for col in X.columns]
+    X = X.to_numpy(dtype=np.float32, na_value=np.nan)
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'X.npy'), X)
+    np.save(os.path.join(path, 'y.npy'), y.to_numpy())
+
+    # Raw features: numeric columns plus category codes (-1 for missing)
+    categories = {}
+    codes = np.empty((len(gdf), len(CATEGORICAL_FEATURES)), dtype=np.int16)
+    for i, col in enumerate(CATEGORICAL_FEATURES):
+        cat = pd.Categorical(gdf[col])
+        categories[col] = [str(value) for value in cat.categories]
+        codes[:, i] = cat.codes
+    np.save(os.path.join(path, 'numeric.npy'), gdf[NUMERIC_FEATURES].to_numpy(dtype=np.float32, na_value=np.nan))
+    np.save(os.path.join(path, 'codes.npy'), codes)
+
+    manifest = {
+        'key': os.path.basename(path),
+        'data_path': os.path.abspath(data_path),
+        'data_version': data_version(data_path),
+        'spec': FEATURE_SPEC,
+        'columns': columns,
+        'shape': list(X.shape),
+        'medians': np.nanmedian(X, axis=0).tolist(),
+        'categories': categories
+    }
+    # The manifest is written last so a partial entry is never picked up
+    with open(os.path.join(path, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    logging.info(f"Feature store entry written. X shape: {X.shape}")
+    return path
+
+
+def load_manifest(data_path=DATA_PATH, store_dir=STORE_DIR):
+    """Return the manifest and directory of the entry for ``data_path``."""
+    path = materialize(data_path, store_dir)
+    with open(os.path.join(path, 'manifest.json')) as file:
+        return json.load(file), path
+
+
+def load_arrays(mmap=True, data_path=DATA_PATH, store_dir=STORE_DIR):
+    """Return the encoded X and y as plain arrays plus the manifest.
+
+    With ``mmap=True`` X is a read-only memory map, so rows are only read
+    from disk when they are indexed.
+    """
+    manifest, path = load_manifest(data_path, store_dir)
+    X = np.load(os.path.join(path, 'X.npy'), mmap_mode='r' if mmap else None)
+    y = np.load(os.path.join(path, 'y.npy'))
+    return X, y, manifest
+
+
+def load_features(impute=False, mmap=True, data_path=DATA_PATH, store_dir=STORE_DIR):
+    """Load X (DataFrame) and y (Series), building the entry on first use.
+
+    With ``impute=True`` missing values are filled with the stored column
+    medians, which matches ``SimpleImputer(strategy='median')`` fitted on the
+    full matrix.
+    """
+    X, y, manifest = load_arrays(mmap, data_path, store_dir)
+
+    if impute:
+        medians = np.asarray(manifest['medians'], dtype=X.dtype)
+        X = np.where(np.isnan(X), medians, X)
+
+    X = pd.DataFrame(X, columns=manifest['columns'], copy=False)
+    y = pd.Series(y, name=TARGET)
+    return X, y
+
+
+def load_raw_features(data_path=DATA_PATH, store_dir=STORE_DIR):
+    """Load the nine features un-encoded, with categoricals as ``category`` dtype."""
+    manifest, path = load_manifest(data_path, store_dir)
+    numeric = np.load(os.path.join(path, 'numeric.npy'))
+    codes = np.load(os.path.join(path, 'codes.npy'))
+    y = np.load(os.path.join(path, 'y.npy'))
+
+    frame = pd.DataFrame(numeric, columns=NUMERIC_FEATURES, copy=False)
+    for i, col in enumerate(CATEGORICAL_FEATURES):
+        frame[col] = pd.Categorical.from_codes(codes[:, i], categories=manifest['categories'][col])
+    return frame[FEATURES], pd.Series(y, name=TARGET)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Build the cached Part I feature matrix')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the entry exists')
+    args = parser.parse_args()
+    print(materialize(force=args.force))
@@ -1,112 +1,268 @@
-import geopandas as gpd
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
-from sklearn.impute import SimpleImputer
-from imblearn.under_sampling import RandomUnderSampler
-import matplotlib.pyplot as plt
-import seaborn as sns
 import logging
+import argparse
+import time
+import os
 
-logging.basicConfig(level=logging.INFO)
 
-logging.info("Starting data loading")
-gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
-logging.info(f"Data loaded. Shape: {gdf.shape}")
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
 
-logging.info("Creating target variables")
-gdf['Part_I_Offense'] = (gdf['Part 1-2'] == 1).astype(int)
-gdf['Part_II_Offense'] = (gdf['Part 1-2'] == 2).astype(int)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--encoding', choices=['dense', 'sparse'], default='dense',
+                        help="'sparse' builds a float32 CSR matrix with a fitted encoder "
+                             "and scales only numeric columns")
+    parser.add_argument('--engine', choices=['exact', 'hist'], default='exact',
+                        help="'hist' trains histogram boosting with native categoricals and missing values "
+                             "on the full, non-undersampled training split (ignores --encoding)")
+    parser.add_argument('--n-jobs', type=int, default=-1,
+                        help='worker processes for the cross-validation folds and the permutation importance '
+                             '(-1 uses all cores)')
+    args = parser.parse_args(argv)
 
-logging.info("Preparing features")
-features = ['Hour', 'DayOfWeek', 'Month', 'AREA NAME', 'Vict Age', 'Vict Sex', 'Vict Descent', 'Premis Cd', 'Weapon Used Cd']
-X = pd.get_dummies(gdf[features], columns=['AREA NAME', 'Vict Sex', 'Vict Descent'])
-y_part_i = gdf['Part_I_Offense']
-logging.info(f"Features prepared. X shape: {X.shape}")
+    # pandas, scikit-learn and matplotlib take seconds to import, so they are loaded
+    # only once the arguments are valid
+    import pandas as pd
+    import numpy as np
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+    from imblearn.under_sampling import RandomUnderSampler
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from feature_store import load_features, load_raw_features
+    from sparse_features import SparseFeatureEncoder, log_memory
+    from cv_harness import CACHE_DIR, cross_validate_cached
+    from model_artifacts import DenseFeaturePipeline, save_bundle
+    from group_importance import grouped_permutation_importance
+    from stage_trace import stage
+    from hist_boosting import HistFeatureEncoder, make_hist_model
 
-logging.info("Handling missing values")
-imputer = SimpleImputer(strategy='median')
-X = pd.DataFrame(imputer.fit_transform(X), columns=X.columns)
+    if args.engine == 'hist':
+        # Raw features: no one-hot columns, no imputer, no scaler
+        logging.info("Loading raw features")
+        with stage('load') as s:
+            raw, y_part_i = load_raw_features()
+            s.rows = len(y_part_i)
+        logging.info(f"Raw features loaded. Shape: {raw.shape}")
+        log_memory("raw features loaded", raw)
 
-logging.info("Splitting data")
-X_train, X_test, y_train_i, y_test_i = train_test_split(X, y_part_i, test_size=0.2, random_state=42)
+        logging.info("Splitting data")
+        raw_train, raw_test, y_train_i, y_test_i = train_test_split(raw, y_part_i, test_size=0.2, random_state=42)
 
-logging.info("Scaling features")
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+        logging.info("Encoding features (native categoricals, NaN kept)")
+        with stage('encode', rows=len(y_part_i)):
+            encoder = HistFeatureEncoder().fit(raw_train)
+            X_train_scaled = encoder.transform(raw_train)
+            X_test_scaled = encoder.transform(raw_test)
+        feature_names = encoder.features
+    elif args.encoding == 'dense':
+        # Load the cached feature matrix (built from the GeoPackage on first use)
+        logging.info("Loading features")
+        with stage('load') as s:
+            X, y_part_i = load_features(impute=True)
+            s.rows = len(y_part_i)
+        logging.info(f"Features loaded. X shape: {X.shape}")
+        log_memory("features loaded", X)
 
-logging.info("Handling class imbalance with Random Sampler")
-rus = RandomUnderSampler(random_state=42)
-X_train_resampled, y_train_i_resampled = rus.fit_resample(X_train_scaled, y_train_i)
-logging.info(f"Resampled data shape: {X_train_resampled.shape}")
+        logging.info("Splitting data")
+        X_train, X_test, y_train_i, y_test_i = train_test_split(X, y_part_i, test_size=0.2, random_state=42)
+        log_memory("data split", X_train, X_test)
 
-logging.info("Training Part I Offense model")
-gb_model_i = GradientBoostingClassifier(n_estimators=100, learning_rate=0.1, max_depth=5, subsample=0.8, random_state=42, verbose=1)
+        logging.info("Scaling features")
+        with stage('encode', rows=len(y_part_i)):
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
+        feature_names = X.columns
+    else:
+        # Un-encoded features: float32 numeric columns and categorical codes
+        logging.info("Loading raw features")
+        with stage('load') as s:
+            raw, y_part_i = load_raw_features()
+            s.rows = len(y_part_i)
+        logging.info(f"Raw features loaded. Shape: {raw.shape}")
+        log_memory("raw features loaded", raw)
 
-prev_roc_auc = 0
-for i in range(1, 101):
-    gb_model_i.set_params(n_estimators=i)
-    gb_model_i.fit(X_train_resampled, y_train_i_resampled)
-    
+        logging.info("Splitting data")
+        raw_train, raw_test, y_train_i, y_test_i = train_test_split(raw, y_part_i, test_size=0.2, random_state=42)
+
+        logging.info("Encoding features (sparse float32)")
+        with stage('encode', rows=len(y_part_i)):
+            encoder = SparseFeatureEncoder().fit(raw_train)
+            X_train_scaled = encoder.transform(raw_train)
+            X_test_scaled = encoder.transform(raw_test)
+        feature_names = encoder.get_feature_names_out()
+        logging.info(f"Features encoded. X_train shape: {X_train_scaled.shape}, nnz: {X_train_scaled.nnz}")
+
+    log_memory("features scaled", X_train_scaled, X_test_scaled)
+
+    if args.engine == 'hist':
+        # Histograms make full-data training affordable, so no undersampling;
+        # the number of iterations comes from early stopping on a held-out 10%
+        # of the training split
+        X_train_fit, y_train_fit = X_train_scaled, y_train_i
+
+        logging.info("Training Part I Offense model (histogram engine)")
+        gb_model_i = make_hist_model(encoder, verbose=1)
+        with stage('fit', rows=len(y_train_fit)):
+            train_start = time.perf_counter()
+            gb_model_i.fit(X_train_fit, y_train_fit)
+            fit_seconds = time.perf_counter() - train_start
+        logging.info(f"Trained {gb_model_i.n_iter_} iterations in {fit_seconds:.1f}s")
+
+        iteration_scores = pd.DataFrame({'train_loss': -gb_model_i.train_score_,
+                                         'validation_loss': -gb_model_i.validation_score_})
+        print(f"Chosen iterations: {gb_model_i.n_iter_}")
+        print("Per-iteration log loss (index 0 is the initial prediction):")
+        print(iteration_scores.round(4).to_string())
+    else:
+        logging.info("Handling class imbalance with Random Sampler")
+        rus = RandomUnderSampler(random_state=42)
+        X_train_resampled, y_train_i_resampled = rus.fit_resample(X_train_scaled, y_train_i)
+        logging.info(f"Resampled data shape: {X_train_resampled.shape}")
+        X_train_fit, y_train_fit = X_train_resampled, y_train_i_resampled
+
+        logging.info("Training Part I Offense model")
+        gb_model_i = GradientBoostingClassifier(n_estimators=100, learning_rate=0.1, max_depth=5, subsample=0.8, random_state=42, verbose=1)
+
+        # Boosting is sequential, so a single fit with the maximum number of stages
+        # contains every intermediate model; staged_predict_proba replays them
+        with stage('fit', rows=len(y_train_fit)):
+            train_start = time.perf_counter()
+            gb_model_i.fit(X_train_fit, y_train_fit)
+            fit_seconds = time.perf_counter() - train_start
+        logging.info(f"Trained {gb_model_i.n_estimators_} stages in {fit_seconds:.1f}s")
+
+        stage_metrics = []
+        prev_roc_auc = 0
+        for i, stage_proba in enumerate(gb_model_i.staged_predict_proba(X_test_scaled), start=1):
+            y_pred_proba_i = stage_proba[:, 1]
+            # Same as predict(): class 1 only when its probability is higher
+            y_pred_i = (y_pred_proba_i > 0.5).astype(int)
+
+            accuracy = accuracy_score(y_test_i, y_pred_i)
+            precision = precision_score(y_test_i, y_pred_i)
+            recall = recall_score(y_test_i, y_pred_i)
+            f1 = f1_score(y_test_i, y_pred_i)
+            roc_auc = roc_auc_score(y_test_i, y_pred_proba_i)
+            stage_metrics.append({'stage': i, 'accuracy': accuracy, 'precision': precision, 'recall': recall,
+                                  'f1': f1, 'roc_auc': roc_auc})
+
+            print(f"Iteration {i}:")
+            print(f"Accuracy: {accuracy:.2f}")
+            print(f"Precision: {precision:.2f}")
+            print(f"Recall: {recall:.2f}")
+            print(f"F1-score: {f1:.2f}")
+            print(f"ROC AUC: {roc_auc:.2f}")
+            print("--------------------")
+
+            if i > 10 and abs(roc_auc - prev_roc_auc) < 0.001:
+                print(f"Early stopping at iteration {i}")
+                break
+            prev_roc_auc = roc_auc
+
+        # Keep only the chosen stages. The first i stages of the full fit are exactly
+        # what a fresh fit with n_estimators=i would produce (same random_state).
+        best_stage = i
+        gb_model_i.set_params(n_estimators=best_stage)
+        gb_model_i.estimators_ = gb_model_i.estimators_[:best_stage]
+        gb_model_i.train_score_ = gb_model_i.train_score_[:best_stage]
+        if hasattr(gb_model_i, 'oob_improvement_'):
+            gb_model_i.oob_improvement_ = gb_model_i.oob_improvement_[:best_stage]
+            gb_model_i.oob_scores_ = gb_model_i.oob_scores_[:best_stage]
+            gb_model_i.oob_score_ = gb_model_i.oob_scores_[-1]
+        gb_model_i.n_estimators_ = best_stage
+
+        stage_metrics = pd.DataFrame(stage_metrics).set_index('stage')
+        print(f"Chosen stage: {best_stage}")
+        print("Per-stage metrics:")
+        print(stage_metrics.round(4).to_string())
+
+    logging.info("Performing cross-validation")
+    # Folds run in parallel; fitted fold models and predictions are cached on disk
+    with stage('cv', rows=len(y_train_fit)):
+        cv_result = cross_validate_cached(gb_model_i, X_train_fit, y_train_fit, cv=5, n_jobs=args.n_jobs,
+                                          cache_dir=CACHE_DIR)
+    cv_scores_i = cv_result.scores()
+
+    print("Part I Offense Model - Cross-validation scores:", cv_scores_i)
+    print("Part I Offense Model - Mean CV score:", cv_scores_i.mean())
+    print("Part I Offense Model - Mean CV ROC AUC:", cv_result.scores(roc_auc_score, proba=True).mean())
+
+    logging.info("Making final predictions")
     y_pred_i = gb_model_i.predict(X_test_scaled)
     y_pred_proba_i = gb_model_i.predict_proba(X_test_scaled)[:, 1]
-    
-    accuracy = accuracy_score(y_test_i, y_pred_i)
-    precision = precision_score(y_test_i, y_pred_i)
-    recall = recall_score(y_test_i, y_pred_i)
-    f1 = f1_score(y_test_i, y_pred_i)
-    roc_auc = roc_auc_score(y_test_i, y_pred_proba_i)
-    
-    print(f"Iteration {i}:")
-    print(f"Accuracy: {accuracy:.2f}")
-    print(f"Precision: {precision:.2f}")
-    print(f"Recall: {recall:.2f}")
-    print(f"F1-score: {f1:.2f}")
-    print(f"ROC AUC: {roc_auc:.2f}")
-    print("--------------------")
-
-    if i > 10 and abs(roc_auc - prev_roc_auc) < 0.001:
-        print(f"Early stopping at iteration {i}")
-        break
-    prev_roc_auc = roc_auc
-
-logging.info("Performing cross-validation")
-cv_scores_i = cross_val_score(gb_model_i, X_train_resampled, y_train_i_resampled, cv=5)
-
-print("Part I Offense Model - Cross-validation scores:", cv_scores_i)
-print("Part I Offense Model - Mean CV score:", cv_scores_i.mean())
-
-logging.info("Making final predictions")
-y_pred_i = gb_model_i.predict(X_test_scaled)
-y_pred_proba_i = gb_model_i.predict_proba(X_test_scaled)[:, 1]
-
-print("\nFinal Part I Offense Model:")
-print(f"Accuracy: {accuracy_score(y_test_i, y_pred_i):.2f}")
-print(f"Precision: {precision_score(y_test_i, y_pred_i):.2f}")
-print(f"Recall: {recall_score(y_test_i, y_pred_i):.2f}")
-print(f"F1-score: {f1_score(y_test_i, y_pred_i):.2f}")
-print(f"ROC AUC: {roc_auc_score(y_test_i, y_pred_proba_i):.2f}")
-
-feature_importance_i = gb_model_i.feature_importances_
-
-plt.figure(figsize=(10, 6))
-sns.barplot(x=feature_importance_i, y=X.columns)
-plt.title("Feature Importance for Part I Offenses")
-plt.tight_layout()
-plt.show()
-
-plt.figure(figsize=(10, 6))
-plt.hist([y_pred_proba_i[y_test_i == 0], y_pred_proba_i[y_test_i == 1]], 
-         label=['Non-offense', 'Offense'], bins=50, density=True, alpha=0.7)
-plt.xlabel("Predicted Probability")
-plt.ylabel("Density")
-plt.title("Distribution of Predicted Probabilities for Part I Offenses")
-plt.legend()
-plt.show()
-
-print("Class balance in test set:")
-print(y_test_i.value_counts(normalize=True))
\ No newline at end of file
+
+    print("\nFinal Part I Offense Model:")
+    print(f"Accuracy: {accuracy_score(y_test_i, y_pred_i):.2f}")
+    print(f"Precision: {precision_score(y_test_i, y_pred_i):.2f}")
+    print(f"Recall: {recall_score(y_test_i, y_pred_i):.2f}")
+    print(f"F1-score: {f1_score(y_test_i, y_pred_i):.2f}")
+    print(f"ROC AUC: {roc_auc_score(y_test_i, y_pred_proba_i):.2f}")
+
+    # One row per run so the two engines can be compared side by side
+    comparison_file = '../data/gb_engine_comparison.csv'
+    pd.DataFrame([{
+        'engine': args.engine,
+        'encoding': 'native' if args.engine == 'hist' else args.encoding,
+        'train_rows': X_train_fit.shape[0],
+        'fit_seconds': round(fit_seconds, 2),
+        'accuracy': accuracy_score(y_test_i, y_pred_i),
+        'roc_auc': roc_auc_score(y_test_i, y_pred_proba_i)
+    }]).to_csv(comparison_file, mode='a', index=False, header=not os.path.exists(comparison_file))
+    logging.info(f"Run appended to {comparison_file}")
+
+    # Save the model with its preprocessing so batch_score.py can reuse it
+    if args.engine == 'exact' and args.encoding == 'dense':
+        preprocessor = DenseFeaturePipeline.from_store(scaler=scaler)
+    else:
+        preprocessor = encoder
+    bundle_name = 'gradient_boost' if args.engine == 'exact' else 'hist_gradient_boost'
+    with stage('save_bundle'):
+        bundle_path = save_bundle(bundle_name, gb_model_i, preprocessor,
+                                  metrics={'accuracy': accuracy_score(y_test_i, y_pred_i),
+                                           'roc_auc': roc_auc_score(y_test_i, y_pred_proba_i)})
+    logging.info(f"Model bundle saved to {bundle_path}")
+
+    # The histogram engine has no impurity-based importances; the permutation
+    # importance below covers both engines
+    if hasattr(gb_model_i, 'feature_importances_'):
+        feature_importance_i = gb_model_i.feature_importances_
+
+        plt.figure(figsize=(10, 6))
+        sns.barplot(x=feature_importance_i, y=feature_names)
+        plt.title("Feature Importance for Part I Offenses")
+        plt.tight_layout()
+        plt.show()
+
+    # Permutation importance of the original features on a test subsample,
+    # with the test predictions above as the unpermuted baseline
+    with stage('permutation_importance', rows=len(y_test_i)):
+        permutation_importance = grouped_permutation_importance(gb_model_i, X_test_scaled, y_test_i, feature_names,
+                                                                baseline_proba=y_pred_proba_i, n_jobs=args.n_jobs)
+    print("Permutation importance (ROC AUC drop):")
+    print(permutation_importance.round(4).to_string())
+
+    plt.figure(figsize=(10, 6))
+    sns.barplot(x=permutation_importance['mean'], y=permutation_importance.index)
+    plt.xlabel("ROC AUC drop when permuted")
+    plt.title("Permutation Importance for Part I Offenses")
+    plt.tight_layout()
+    plt.show()
+
+    plt.figure(figsize=(10, 6))
+    plt.hist([y_pred_proba_i[y_test_i == 0], y_pred_proba_i[y_test_i == 1]], 
+             label=['Non-offense', 'Offense'], bins=50, density=True, alpha=0.7)
+    plt.xlabel("Predicted Probability")
+    plt.ylabel("Density")
+    plt.title("Distribution of Predicted Probabilities for Part I Offenses")
+    plt.legend()
+    plt.show()
+
+    print("Class balance in test set:")
+    print(y_test_i.value_counts(normalize=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Permutation importance of the original features, on a scoring subsample.
+
+Impurity importances are split over one-hot columns and favour
+high-cardinality features. Here each of the nine original features is
+permuted as a whole: all of its one-hot columns (``AREA NAME_Central``,
+``AREA NAME_Hollywood``, ...) are shuffled with the same row permutation, so
+each row keeps a valid encoding. The importance is the drop in ROC AUC.
+
+Permuting is done on a stratified subsample of the evaluation rows, and the
+unpermuted model's predictions, which the scripts already have, are reused
+for the baseline instead of being recomputed. The (feature, repeat)
+permutations are spread over a process pool. Each worker receives the model
+and the subsample once, when it starts, not with every task.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.metrics import roc_auc_score
+
+from cv_harness import effective_n_jobs
+from feature_store import CATEGORICAL_FEATURES
+from sampling import stratified_order
+
+SAMPLE_ROWS = 50_000
+N_REPEATS = 5
+
+
+def feature_groups(columns, categorical=CATEGORICAL_FEATURES):
+    """Map each original feature to the positions of its encoded columns."""
+    groups = {}
+    for position, column in enumerate(columns):
+        feature = next((col for col in categorical if str(column).startswith(f'{col}_')), str(column))
+        groups.setdefault(feature, []).append(position)
+    return groups
+
+
+def _positive_proba(model, X):
+    if hasattr(model, 'feature_names_in_'):
+        X = pd.DataFrame(X, columns=model.feature_names_in_, copy=False)
+    return model.predict_proba(X)[:, 1]
+
+
+_worker = {}
+
+
+def _init_worker(model, X, y):
+    _worker.update(model=model, X=X, y=y)
+
+
+def _permuted_score(columns, seed):
+    model, X, y = _worker['model'], _worker['X'], _worker['y']
+    X_permuted = X.copy()
+    order = np.random.default_rng(seed).permutation(len(X))
+    X_permuted[:, columns] = X[order][:, columns]
+    return roc_auc_score(y, _positive_proba(model, X_permuted))
+
+
+def grouped_permutation_importance(model, X, y, columns, baseline_proba=None, n_repeats=N_REPEATS,
+                                   sample_rows=SAMPLE_ROWS, n_jobs=-1, random_state=42):
+    """ROC AUC drop when each original feature is permuted.
+
+    ``baseline_proba`` are the model's Part I probabilities for the rows of
+    ``X`` (e.g. the test predictions the script already made); when given,
+    the unpermuted model is not evaluated again. Returns a DataFrame with the
+    mean and standard deviation of the drop per feature, largest first.
+    """
+    if isinstance(X, pd.DataFrame):
+        X = X.to_numpy()
+    y = np.asarray(y)
+    rows = np.sort(stratified_order(y, random_state)[:sample_rows])
+    X_sample = X[rows]
+    X_sample = X_sample.toarray() if sparse.issparse(X_sample) else np.array(X_sample)
+    y_sample = y[rows]
+
+    if baseline_proba is not None:
+        baseline = roc_auc_score(y_sample, np.asarray(baseline_proba)[rows])
+    else:
+        baseline = roc_auc_score(y_sample, _positive_proba(model, X_sample))
+
+    groups = feature_groups(columns)
+    rng = np.random.default_rng(random_state)
+    tasks = [(feature, group, int(rng.integers(2 ** 31))) for feature, group in groups.items()
+             for _ in range(n_repeats)]
+
+    n_jobs = effective_n_jobs(n_jobs, len(tasks))
+    if n_jobs == 1:
+        _init_worker(model, X_sample, y_sample)
+        scores = [_permuted_score(group, seed) for _, group, seed in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(model, X_sample, y_sample)) as pool:
+            scores = list(pool.map(_permuted_score, [group for _, group, _ in tasks],
+                                   [seed for _, _, seed in tasks]))
+
+    drops = pd.DataFrame({'feature': [feature for feature, _, _ in tasks], 'drop': baseline - np.array(scores)})
+    importance = drops.groupby('feature', sort=False)['drop'].agg(['mean', 'std'])
+    importance.attrs['baseline_roc_auc'] = baseline
+    importance.attrs['rows'] = len(rows)
+    return importance.sort_values('mean', ascending=False)
@@ -0,0 +1,185 @@
+"""Server-side hexagon aggregation for the pydeck 3D maps.
+
+``HexagonLayer`` needs every incident row in the output HTML and re-bins them
+in the browser. The helpers here aggregate in Python instead, either to H3
+cells or to fixed-radius hexagons, and build layers that carry only one row
+per cell, so the page size depends on the number of cells rather than on the
+number of incidents.
+"""
+import h3
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+from location_index import LocationIndex, decode
+
+# Default deck.gl HexagonLayer color range
+DEFAULT_COLOR_RANGE = [
+    [1, 152, 189], [73, 227, 206], [216, 254, 181],
+    [254, 237, 177], [254, 173, 84], [209, 55, 78]
+]
+
+# H3 resolution 9 cells have an edge of about 175 m, close to the 200 m
+# HexagonLayer radius used by the 3D scripts
+H3_RESOLUTION = 9
+
+METERS_PER_DEGREE = 111_320.0
+
+
+def h3_cell_counts(lat, lon, resolution=H3_RESOLUTION, by=None):
+    """Count incidents per H3 cell, optionally split by the ``by`` columns.
+
+    ``h3.latlng_to_cell`` is only called once per distinct location, which is
+    orders of magnitude fewer calls than one per incident. ``by`` is a
+    DataFrame (or dict of arrays) aligned with ``lat``/``lon``.
+    Returns a DataFrame with ``hex``, the ``by`` columns and ``count``.
+    """
+    index = LocationIndex(lat, lon)
+    location_lat, location_lon = decode(index.keys, index.precision)
+    location_cells = np.array(
+        [h3.latlng_to_cell(y, x, resolution) for y, x in zip(location_lat, location_lon)],
+        dtype=object
+    )
+
+    df = pd.DataFrame({'hex': location_cells[index.inverse]})
+    if by is not None:
+        for col, values in pd.DataFrame(by).items():
+            df[col] = np.asarray(values)
+    keys = list(df.columns)
+    return df.groupby(keys, sort=False).size().reset_index(name='count')
+
+
+def hex_bin_counts(lat, lon, radius_m=200, by=None):
+    """Count incidents per fixed-radius (pointy-top) hexagon.
+
+    A pure NumPy alternative to H3 that matches ``HexagonLayer``'s radius
+    exactly. Returns a DataFrame with ``latitude``/``longitude`` of each
+    hexagon center, the ``by`` columns and ``count``.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    lat0 = np.radians(34.0)
+    x = lon * np.cos(lat0) * METERS_PER_DEGREE / radius_m
+    y = lat * METERS_PER_DEGREE / radius_m
+
+    # Axial coordinates, rounded through cube coordinates
+    q = np.sqrt(3) / 3 * x - y / 3
+    r = 2 / 3 * y
+    cx, cz = np.rint(q), np.rint(r)
+    cy = np.rint(-q - r)
+    dx, dy, dz = np.abs(cx - q), np.abs(cy + q + r), np.abs(cz - r)
+    fix_x = (dx > dy) & (dx > dz)
+    fix_z = ~fix_x & (dz >= dy)
+    cx = np.where(fix_x, -cy - cz, cx)
+    cz = np.where(fix_z, -cx - cy, cz)
+
+    df = pd.DataFrame({'q': cx.astype(np.int64), 'r': cz.astype(np.int64)})
+    if by is not None:
+        for col, values in pd.DataFrame(by).items():
+            df[col] = np.asarray(values)
+    counts = df.groupby(list(df.columns), sort=False).size().reset_index(name='count')
+
+    center_x = np.sqrt(3) * (counts['q'] + counts['r'] / 2)
+    center_y = 1.5 * counts['r']
+    counts['longitude'] = center_x * radius_m / (np.cos(lat0) * METERS_PER_DEGREE)
+    counts['latitude'] = center_y * radius_m / METERS_PER_DEGREE
+    return counts.drop(columns=['q', 'r'])
+
+
+def cell_counts(df, method, radius_m=200, resolution=H3_RESOLUTION, by=None):
+    """Aggregate ``df`` (``latitude``/``longitude`` columns) to hexagon cells.
+
+    ``method`` is ``'h3'`` for H3 cells or ``'hex'`` for fixed-radius bins.
+    The result always carries the ``latitude``/``longitude`` of each cell
+    center so labels can be placed per cell.
+    """
+    if method == 'h3':
+        cells = h3_cell_counts(df['latitude'], df['longitude'], resolution, by=by)
+        centers = {cell: h3.cell_to_latlng(cell) for cell in cells['hex'].unique()}
+        cells['latitude'] = cells['hex'].map(lambda cell: centers[cell][0])
+        cells['longitude'] = cells['hex'].map(lambda cell: centers[cell][1])
+        return cells
+    if method == 'hex':
+        return hex_bin_counts(df['latitude'], df['longitude'], radius_m, by=by)
+    raise ValueError(f"Unknown aggregation method: {method}")
+
+
+def add_styling(cells, color_range=DEFAULT_COLOR_RANGE, elevation_range=(0, 1000), domain=None):
+    """Add ``color`` and ``elevation`` columns the way ``HexagonLayer`` scales them.
+
+    Colors use a quantize scale over the count domain and elevations are a
+    linear scale of the count onto ``elevation_range``. Pass a shared
+    ``domain`` of (min, max) counts to keep several layers comparable.
+    """
+    cells = cells.copy()
+    counts = cells['count'].to_numpy(dtype=np.float64)
+    if domain is None:
+        domain = (counts.min(), counts.max()) if len(counts) else (0, 0)
+    lo, hi = domain
+    span = hi - lo if hi > lo else 1
+    bucket = np.clip(((counts - lo) / span * len(color_range)).astype(int), 0, len(color_range) - 1)
+    cells['color'] = [color_range[i] for i in bucket]
+    elevation = elevation_range[0] + counts / max(hi, 1) * (elevation_range[1] - elevation_range[0])
+    cells['elevation'] = np.round(elevation, 1)
+    return cells
+
+
+def _layer_columns(cells, position_columns):
+    """Keep only the columns a layer renders or shows in its tooltip."""
+    extra = [col for col in ['year'] if col in cells.columns]
+    return cells[position_columns + extra + ['count']].round({'longitude': 5, 'latitude': 5})
+
+
+def h3_hexagon_layer(cells, elevation_scale=50, color_range=DEFAULT_COLOR_RANGE, domain=None, **kwargs):
+    """``H3HexagonLayer`` over pre-aggregated ``h3_cell_counts`` output."""
+    return pdk.Layer(
+        'H3HexagonLayer',
+        data=add_styling(_layer_columns(cells, ['hex']), color_range, domain=domain),
+        get_hexagon='hex',
+        get_fill_color='color',
+        get_elevation='elevation',
+        elevation_scale=elevation_scale,
+        extruded=True,
+        coverage=1,
+        pickable=True,
+        **kwargs
+    )
+
+
+def hex_column_layer(cells, radius_m=200, elevation_scale=50, color_range=DEFAULT_COLOR_RANGE, domain=None,
+                     **kwargs):
+    """Hexagonal ``ColumnLayer`` over pre-aggregated ``hex_bin_counts`` output."""
+    return pdk.Layer(
+        'ColumnLayer',
+        data=add_styling(_layer_columns(cells, ['longitude', 'latitude']), color_range, domain=domain),
+        get_position=['longitude', 'latitude'],
+        get_fill_color='color',
+        get_elevation='elevation',
+        elevation_scale=elevation_scale,
+        radius=radius_m,
+        disk_resolution=6,
+        extruded=True,
+        coverage=1,
+        pickable=True,
+        **kwargs
+    )
+
+
+def cell_layer(cells, method, radius_m=200, elevation_scale=50, color_range=DEFAULT_COLOR_RANGE, domain=None,
+               **kwargs):
+    """Build the layer matching ``method`` for ``cell_counts`` output."""
+    if method == 'h3':
+        return h3_hexagon_layer(cells, elevation_scale, color_range, domain, **kwargs)
+    if method == 'hex':
+        return hex_column_layer(cells, radius_m, elevation_scale, color_range, domain, **kwargs)
+    raise ValueError(f"Unknown aggregation method: {method}")
+
+
+def aggregated_layer(df, method, radius_m=200, resolution=H3_RESOLUTION, elevation_scale=50,
+                     color_range=DEFAULT_COLOR_RANGE, **kwargs):
+    """Aggregate ``df`` (``latitude``/``longitude`` columns) and build its layer.
+
+    ``method`` is ``'h3'`` for H3 cells or ``'hex'`` for fixed-radius bins.
+    """
+    cells = cell_counts(df, method, radius_m, resolution)
+    return cell_layer(cells, method, radius_m, elevation_scale, color_range, **kwargs)
@@ -0,0 +1,80 @@
+"""Histogram gradient boosting engine for the Part I classifier.
+
+``HistGradientBoostingClassifier`` bins every feature into at most 255
+buckets and finds splits on the histograms with OpenMP threads, so it trains
+on the full, non-undersampled data. Here it works on the raw features: the
+five code-like columns are native categoricals instead of one-hot columns,
+and missing values stay NaN (the trees learn which side they go to) instead
+of going through ``SimpleImputer``.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier
+
+from feature_store import FEATURES
+
+HIST_CATEGORICAL_FEATURES = ['AREA NAME', 'Vict Sex', 'Vict Descent', 'Premis Cd', 'Weapon Used Cd']
+
+# Native categoricals may have at most max_bins (255) categories; the rarest
+# ones beyond that share a single "other" code
+MAX_CATEGORIES = 255
+
+
+class HistFeatureEncoder:
+    """Encode the raw features as a float32 array for the histogram engine.
+
+    Numeric features pass through unchanged (NaN kept). Categorical features
+    become codes ``0..k-1`` ordered by training frequency; categories beyond
+    the ``MAX_CATEGORIES - 1`` most frequent, and categories unseen during
+    ``fit``, map to one shared "other" code. Missing values stay NaN.
+    """
+
+    def __init__(self, features=FEATURES, categorical=HIST_CATEGORICAL_FEATURES, max_categories=MAX_CATEGORIES):
+        self.features = list(features)
+        self.categorical = list(categorical)
+        self.max_categories = max_categories
+
+    @property
+    def categorical_mask(self):
+        return np.array([col in self.categorical for col in self.features])
+
+    def fit(self, df):
+        self.categories_ = {}
+        for col in self.categorical:
+            counts = df[col].value_counts(dropna=True)
+            counts = counts[counts > 0]
+            self.categories_[col] = list(counts.index[:self.max_categories - 1])
+        return self
+
+    def transform(self, df):
+        X = np.empty((len(df), len(self.features)), dtype=np.float32)
+        for j, col in enumerate(self.features):
+            if col not in self.categorical:
+                X[:, j] = df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+                continue
+            categories = self.categories_[col]
+            codes = pd.Categorical(df[col], categories=categories).codes.astype(np.float32)
+            # -1 means missing or not a known category: keep NaN for missing,
+            # use the shared "other" code for everything else
+            other = df[col].notna().to_numpy() & (codes < 0)
+            codes[codes < 0] = np.nan
+            codes[other] = len(categories)
+            X[:, j] = codes
+        return X
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+
+def make_hist_model(encoder, max_iter=300, learning_rate=0.1, random_state=42, **params):
+    """Histogram boosting with native categoricals and validation-based early stopping."""
+    return HistGradientBoostingClassifier(
+        max_iter=max_iter,
+        learning_rate=learning_rate,
+        categorical_features=encoder.categorical_mask,
+        early_stopping=True,
+        validation_fraction=0.1,
+        n_iter_no_change=10,
+        random_state=random_state,
+        **params
+    )
@@ -0,0 +1,137 @@
+"""Minimal asyncio HTTP/1.1 plumbing for the local JSON services.
+
+The scoring server and the query API only need JSON requests and responses
+on localhost, so they are served with ``asyncio.start_server`` and no web
+framework. Connections are kept alive between requests. ``HttpClient`` and
+``latency_report`` are shared by the load-test scripts.
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+class HttpError(Exception):
+    """Raised by a handler to answer with ``status`` and an error message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def read_request(reader):
+    """Read one request; returns ``None`` when the client closed the connection."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, target, version = request_line.decode('latin-1').split()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    url = urlsplit(target)
+    keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+    return method, url.path, dict(parse_qsl(url.query)), body, keep_alive
+
+
+def encode_response(status, payload, keep_alive=True):
+    """HTTP response for ``payload``; ``bytes`` payloads are sent as already-encoded JSON."""
+    body = payload if isinstance(payload, bytes) else json.dumps(payload, separators=(',', ':')).encode()
+    head = (f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    return head.encode('latin-1') + body
+
+
+async def serve(handler, host='127.0.0.1', port=8765):
+    """Serve ``await handler(method, path, query, body) -> payload`` forever.
+
+    ``payload`` is JSON-serializable, or ``bytes`` of already-encoded JSON.
+    """
+
+    async def connection(reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, query, body, keep_alive = request
+                try:
+                    status, payload = 200, await handler(method, path, query, body)
+                except HttpError as error:
+                    status, payload = error.status, {'error': str(error)}
+                except Exception as error:
+                    logging.exception(f"{method} {path} failed")
+                    status, payload = 500, {'error': str(error)}
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(connection, host, port)
+    logging.info(f"Listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+class HttpClient:
+    """Keep-alive JSON client for one connection."""
+
+    def __init__(self, host='127.0.0.1', port=8765):
+        self.host = host
+        self.port = port
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def request(self, method, path, payload=None):
+        body = b'' if payload is None else json.dumps(payload).encode()
+        self.writer.write(f'{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n'
+                          f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'
+                          .encode('latin-1') + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def latency_report(latencies, elapsed, n_errors=0):
+    """Latency percentiles (ms) and throughput of a load test."""
+    latencies = np.asarray(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': n_errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p90_ms': round(float(np.percentile(latencies, 90)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+        'max_ms': round(float(latencies.max()), 3)
+    }
@@ -0,0 +1,82 @@
+import time
+import geopandas as gpd
+import numpy as np
+import folium
+from crime_density import kde_by_group, raster_overlay, contour_geojson
+from stage_trace import stage
+
+# Grid resolution and smoothing bandwidth in meters
+CELL_SIZE_M = 250
+BANDWIDTH_M = 500
+
+# Load the processed data
+with stage('read_gpkg') as s:
+    gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+    gdf['Year'] = gdf['DATE OCC'].dt.year
+    s.rows = len(gdf)
+
+start = time.perf_counter()
+
+# One surface per year and offense class (Part 1-2 == 1 or 2), binned and
+# convolved in a single pass
+with stage('kde', rows=len(gdf)):
+    keys, grid = kde_by_group(gdf, ['Year', 'Part 1-2'], cell_size_m=CELL_SIZE_M, bandwidth_m=BANDWIDTH_M)
+surfaces = {key: grid.values[i] for i, key in enumerate(keys)}
+years = sorted({year for year, _ in keys})
+
+print(f"Computed {len(keys)} density surfaces on a {grid.values.shape[1]}x{grid.values.shape[2]} grid "
+      f"in {time.perf_counter() - start:.2f}s")
+
+# Save the raw rasters for further analysis
+with stage('save_rasters'):
+    np.savez_compressed(
+        '../data/kde_surfaces_2010_2023.npz',
+        values=grid.values,
+        keys=np.array(keys),
+        bounds=np.array(grid.folium_bounds),
+        cell_size_m=CELL_SIZE_M,
+        bandwidth_m=BANDWIDTH_M
+    )
+
+offense_classes = {
+    'part1': ('Part I Offenses', [1]),
+    'all': ('All Offenses', [1, 2])
+}
+
+for slug, (label, parts) in offense_classes.items():
+    m = folium.Map(
+        location=[34.0522, -118.2437],
+        zoom_start=10,
+        tiles='cartodbpositron'
+    )
+
+    # One raster layer per year; only the latest is shown initially
+    for year in years:
+        values = sum(surfaces[(year, part)] for part in parts if (year, part) in surfaces)
+        raster_overlay(grid, values=values, name=f'{label} {year}', show=(year == years[-1])).add_to(m)
+
+    # Iso-density lines for the latest year
+    latest = sum(surfaces[(years[-1], part)] for part in parts if (years[-1], part) in surfaces)
+    folium.GeoJson(
+        contour_geojson(grid, values=latest),
+        name=f'{label} {years[-1]} contours',
+        style_function=lambda x: {'color': '#800026', 'weight': 1}
+    ).add_to(m)
+
+    folium.LayerControl(collapsed=False).add_to(m)
+
+    # Add title
+    title_html = f'''
+    <div style="position: fixed;
+        bottom: 10px; left: 50px; width: 500px; height: 50px;
+        background-color: white; border:2px solid grey; z-index:9999;
+        font-size:16px; padding: 8px;">
+        {label} Kernel Density in Los Angeles ({years[0]} - {years[-1]})
+    </div>
+    '''
+    m.get_root().html.add_child(folium.Element(title_html))
+
+    # Save map
+    with stage('save_map'):
+        m.save(f'../maps/la_{slug}_offenses_kde.html')
+    print(f"Saved ../maps/la_{slug}_offenses_kde.html")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""One command-line entry point for the scripts.
+
+    python lacrime.py ingest
+    python lacrime.py summary hour
+    python lacrime.py geogrid --variant 3
+    python lacrime.py top-n --n 50 --aggregate h3
+    python lacrime.py train brf --n-jobs 4
+    python lacrime.py score new.csv --model brf --output scores.csv
+
+Nothing heavier than the standard library is imported until a subcommand
+runs, and then only the stack that subcommand's script needs, so ``--help``
+returns immediately. ``top-n``, ``train`` and ``score`` pass any further
+options on to their script (``python lacrime.py top-n --help`` shows the
+script's options); the model name of ``train`` may come before or after
+them. Like the scripts, run it from this directory so the
+``../data`` and ``../maps`` paths resolve.
+"""
+import argparse
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SUMMARIES = {
+    'year': 'analyze-crime-data-summary.py',
+    'hour': 'analyze-by-hour.py',
+    'dayofweek': 'analyze-by-dayofweek.py'
+}
+
+GEOGRIDS = {
+    1: '2022_geogrid_1.py',
+    2: '2022_geogrid_2.py',
+    3: '2022_geogrid_3.py',
+    4: '2022_geogrid_4.py',
+    5: '2022_geogrid_5.py'
+}
+
+# model: (script, arguments)
+MODELS = {
+    'decision_tree': ('decision-tree-classifier-part-I.py', []),
+    'brf': ('rfbc_partone.py', []),
+    'gradient_boost': ('gradient-boost-part-I.py', ['--engine', 'exact']),
+    'hist_gradient_boost': ('gradient-boost-part-I.py', ['--engine', 'hist']),
+    'neural': ('neural-classifier-part-I.py', []),
+    'online': ('online_model.py', [])
+}
+
+
+def run_script(script, args=()):
+    """Run a script as ``__main__`` in this process with ``args`` as its command line."""
+    import runpy
+
+    path = os.path.join(SCRIPT_DIR, script)
+    sys.argv = [path] + list(args)
+    runpy.run_path(path, run_name='__main__')
+
+
+def run_main(module, args=()):
+    """Call ``main(args)`` of a sibling module that has one."""
+    import importlib
+
+    sys.argv = [os.path.join(SCRIPT_DIR, module + '.py')] + list(args)
+    importlib.import_module(module).main(list(args))
+
+
+def ingest(args, extra):
+    run_script('process-crime-data.py')
+
+
+def summary(args, extra):
+    run_script(SUMMARIES[args.by])
+
+
+def geogrid(args, extra):
+    run_script(GEOGRIDS[args.variant])
+
+
+def top_n(args, extra):
+    run_main('top_n_maps', extra)
+
+
+def train(args, extra):
+    # The model is the first model name on the command line, so it may follow
+    # the script's options (e.g. ``train --n-jobs 4 brf``)
+    model = next((arg for arg in extra if arg in MODELS), None)
+    if model is None:
+        if '-h' in extra or '--help' in extra:
+            args.parser.print_help()
+            return
+        args.parser.error(f"a model is required (choose from {', '.join(MODELS)})")
+    extra = list(extra)
+    extra.remove(model)
+    script, arguments = MODELS[model]
+    if model == 'online':
+        # Run as an imported module so the pickled encoder refers to online_model
+        run_main('online_model', arguments + extra)
+    else:
+        run_script(script, arguments + extra)
+
+
+def score(args, extra):
+    run_main('batch_score', extra)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='lacrime', description='LA crime data analysis')
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    command = commands.add_parser('ingest', help='combine the LAPD exports into the processed GeoPackage')
+    command.set_defaults(handler=ingest)
+
+    command = commands.add_parser('summary', help='summary statistics and charts')
+    command.add_argument('by', nargs='?', choices=list(SUMMARIES), default='year')
+    command.set_defaults(handler=summary)
+
+    command = commands.add_parser('geogrid', help='2022 H3 hexagon maps')
+    command.add_argument('--variant', type=int, choices=list(GEOGRIDS), default=1,
+                         help='1: Part I, city; 2: Part I, county; 3: Part I, clipped to the county; '
+                              '4: Part I, 2 sq km cells; 5: all offenses')
+    command.set_defaults(handler=geogrid)
+
+    # The remaining commands pass further options on to their script (--help included)
+    command = commands.add_parser('top-n', help='3D maps of the top N offense locations (top_n_maps.py options)',
+                                  add_help=False)
+    command.set_defaults(handler=top_n, forward=True)
+
+    command = commands.add_parser('train', help="train and save a model (the training script's options)",
+                                  usage=f"lacrime train {{{','.join(MODELS)}}} [script options]", add_help=False,
+                                  description="Other options, before or after the model name, go to the model's "
+                                              "training script (lacrime train MODEL --help lists them).")
+    command.set_defaults(handler=train, forward=True, parser=command)
+
+    command = commands.add_parser('score', help='score incidents with a saved model (batch_score.py options)',
+                                  add_help=False)
+    command.set_defaults(handler=score, forward=True)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and not getattr(args, 'forward', False):
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.handler(args, extra)
+
+
+if __name__ == '__main__':
+    main()
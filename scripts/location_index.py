@@ -0,0 +1,75 @@
+"""Integer-keyed index of incident locations.
+
+Each (latitude, longitude) pair is quantized to a fixed number of decimal
+places and packed into one int64 key, so counting incidents per location is a
+single hash factorize plus ``np.bincount`` over one integer column instead of
+a groupby on two float columns. Top-K locations are picked with
+``np.argpartition`` and their incidents are selected with a boolean row mask
+rather than a merge.
+"""
+import numpy as np
+import pandas as pd
+
+# LAPD publishes LAT/LON rounded to 4 decimal places (about 11 m)
+PRECISION = 4
+
+
+def encode(lat, lon, precision=PRECISION):
+    """Pack coordinate pairs into int64 keys at ``precision`` decimal places."""
+    scale = 10 ** precision
+    lat_q = np.rint((np.asarray(lat, dtype=np.float64) + 90) * scale).astype(np.int64)
+    lon_q = np.rint((np.asarray(lon, dtype=np.float64) + 180) * scale).astype(np.int64)
+    return lat_q * (360 * scale + 1) + lon_q
+
+
+def decode(keys, precision=PRECISION):
+    """Inverse of ``encode``; returns (lat, lon) arrays."""
+    scale = 10 ** precision
+    lat_q, lon_q = np.divmod(np.asarray(keys, dtype=np.int64), 360 * scale + 1)
+    return lat_q / scale - 90, lon_q / scale - 180
+
+
+class LocationIndex:
+    """Distinct locations of a set of incidents and the row-to-location map.
+
+    ``keys`` holds the distinct location keys in order of first appearance,
+    ``inverse`` maps each input row to its position in ``keys`` and ``counts``
+    is the number of rows at each location.
+    """
+
+    def __init__(self, lat, lon, precision=PRECISION):
+        self.precision = precision
+        self.inverse, self.keys = pd.factorize(encode(lat, lon, precision))
+        self.counts = np.bincount(self.inverse, minlength=len(self.keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def counts_where(self, mask):
+        """Count only the rows where ``mask`` is true, per location."""
+        return np.bincount(self.inverse, weights=np.asarray(mask), minlength=len(self.keys)).astype(np.int64)
+
+    def top_k(self, k, counts=None):
+        """Return location positions of the ``k`` largest counts, largest first."""
+        counts = self.counts if counts is None else counts
+        k = min(k, len(counts))
+        if k == 0:
+            return np.array([], dtype=np.int64)
+        top = np.argpartition(counts, len(counts) - k)[-k:]
+        return top[np.argsort(-counts[top], kind='stable')]
+
+    def row_mask(self, positions):
+        """Boolean mask of the input rows located at any of ``positions``."""
+        selected = np.zeros(len(self.keys), dtype=bool)
+        selected[positions] = True
+        return selected[self.inverse]
+
+    def locations(self, positions, counts=None):
+        """DataFrame of latitude, longitude and count for ``positions``."""
+        counts = self.counts if counts is None else counts
+        lat, lon = decode(self.keys[positions], self.precision)
+        return pd.DataFrame({
+            'latitude': lat,
+            'longitude': lon,
+            'count': counts[positions]
+        })
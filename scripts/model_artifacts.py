@@ -0,0 +1,177 @@
+"""Versioned model bundles for scoring new incidents without retraining.
+
+A bundle is the fitted model together with the preprocessing it was trained
+behind (one-hot columns, imputation medians, scaler, or one of the fitted
+encoders), saved under ``../models/<name>/v<k>/``:
+
+    bundle.joblib    preprocessing and, for scikit-learn models, the model
+    model.keras      the network, for the Keras model
+    manifest.json    version, creation time, feature spec, data version,
+                     library versions and test metrics
+
+Each save writes the next version; ``load_bundle(name)`` loads the latest.
+Bundles take the nine raw features (see ``incident_features``) and return
+Part I probabilities, so any incident file with the LAPD columns can be
+scored by ``batch_score.py``.
+"""
+import json
+import os
+import platform
+from dataclasses import dataclass
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from feature_store import CATEGORICAL_FEATURES, FEATURE_SPEC, FEATURES, data_version, load_manifest
+
+ARTIFACT_DIR = '../models'
+
+
+class DenseFeaturePipeline:
+    """The feature store encoding applied to new raw rows.
+
+    One-hot encodes like ``encode_features`` and aligns to the training
+    columns (categories not seen in training are dropped), then optionally
+    fills NaN with the training medians and applies a fitted scaler.
+    """
+
+    def __init__(self, columns, medians=None, scaler=None):
+        self.columns = list(columns)
+        self.medians = None if medians is None else np.asarray(medians, dtype=np.float32)
+        self.scaler = scaler
+
+    @classmethod
+    def from_store(cls, impute=True, scaler=None):
+        """Pipeline matching ``load_features(impute)`` followed by ``scaler``."""
+        manifest, _ = load_manifest()
+        return cls(manifest['columns'], manifest['medians'] if impute else None, scaler)
+
+    def transform(self, df):
+        X = pd.get_dummies(df[FEATURES], columns=CATEGORICAL_FEATURES)
+        X = X.reindex(columns=self.columns, fill_value=0).to_numpy(dtype=np.float32, na_value=np.nan)
+        if self.medians is not None:
+            X = np.where(np.isnan(X), self.medians, X)
+        if self.scaler is not None:
+            if hasattr(self.scaler, 'feature_names_in_'):
+                X = pd.DataFrame(X, columns=self.columns, copy=False)
+            X = self.scaler.transform(X)
+        return X
+
+
+def scaler_from_moments(mean, scale):
+    """A fitted ``StandardScaler`` with the given column means and scales."""
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(mean, dtype=np.float64)
+    scaler.scale_ = np.asarray(scale, dtype=np.float64)
+    scaler.var_ = scaler.scale_ ** 2
+    scaler.n_features_in_ = len(scaler.mean_)
+    scaler.n_samples_seen_ = 0
+    return scaler
+
+
+def incident_features(df):
+    """The nine model features of incident rows.
+
+    Rows from the processed GeoPackage already carry ``Hour``, ``DayOfWeek``
+    and ``Month``; for raw LAPD export rows they are derived from
+    ``DATE OCC`` and ``TIME OCC`` as process-crime-data.py derives them.
+    """
+    if not {'Hour', 'DayOfWeek', 'Month'}.issubset(df.columns):
+        df = df.copy()
+        date = pd.to_datetime(df['DATE OCC'], format='%m/%d/%Y %I:%M:%S %p')
+        time_occ = df['TIME OCC'].astype(str).str.zfill(4)
+        df['Hour'] = pd.to_datetime(time_occ, format='%H%M', errors='coerce').dt.hour
+        df['DayOfWeek'] = date.dt.dayofweek
+        df['Month'] = date.dt.month
+    return df[FEATURES]
+
+
+@dataclass
+class ModelBundle:
+    name: str
+    version: str
+    model: object
+    preprocessor: object
+    manifest: dict
+
+    def transform(self, df):
+        return self.preprocessor.transform(incident_features(df))
+
+    def predict_proba(self, df, batch_size=65536):
+        """Part I probability for each incident row of ``df``."""
+        X = self.transform(df)
+        if hasattr(self.model, 'feature_names_in_'):
+            X = pd.DataFrame(X, columns=self.model.feature_names_in_, copy=False)
+        if hasattr(self.model, 'predict_proba'):
+            return self.model.predict_proba(X)[:, 1]
+        return self.model.predict(X, batch_size=batch_size, verbose=0).ravel()
+
+
+def _versions(name, artifact_dir=ARTIFACT_DIR):
+    path = os.path.join(artifact_dir, name)
+    if not os.path.isdir(path):
+        return []
+    return sorted(int(entry[1:]) for entry in os.listdir(path)
+                  if entry.startswith('v') and entry[1:].isdigit()
+                  and os.path.exists(os.path.join(path, entry, 'manifest.json')))
+
+
+def save_bundle(name, model, preprocessor, metrics=None, artifact_dir=ARTIFACT_DIR):
+    """Save ``model`` and ``preprocessor`` as the next version of ``name``.
+
+    Returns the bundle directory.
+    """
+    versions = _versions(name, artifact_dir)
+    version = f'v{versions[-1] + 1 if versions else 1}'
+    path = os.path.join(artifact_dir, name, version)
+    os.makedirs(path, exist_ok=True)
+
+    keras = not hasattr(model, 'predict_proba')
+    if keras:
+        model.save(os.path.join(path, 'model.keras'))
+        joblib.dump({'preprocessor': preprocessor}, os.path.join(path, 'bundle.joblib'))
+    else:
+        joblib.dump({'model': model, 'preprocessor': preprocessor}, os.path.join(path, 'bundle.joblib'))
+
+    manifest = {
+        'name': name,
+        'version': version,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'model': type(model).__name__,
+        'format': 'keras' if keras else 'joblib',
+        'preprocessor': type(preprocessor).__name__,
+        'feature_spec': FEATURE_SPEC,
+        'data_version': data_version(),
+        'python': platform.python_version(),
+        'sklearn': sklearn.__version__,
+        'metrics': {key: float(value) for key, value in (metrics or {}).items()}
+    }
+    # The manifest is written last so a partial bundle is never loaded
+    with open(os.path.join(path, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return path
+
+
+def load_bundle(name, version=None, artifact_dir=ARTIFACT_DIR):
+    """Load a saved bundle; the latest version unless ``version`` is given."""
+    if version is None:
+        versions = _versions(name, artifact_dir)
+        if not versions:
+            raise FileNotFoundError(f"No saved bundle named '{name}' in {artifact_dir}")
+        version = f'v{versions[-1]}'
+    path = os.path.join(artifact_dir, name, version)
+    with open(os.path.join(path, 'manifest.json')) as file:
+        manifest = json.load(file)
+
+    contents = joblib.load(os.path.join(path, 'bundle.joblib'))
+    if manifest['format'] == 'keras':
+        from tensorflow import keras
+        model = keras.models.load_model(os.path.join(path, 'model.keras'))
+    else:
+        model = contents['model']
+    return ModelBundle(name, version, model, contents['preprocessor'], manifest)
@@ -1,41 +1,78 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+import argparse
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--batch-size', type=int, default=1024)
+parser.add_argument('--epochs', type=int, default=60)
+parser.add_argument('--patience', type=int, default=5, help='epochs without val_loss improvement before stopping')
+parser.add_argument('--parallel-calls', type=int, default=None,
+                    help='parallel batch reads in the input pipeline (default: tuned by tf.data)')
+parser.add_argument('--intra-op-threads', type=int, default=0, help='threads inside one op (0: TensorFlow default)')
+parser.add_argument('--inter-op-threads', type=int, default=0, help='ops run in parallel (0: TensorFlow default)')
+args = parser.parse_args()
+
+# TensorFlow takes seconds to import, so it is loaded only once the arguments are valid
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense
+from tensorflow.keras.callbacks import Callback, EarlyStopping
 import matplotlib.pyplot as plt
-import geopandas as gpd
+from feature_store import load_arrays
+from streaming_input import split_indices, streaming_scaler, make_dataset
+from model_artifacts import DenseFeaturePipeline, save_bundle, scaler_from_moments
+from stage_trace import stage
+
+tf.config.threading.set_intra_op_parallelism_threads(args.intra_op_threads)
+tf.config.threading.set_inter_op_parallelism_threads(args.inter_op_threads)
+
+
+class Throughput(Callback):
+    """Print the training samples per second of every epoch."""
 
-# Load the data
-gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+    def __init__(self, n_samples):
+        super().__init__()
+        self.n_samples = n_samples
+        self.rates = []
 
-# Create target variable
-gdf['Part_I_Offense'] = (gdf['Part 1-2'] == 1).astype(int)
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.perf_counter()
 
-# Select features
-features = ['Hour', 'DayOfWeek', 'Month', 'AREA NAME', 'Vict Age', 'Vict Sex', 'Vict Descent', 'Premis Cd', 'Weapon Used Cd']
+    def on_epoch_end(self, epoch, logs=None):
+        rate = self.n_samples / (time.perf_counter() - self.start)
+        self.rates.append(rate)
+        print(f"Epoch {epoch + 1}: {rate:,.0f} samples/s")
 
-# Prepare the data
-X = pd.get_dummies(gdf[features], columns=['AREA NAME', 'Vict Sex', 'Vict Descent'])
-y = gdf['Part_I_Offense']
 
-# Split the data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+# Memory-map the cached feature matrix (built from the GeoPackage on first use);
+# batches are read from disk as training needs them
+with stage('load') as s:
+    X, y, manifest = load_arrays()
+    s.rows = len(y)
+medians = np.asarray(manifest['medians'])
 
-# Normalize numerical features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+# Split the data (same test rows as train_test_split, last 20% of train for validation)
+train_rows, val_rows, test_rows = split_indices(len(y))
 
-# Visualize feature distributions
-X.hist(figsize=(20, 15))
+# Normalize features with statistics computed chunk by chunk over the training rows
+with stage('encode', rows=len(train_rows)):
+    mean, scale = streaming_scaler(X, train_rows, medians)
+
+train_ds = make_dataset(X, y, train_rows, medians, mean, scale, batch_size=args.batch_size, shuffle=True,
+                        parallel_calls=args.parallel_calls)
+val_ds = make_dataset(X, y, val_rows, medians, mean, scale, batch_size=args.batch_size,
+                      parallel_calls=args.parallel_calls)
+
+# Visualize feature distributions on a sample of rows
+sample_rows = np.sort(np.random.default_rng(42).choice(len(y), size=min(len(y), 100_000), replace=False))
+pd.DataFrame(X[sample_rows], columns=manifest['columns']).hist(figsize=(20, 15))
 plt.tight_layout()
 plt.show()
 
 # Create and compile the model
 model = Sequential([
-    Dense(64, activation='relu', input_shape=(X_train_scaled.shape[1],)),
+    Dense(64, activation='relu', input_shape=(X.shape[1],)),
     Dense(32, activation='relu'),
     Dense(16, activation='relu'),
     Dense(1, activation='sigmoid')
@@ -43,9 +80,20 @@ model = Sequential([
 
 model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
 
-# Train the model
-history = model.fit(X_train_scaled, y_train, epochs=60, batch_size=32, 
-                    validation_split=0.2, verbose=1)
+# Train the model, stopping once validation loss stops improving
+throughput = Throughput(len(train_rows))
+early_stopping = EarlyStopping(monitor='val_loss', patience=args.patience, restore_best_weights=True)
+with stage('fit', rows=len(train_rows)):
+    history = model.fit(train_ds, validation_data=val_ds, epochs=args.epochs,
+                        callbacks=[early_stopping, throughput], verbose=1)
+print(f"Trained {len(history.history['loss'])} epochs at {np.mean(throughput.rates):,.0f} samples/s "
+      f"(batch size {args.batch_size})")
+
+# Save the network with its imputation and scaling so batch_score.py can reuse it
+preprocessor = DenseFeaturePipeline(manifest['columns'], medians, scaler_from_moments(mean, scale))
+with stage('save_bundle'):
+    bundle_path = save_bundle('neural', model, preprocessor, metrics={'val_loss': min(history.history['val_loss'])})
+print(f"Model bundle saved to {bundle_path}")
 
 # Plot accuracy
 plt.figure(figsize=(10, 6))
@@ -65,4 +113,4 @@ plt.title('Model Loss')
 plt.xlabel('Epoch')
 plt.ylabel('Loss')
 plt.legend()
-plt.show()
\ No newline at end of file
+plt.show()
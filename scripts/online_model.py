@@ -0,0 +1,286 @@
+"""Online Part I classifier, updated from monthly incident deltas.
+
+The other classifiers are retrained from scratch on 2010-2023 whenever the
+data changes. This model is a logistic regression trained by stochastic
+gradient descent (``SGDClassifier.partial_fit``), so a new month of incidents
+updates it in place, in a few mini-batches.
+
+The nine features are hashed rather than one-hot encoded against a fixed
+column list: every value of ``Hour``, ``DayOfWeek``, ``Month``,
+``AREA NAME``, ``Vict Sex``, ``Vict Descent``, ``Premis Cd`` and
+``Weapon Used Cd`` becomes a ``feature=value`` token hashed into
+``2**20`` columns, and ``Vict Age`` is standardized with constants fixed at
+the initial fit. A premise code or area that appears for the first time
+simply gets its own column, with no refit.
+
+    python online_model.py init                      # initial fit on the feature store
+    python online_model.py update new_month.csv [--month 2024-01] [--reference brf]
+
+Before each update the delta is scored with the current online model and the
+last full model (``--reference``, a saved bundle), then checked for drift
+against the feature store the full model was trained on: the population
+stability index (PSI) of every feature, the Part I rate and both models'
+ROC AUC. The report is appended to ``../data/online_drift.csv`` and a warning
+is logged when drift calls for a full retrain. Every update is saved as the
+next version of the ``online_sgd`` bundle.
+"""
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.utils import murmurhash3_32
+
+from feature_store import CATEGORICAL_FEATURES, FEATURES, load_raw_features
+from model_artifacts import incident_features, load_bundle, save_bundle
+from sampling import split_rows
+
+BUNDLE_NAME = 'online_sgd'
+DRIFT_LOG = '../data/online_drift.csv'
+N_HASHED = 2 ** 20
+SCALED_FEATURES = ['Vict Age']
+BATCH_ROWS = 50_000
+# PSI above this is conventionally a significant population shift
+PSI_ALERT = 0.2
+# Retrain in full when the online model trails the full model by more than this
+ROC_AUC_ALERT = 0.02
+PROFILE_TOP_VALUES = 30
+# A monthly delta holds a single month by construction; its PSI is reported but not alerted on
+DRIFT_EXEMPT = ['Month']
+
+
+def value_keys(column):
+    """Codes into a list of string keys for the values of ``column``.
+
+    Numeric codes are written as integers (``101``, not ``101.0``) whether
+    they were read as int or float, and missing values map to the last key,
+    ``'missing'``.
+    """
+    if not isinstance(column.dtype, pd.CategoricalDtype) and column.name not in CATEGORICAL_FEATURES:
+        column = pd.to_numeric(column, errors='coerce')
+    codes, uniques = pd.factorize(column)
+    keys = [str(int(value)) if isinstance(value, (float, np.floating)) else str(value) for value in uniques]
+    codes = np.where(codes < 0, len(keys), codes)
+    return codes, keys + ['missing']
+
+
+class HashedFeatureEncoder:
+    """Hash ``feature=value`` tokens into a fixed number of sparse columns.
+
+    Columns ``[0, n_hashed)`` hold the hashed tokens (missing values hash as
+    ``feature=missing``); the last columns are the standardized
+    ``SCALED_FEATURES`` with missing values at the training mean. Only the
+    scaling constants are fitted, so unseen values never need a refit.
+    """
+
+    def __init__(self, n_hashed=N_HASHED, scaled=SCALED_FEATURES):
+        self.n_hashed = n_hashed
+        self.scaled = list(scaled)
+        self.hashed = [col for col in FEATURES if col not in self.scaled]
+
+    def fit(self, df):
+        values = df[self.scaled].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        self.means_ = np.nanmean(values, axis=0)
+        scales = np.nanstd(values, axis=0)
+        self.scales_ = np.where(scales > 0, scales, 1.0)
+        return self
+
+    def _token_columns(self, column, name):
+        """Hashed column of each row's ``name=value`` token."""
+        codes, keys = value_keys(column)
+        # Hash each distinct value once
+        indices = np.array([murmurhash3_32(f'{name}={key}', positive=True) % self.n_hashed for key in keys],
+                           dtype=np.int64)
+        return indices[codes]
+
+    def transform(self, df):
+        n = len(df)
+        columns = [self._token_columns(df[col], col) for col in self.hashed]
+        values = df[self.scaled].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        scaled = (np.where(np.isnan(values), self.means_, values) - self.means_) / self.scales_
+        columns += [np.full(n, self.n_hashed + i) for i in range(len(self.scaled))]
+
+        indices = np.column_stack(columns).ravel()
+        data = np.column_stack([np.ones((n, len(self.hashed))), scaled]).ravel()
+        indptr = np.arange(0, n * len(columns) + 1, len(columns))
+        X = sparse.csr_matrix((data.astype(np.float32), indices, indptr),
+                              shape=(n, self.n_hashed + len(self.scaled)))
+        # Two tokens of a row may collide; sum them
+        X.sum_duplicates()
+        return X
+
+
+def make_online_model(random_state=42):
+    # A constant step keeps later months as influential as the first ones;
+    # averaging the iterates smooths out its noise
+    return SGDClassifier(loss='log_loss', alpha=1e-6, learning_rate='constant', eta0=0.01, average=True,
+                         random_state=random_state)
+
+
+def partial_fit(model, X, y, batch_rows=BATCH_ROWS, random_state=42):
+    """One pass of mini-batch updates over ``X`` in shuffled order."""
+    order = np.random.default_rng(random_state).permutation(X.shape[0])
+    for start in range(0, len(order), batch_rows):
+        rows = np.sort(order[start:start + batch_rows])
+        model.partial_fit(X[rows], y[rows], classes=np.array([0, 1]))
+    return model
+
+
+def population_stability(reference, current):
+    """PSI between two discrete distributions over the same bins."""
+    reference = np.clip(reference / reference.sum(), 1e-4, None)
+    current = np.clip(current / max(current.sum(), 1), 1e-4, None)
+    return float(np.sum((current - reference) * np.log(current / reference)))
+
+
+def _bin_counts(column, reference):
+    """Row counts of ``column`` per drift bin, with bins taken from ``reference``.
+
+    ``SCALED_FEATURES`` are binned at the reference deciles; other features
+    by value, keeping the reference's most frequent values and pooling the
+    rest as ``other``.
+    """
+    if column.name in SCALED_FEATURES:
+        edges = np.unique(np.nanquantile(pd.to_numeric(reference, errors='coerce'), np.linspace(0.1, 0.9, 9)))
+        values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64)
+        labels = np.where(np.isnan(values), 'missing', np.searchsorted(edges, values).astype(str))
+        return pd.Series(labels).value_counts()
+    codes, keys = value_keys(column)
+    counts = pd.Series(np.bincount(codes, minlength=len(keys)), index=keys)
+    ref_codes, ref_keys = value_keys(reference)
+    top = pd.Series(np.bincount(ref_codes, minlength=len(ref_keys)), index=ref_keys).nlargest(PROFILE_TOP_VALUES)
+    kept = counts.index.isin(top.index)
+    return pd.concat([counts[kept], pd.Series({'other': counts[~kept].sum()})]).groupby(level=0).sum()
+
+
+def feature_drift(reference, current):
+    """PSI of each feature of ``current`` against ``reference`` (raw feature frames)."""
+    drift = {}
+    for col in FEATURES:
+        ref_bins = _bin_counts(reference[col], reference[col])
+        cur_bins = _bin_counts(current[col], reference[col])
+        bins = ref_bins.index.union(cur_bins.index)
+        drift[col] = population_stability(ref_bins.reindex(bins, fill_value=0).to_numpy(dtype=float),
+                                          cur_bins.reindex(bins, fill_value=0).to_numpy(dtype=float))
+    return drift
+
+
+def read_delta(paths, month=None):
+    """Incident rows of ``paths`` (CSV or GeoPackage), optionally only one ``YYYY-MM``."""
+    from batch_score import read_chunks
+
+    frames = []
+    for path in paths:
+        for chunk in read_chunks(path):
+            if month is not None:
+                date = chunk['DATE OCC']
+                if not pd.api.types.is_datetime64_any_dtype(date):
+                    date = pd.to_datetime(date, format='%m/%d/%Y %I:%M:%S %p')
+                chunk = chunk[date.dt.to_period('M') == pd.Period(month, 'M')]
+            frames.append(chunk)
+    df = pd.concat(frames, ignore_index=True)
+    return incident_features(df), (df['Part 1-2'] == 1).astype(np.int8).to_numpy()
+
+
+def initial_fit(epochs=1, random_state=42):
+    """Fit on the 80% training split of the feature store; returns (model, encoder, metrics)."""
+    raw, y = load_raw_features()
+    y = y.to_numpy()
+    train_rows, test_rows = split_rows(len(y))
+    encoder = HashedFeatureEncoder().fit(raw.iloc[train_rows])
+    X_train = encoder.transform(raw.iloc[train_rows])
+
+    model = make_online_model(random_state)
+    start = time.perf_counter()
+    for epoch in range(epochs):
+        partial_fit(model, X_train, y[train_rows], random_state=random_state + epoch)
+    fit_seconds = time.perf_counter() - start
+
+    proba = model.predict_proba(encoder.transform(raw.iloc[test_rows]))[:, 1]
+    metrics = {'roc_auc': roc_auc_score(y[test_rows], proba), 'fit_seconds': fit_seconds,
+               'train_rows': len(train_rows)}
+    return model, encoder, metrics
+
+
+def update(paths, month=None, reference='brf'):
+    """Score, drift-check and learn one delta; returns the drift report."""
+    bundle = load_bundle(BUNDLE_NAME)
+    delta, y = read_delta(paths, month)
+    if not len(y):
+        raise ValueError("The delta holds no incidents")
+    logging.info(f"Delta: {len(y)} incidents, Part I rate {y.mean():.3f}")
+
+    X = bundle.preprocessor.transform(delta)
+    online_proba = bundle.model.predict_proba(X)[:, 1]
+    report = {'month': month or '', 'rows': len(y), 'online_version': bundle.version,
+              'part_i_rate': float(y.mean()), 'online_mean_proba': float(online_proba.mean())}
+    both_classes = len(np.unique(y)) == 2
+    report['online_roc_auc'] = roc_auc_score(y, online_proba) if both_classes else np.nan
+
+    try:
+        full = load_bundle(reference)
+        full_proba = full.predict_proba(delta)
+        report['reference'] = f'{full.name} {full.version}'
+        report['reference_roc_auc'] = roc_auc_score(y, full_proba) if both_classes else np.nan
+        report['score_correlation'] = float(np.corrcoef(online_proba, full_proba)[0, 1])
+    except FileNotFoundError:
+        logging.warning(f"No saved '{reference}' bundle; skipping the comparison with the full model")
+        report.update(reference='', reference_roc_auc=np.nan, score_correlation=np.nan)
+
+    raw, y_train = load_raw_features()
+    report['train_part_i_rate'] = float(y_train.mean())
+    report.update({f'psi {col}': psi for col, psi in feature_drift(raw, delta).items()})
+
+    drifted = [col for col in FEATURES if col not in DRIFT_EXEMPT and report[f'psi {col}'] > PSI_ALERT]
+    if drifted:
+        logging.warning(f"Significant drift (PSI > {PSI_ALERT}) in: {', '.join(drifted)}")
+    if report['reference_roc_auc'] - report['online_roc_auc'] > ROC_AUC_ALERT:
+        logging.warning(f"Online ROC AUC {report['online_roc_auc']:.4f} trails the full model's "
+                        f"{report['reference_roc_auc']:.4f}; consider a full retrain")
+
+    start = time.perf_counter()
+    partial_fit(bundle.model, X, y)
+    report['update_seconds'] = time.perf_counter() - start
+    path = save_bundle(BUNDLE_NAME, bundle.model, bundle.preprocessor,
+                       metrics={key: value for key, value in report.items()
+                                if isinstance(value, (int, float)) and not np.isnan(value)})
+    report['saved'] = path
+    logging.info(f"Updated in {report['update_seconds']:.2f}s and saved to {path}")
+    return report
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Online Part I classifier updated from monthly deltas')
+    commands = parser.add_subparsers(dest='command', required=True)
+    init_parser = commands.add_parser('init', help='initial fit on the feature store')
+    init_parser.add_argument('--epochs', type=int, default=1)
+    update_parser = commands.add_parser('update', help='drift-check and learn a delta of new incidents')
+    update_parser.add_argument('inputs', nargs='+', help='incident CSV or GeoPackage files')
+    update_parser.add_argument('--month', default=None, help='only rows whose DATE OCC is in this YYYY-MM')
+    update_parser.add_argument('--reference', default='brf', help='bundle name of the last full model')
+    update_parser.add_argument('--drift-log', default=DRIFT_LOG)
+    args = parser.parse_args(argv)
+
+    if args.command == 'init':
+        model, encoder, metrics = initial_fit(args.epochs)
+        path = save_bundle(BUNDLE_NAME, model, encoder, metrics)
+        print(f"Test ROC AUC {metrics['roc_auc']:.4f}, fitted in {metrics['fit_seconds']:.1f}s; saved to {path}")
+        return
+
+    report = update(args.inputs, args.month, args.reference)
+    row = pd.DataFrame([report])
+    row.to_csv(args.drift_log, mode='a', header=not os.path.exists(args.drift_log), index=False)
+    print(row.drop(columns='saved').T.to_string(header=False))
+
+
+if __name__ == '__main__':
+    # Run through the importable module, so the pickled encoder refers to
+    # online_model.HashedFeatureEncoder rather than __main__
+    import online_model
+    online_model.main()
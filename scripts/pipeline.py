@@ -0,0 +1,342 @@
+"""Run the scripts as a dependency graph, redoing only what changed.
+
+Each stage declares the files it reads and writes; a stage depends on the
+stages that write its inputs. A stage is skipped when the content hashes of
+its inputs (data files, its script and the helper modules the script
+imports) and its arguments are the same as at its last successful run and
+its outputs are still as it left them. Stages whose inputs are ready run in
+parallel, up to ``--jobs`` at a time, except that stages whose scripts already
+use every core (the model training) run one at a time.
+
+After a data update, ``python pipeline.py`` redoes ingest and then only the
+stages whose inputs actually changed: a stage that rewrites an output with
+identical content does not invalidate the stages downstream of it.
+
+    python pipeline.py                          # bring every stage up to date
+    python pipeline.py geogrid kde_heatmap      # these stages (and what they need)
+    python pipeline.py geogrid --jobs 2         # groups: summaries, geogrid, maps_3d, models
+    python pipeline.py --dry-run                # show what would run
+    python pipeline.py --force summary          # rerun even if up to date
+
+State (hashes of the last successful run of each stage) is kept in
+``../data/pipeline_state.json``; the output of each stage goes to
+``../data/pipeline_logs/<stage>.log``.
+"""
+import argparse
+import ast
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+
+STATE_FILE = '../data/pipeline_state.json'
+LOG_DIR = '../data/pipeline_logs'
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+HASH_CHUNK_BYTES = 2 ** 20
+
+GPKG = '../data/processed_crime_data_2010_2023.gpkg'
+COUNTY = '../Base_Map/tl_2024_us_county.shp'
+FEATURE_STORE = '../data/feature_store'
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    inputs: list
+    outputs: list = field(default_factory=list)
+    args: list = field(default_factory=list)
+    # The script uses every core itself (process pools or TensorFlow threads),
+    # so no other exclusive stage runs at the same time
+    exclusive: bool = False
+
+
+STAGES = [
+    Stage('ingest', 'process-crime-data.py',
+          ['../data/Crime_Data_from_2020_to_Present_20241028.csv', '../data/Crime_Data_from_2010_to_2019_20241123.csv'],
+          [GPKG]),
+    Stage('feature_store', 'feature_store.py', [GPKG], [FEATURE_STORE]),
+    Stage('summary', 'analyze-crime-data-summary.py', [GPKG], ['../maps/crime_summary_table.html']),
+    Stage('summary_by_hour', 'analyze-by-hour.py', [GPKG]),
+    Stage('summary_by_dayofweek', 'analyze-by-dayofweek.py', [GPKG]),
+    Stage('geogrid_1', '2022_geogrid_1.py', [GPKG], ['../maps/la_part1_offenses_2022.html']),
+    Stage('geogrid_2', '2022_geogrid_2.py', [GPKG], ['../maps/la_part1_offenses_2022_5sq.html']),
+    Stage('geogrid_3', '2022_geogrid_3.py', [GPKG, COUNTY], ['../maps/la_part1_offenses_2022_with_county.html']),
+    Stage('geogrid_4', '2022_geogrid_4.py', [GPKG], ['../maps/la_part1_offenses_2022_2sq.html']),
+    Stage('geogrid_5', '2022_geogrid_5.py', [GPKG], ['../maps/la_all_offenses_2022_5sq.html']),
+    Stage('kde_heatmap', 'kde_heatmap.py', [GPKG],
+          ['../data/kde_surfaces_2010_2023.npz'] + [f'../maps/la_{slug}_offenses_kde.html' for slug in ('part1', 'all')]),
+    Stage('top_n_maps', 'top_n_maps.py', [GPKG],
+          [f'../maps/la_top{n}_{slug}_offenses.html' for slug in ('part_I', 'all') for n in (50, 100)],
+          ['--aggregate', 'h3']),
+    Stage('timeseries_3d', '3d_timeseries.py', [GPKG], ['../maps/la_offenses_3d_timeseries.html'],
+          ['--aggregate', 'h3']),
+    Stage('train_decision_tree', 'decision-tree-classifier-part-I.py', [FEATURE_STORE], ['../models/decision_tree'],
+          exclusive=True),
+    Stage('train_brf', 'rfbc_partone.py', [FEATURE_STORE], ['../models/brf'], exclusive=True),
+    Stage('train_gradient_boost', 'gradient-boost-part-I.py', [FEATURE_STORE], ['../models/gradient_boost'],
+          exclusive=True),
+    Stage('train_neural', 'neural-classifier-part-I.py', [FEATURE_STORE], ['../models/neural'], exclusive=True)
+]
+
+GROUPS = {
+    'summaries': ['summary', 'summary_by_hour', 'summary_by_dayofweek'],
+    'geogrid': [f'geogrid_{i}' for i in range(1, 6)],
+    'maps_3d': ['top_n_maps', 'timeseries_3d'],
+    'models': ['train_decision_tree', 'train_brf', 'train_gradient_boost', 'train_neural']
+}
+
+
+def local_imports(script, script_dir=SCRIPT_DIR):
+    """The script and every sibling module it imports, directly or indirectly."""
+    seen, pending = [], [script]
+    while pending:
+        name = pending.pop()
+        path = os.path.join(script_dir, name)
+        if name in seen or not os.path.exists(path):
+            continue
+        seen.append(name)
+        with open(path) as file:
+            tree = ast.parse(file.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules = [node.module]
+            else:
+                continue
+            pending.extend(module.split('.')[0] + '.py' for module in modules)
+    return sorted(seen)
+
+
+class Hasher:
+    """SHA-256 of files and directories, cached by size and modification time."""
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else {}
+
+    def file(self, path):
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        cached = self.cache.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        self.cache[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path(self, path):
+        """Hash of a file, or of a directory's relative paths and file hashes; None if missing."""
+        if os.path.isfile(path):
+            return self.file(path)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                digest.update(f'{os.path.relpath(full, path)}:{self.file(full)}\n'.encode())
+        return digest.hexdigest()
+
+
+def validate(stages):
+    """Check names and outputs are unique; returns {stage: [upstream stages]}."""
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("Stage names must be unique")
+    writers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in writers:
+                raise ValueError(f"{output} is written by both {writers[output]} and {stage.name}")
+            writers[output] = stage.name
+    return {stage.name: sorted({writers[path] for path in stage.inputs if path in writers}) for stage in stages}
+
+
+def expand(targets):
+    """Stage names of ``targets`` (stages or groups)."""
+    return [name for target in targets for name in GROUPS.get(target, [target])]
+
+
+def select(stages, upstream, targets):
+    """Names of ``targets`` and every stage they depend on, in declared order."""
+    wanted, pending = set(), expand(targets)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(upstream[name])
+    return [stage.name for stage in stages if stage.name in wanted]
+
+
+def stage_key(stage, hasher):
+    """Hash of the stage's arguments, code and input contents; None if an input is missing."""
+    hashes = {}
+    for path in stage.inputs:
+        hashes[path] = hasher.path(path)
+        if hashes[path] is None:
+            return None
+    for module in local_imports(stage.script):
+        hashes[module] = hasher.file(os.path.join(SCRIPT_DIR, module))
+    payload = json.dumps({'script': stage.script, 'args': stage.args, 'inputs': hashes}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def is_current(stage, key, state, hasher):
+    """Whether the stage's last successful run had this key and its outputs are unchanged since."""
+    previous = state.get(stage.name)
+    if not previous or previous['key'] != key:
+        return False
+    return all(hasher.path(path) == previous['outputs'].get(path) for path in stage.outputs)
+
+
+def run_script(stage, log_dir=LOG_DIR):
+    """Run the stage's script from this directory; returns (exit code, seconds)."""
+    for output in stage.outputs:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    os.makedirs(log_dir, exist_ok=True)
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    # The summary scripts call plt.show(); without a display backend that would block
+    env.setdefault('MPLBACKEND', 'Agg')
+    logging.info(f"{stage.name}: running {stage.script} {' '.join(stage.args)}".rstrip())
+    start = time.perf_counter()
+    with open(os.path.join(log_dir, f'{stage.name}.log'), 'w') as log:
+        process = subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, stage.script)] + stage.args,
+                                 env=env, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+    return process.returncode, time.perf_counter() - start
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {'stages': {}, 'files': {}}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = f'{path}.tmp'
+    with open(temp, 'w') as file:
+        json.dump(state, file, indent=2)
+    os.replace(temp, path)
+
+
+def run(stages, names, jobs=1, force=(), dry_run=False, state_file=STATE_FILE, log_dir=LOG_DIR):
+    """Bring the stages ``names`` up to date; returns {stage: status}.
+
+    A status is ``ran``, ``skipped`` (up to date), ``failed``, ``blocked``
+    (an upstream stage failed or an input is missing) or, with ``dry_run``,
+    ``would run``.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    upstream = validate(stages)
+    state = load_state(state_file)
+    hasher = Hasher(state['files'])
+    status, running = {}, {}
+    pending = list(names)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for name in list(pending):
+                active = pending + [running_name for running_name, _ in running.values()]
+                waiting = [up for up in upstream[name] if up in active]
+                if waiting:
+                    continue
+                stage = by_name[name]
+                if stage.exclusive and any(by_name[running_name].exclusive for running_name, _ in running.values()):
+                    continue
+                pending.remove(name)
+                if any(status.get(up) in ('failed', 'blocked') for up in upstream[name]):
+                    status[name] = 'blocked'
+                    logging.warning(f"{name}: blocked by a failed upstream stage")
+                    continue
+                if dry_run and any(status.get(up) == 'would run' for up in upstream[name]):
+                    # Inputs will change once the upstream stage runs
+                    status[name] = 'would run'
+                    continue
+                key = stage_key(stage, hasher)
+                if key is None:
+                    missing = [path for path in stage.inputs if not os.path.exists(path)]
+                    status[name] = 'blocked'
+                    logging.warning(f"{name}: missing input {', '.join(missing)}")
+                elif name not in force and is_current(stage, key, state['stages'], hasher):
+                    status[name] = 'skipped'
+                    logging.info(f"{name}: up to date")
+                elif dry_run:
+                    status[name] = 'would run'
+                else:
+                    running[pool.submit(run_script, stage, log_dir)] = (name, key)
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Circular dependency among {', '.join(pending)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, key = running.pop(future)
+                returncode, seconds = future.result()
+                if returncode == 0:
+                    status[name] = 'ran'
+                    state['stages'][name] = {
+                        'key': key,
+                        'outputs': {path: hasher.path(path) for path in by_name[name].outputs},
+                        'finished': datetime.now().isoformat(timespec='seconds'),
+                        'seconds': round(seconds, 2)
+                    }
+                    save_state(state, state_file)
+                    logging.info(f"{name}: done in {seconds:.1f}s")
+                else:
+                    status[name] = 'failed'
+                    logging.error(f"{name}: failed with exit code {returncode} after {seconds:.1f}s, "
+                                  f"see {os.path.join(log_dir, name + '.log')}")
+    if not dry_run:
+        save_state(state, state_file)
+    return status
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s', datefmt='%H:%M:%S')
+    parser = argparse.ArgumentParser(description='Run the scripts as a dependency graph with content-hash caching')
+    parser.add_argument('targets', nargs='*', help=f"stages or groups ({', '.join(GROUPS)}); default: all")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='stages run at the same time')
+    parser.add_argument('--force', action='store_true', help='rerun the targets even if they are up to date')
+    parser.add_argument('--dry-run', action='store_true', help='show what would run without running it')
+    parser.add_argument('--list', action='store_true', help='list the stages with their inputs and outputs')
+    parser.add_argument('--state', default=STATE_FILE)
+    args = parser.parse_args(argv)
+
+    upstream = validate(STAGES)
+    if args.list:
+        for stage in STAGES:
+            print(f"{stage.name}: {stage.script} {' '.join(stage.args)}".rstrip())
+            print(f"    after:   {', '.join(upstream[stage.name]) or '-'}")
+            print(f"    inputs:  {', '.join(stage.inputs)}")
+            print(f"    outputs: {', '.join(stage.outputs) or '-'}")
+        return
+
+    known = set(upstream) | set(GROUPS)
+    unknown = [target for target in args.targets if target not in known]
+    if unknown:
+        parser.error(f"unknown stage or group: {', '.join(unknown)}")
+    names = select(STAGES, upstream, args.targets or list(upstream))
+    force = set(expand(args.targets) or names) if args.force else set()
+
+    status = run(STAGES, names, max(args.jobs, 1), force, args.dry_run, args.state)
+    for name in names:
+        print(f"{name:24} {status.get(name, '-')}")
+    if any(value in ('failed', 'blocked') for value in status.values()):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Load test for query_server.py.
+
+Builds a dashboard-like mix of queries from the dimension values the server
+reports (counts by hour, day of week and area per year, H3 cells per year,
+resolution and offense class, top-N locations), then opens ``--concurrency``
+keep-alive connections and sends ``--requests`` GET requests in total, each
+picked at random from the first ``--distinct`` queries of the mix. Prints the
+p50/p90/p99 latency and throughput, split into the first request of each
+query in this run (computed, unless an earlier run cached it) and repeats
+(answered from the cache), with the server's cache statistics, and saves
+them as JSON:
+
+    python query_server.py &
+    python query_load_test.py --concurrency 32 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+from http_service import HttpClient, latency_report
+
+
+def query_mix(dimensions, random_state=42):
+    """Dashboard queries (paths with query strings) over every year, in random order."""
+    queries = []
+    for year in dimensions['year']:
+        for by in ['hour', 'dow', 'area', 'area,offense']:
+            queries.append(('/counts', {'by': by, 'year': year}))
+        for offense in ['part1', 'all']:
+            for resolution in [7, 8, 9]:
+                queries.append(('/h3', {'year': year, 'resolution': resolution, 'offense': offense}))
+            queries.append(('/top', {'n': 50, 'offense': offense, 'year': year}))
+        for area in dimensions['area']:
+            queries.append(('/counts', {'by': 'hour', 'year': year, 'area': area}))
+    queries.append(('/counts', {'by': 'year,offense'}))
+    order = np.random.default_rng(random_state).permutation(len(queries))
+    return [f'{queries[i][0]}?{urlencode(queries[i][1])}' for i in order]
+
+
+async def run_load_test(host, port, queries, concurrency, n_requests):
+    latencies = {'first': [], 'repeat': []}
+    seen = set()
+    errors = 0
+    sent = 0
+    rng = np.random.default_rng(0)
+
+    async def worker():
+        nonlocal errors, sent
+        client = await HttpClient(host, port).connect()
+        try:
+            while sent < n_requests:
+                sent += 1
+                query = queries[rng.integers(len(queries))]
+                kind = 'repeat' if query in seen else 'first'
+                seen.add(query)
+                start = time.perf_counter()
+                status, _ = await client.request('GET', query)
+                latencies[kind].append(time.perf_counter() - start)
+                if status != 200:
+                    errors += 1
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    report = latency_report(latencies['first'] + latencies['repeat'], elapsed, errors)
+    for kind, values in latencies.items():
+        if values:
+            report[kind] = {key: value for key, value in latency_report(values, elapsed).items()
+                            if key not in ('errors', 'seconds', 'requests_per_s')}
+
+    client = await HttpClient(host, port).connect()
+    _, health = await client.request('GET', '/health')
+    await client.close()
+    report['server_cache'] = health['cache']
+    return report
+
+
+async def fetch_dimensions(host, port):
+    client = await HttpClient(host, port).connect()
+    _, health = await client.request('GET', '/health')
+    await client.close()
+    return health['dimensions']
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Load test the local query server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--distinct', type=int, default=200, help='distinct queries in the mix (0: all of them)')
+    parser.add_argument('--output', default='../data/query_load_test.json')
+    args = parser.parse_args(argv)
+
+    queries = query_mix(asyncio.run(fetch_dimensions(args.host, args.port)))
+    if args.distinct:
+        queries = queries[:args.distinct]
+    logging.info(f"Sending {args.requests} requests over {len(queries)} distinct queries")
+    report = asyncio.run(run_load_test(args.host, args.port, queries, args.concurrency, args.requests))
+    report.update(concurrency=args.concurrency, distinct_queries=len(queries))
+    print(json.dumps(report, indent=2))
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    logging.info(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""Local HTTP query service for incident counts.
+
+Loads the processed GeoPackage once, keeps only compact per-incident codes
+(year, hour, day of week, area, offense class) and a location index, and
+answers on localhost:
+
+    GET /counts?by=hour&year=2022&area=Central     -> {"counts": [{"hour": 0, "count": 812}, ...]}
+    GET /counts?by=year,offense                    (several dimensions: one record per combination)
+    GET /h3?year=2022&resolution=8&offense=part1   -> {"cells": [{"hex": "88...", "count": 31}, ...]}
+    GET /top?n=50&offense=part1&year=2023          -> {"locations": [{"latitude": ..., "count": ...}, ...]}
+    GET /health                                    rows loaded, dimension values and cache statistics
+
+Every dimension (``year``, ``hour``, ``dow``, ``area``, ``offense``) can
+also be used as a filter; ``offense`` is ``part1``, ``part2`` or ``all``.
+
+Answers are computed with ``np.bincount`` over the codes of the matching rows
+in a worker thread and kept, already JSON-encoded, in an LRU cache keyed by
+the normalized query, so a repeated dashboard query is answered from memory
+in a fraction of a millisecond. H3 cells are looked up once per distinct
+location and resolution rather than once per incident.
+
+    python query_server.py [--port 8766] [--cache-size 1024]
+    python query_load_test.py --concurrency 32 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from http_service import HttpError, serve
+
+DATA_PATH = '../data/processed_crime_data_2010_2023.gpkg'
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+OFFENSES = ['part1', 'part2']
+DEFAULT_RESOLUTION = 9
+MAX_TOP_N = 10_000
+
+
+class LruCache:
+    """Results of the most recently used ``maxsize`` queries.
+
+    Concurrent requests for a query that is still being computed wait for
+    that computation instead of starting their own.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key, compute):
+        """The cached result for ``key``, or ``compute()`` run in a worker thread."""
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if key in self.pending:
+            self.hits += 1
+            return await asyncio.shield(self.pending[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            result = await asyncio.to_thread(compute)
+        except Exception as error:
+            future.set_exception(error)
+            # Mark the exception retrieved when no other request was waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if self.maxsize > 0:
+                self.entries[key] = result
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+            return result
+        finally:
+            del self.pending[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class IncidentCounts:
+    """Per-incident dimension codes and locations of the processed data.
+
+    ``codes[dim]`` holds one small integer per incident (-1 when missing) and
+    ``labels[dim]`` the value of each code.
+    """
+
+    def __init__(self, df):
+        from location_index import LocationIndex
+
+        self.n_rows = len(df)
+        self.codes, self.labels = {}, {}
+        years = df['DATE OCC'].dt.year.to_numpy()
+        self._add('year', years - years.min(), list(range(int(years.min()), int(years.max()) + 1)))
+        self._add('hour', df['Hour'].fillna(-1).to_numpy(), list(range(24)))
+        self._add('dow', df['DayOfWeek'].fillna(-1).to_numpy(), DAY_NAMES)
+        area_codes, areas = df['AREA NAME'].factorize(sort=True)
+        self._add('area', area_codes, [str(area) for area in areas])
+        self._add('offense', df['Part 1-2'].to_numpy() - 1, OFFENSES)
+
+        self.locations = LocationIndex(df['LAT'].to_numpy(), df['LON'].to_numpy())
+        self._cells = {}
+        self._cells_lock = threading.Lock()
+
+    def _add(self, dim, codes, labels):
+        codes = np.asarray(codes, dtype=np.int64)
+        codes[(codes < 0) | (codes >= len(labels))] = -1
+        self.codes[dim] = codes.astype(np.int16)
+        self.labels[dim] = labels
+
+    def parse_filters(self, query):
+        """Normalized ``(dim, code)`` filters from query parameters; raises ``HttpError`` on bad values."""
+        filters = []
+        for dim in self.codes:
+            value = query.get(dim)
+            if value is None or (dim == 'offense' and value == 'all'):
+                continue
+            names = [str(label) for label in self.labels[dim]]
+            if value not in names:
+                raise HttpError(400, f"Unknown {dim} '{value}'")
+            filters.append((dim, names.index(value)))
+        return tuple(filters)
+
+    def describe(self, filters):
+        """Filters as ``{dim: value}``, for echoing in responses."""
+        return {dim: self.labels[dim][code] for dim, code in filters}
+
+    @property
+    def resolutions(self):
+        """H3 resolutions whose location-to-cell map is built."""
+        return sorted(self._cells)
+
+    def mask(self, filters):
+        """Boolean mask of the rows matching every filter, or None when there are none."""
+        mask = None
+        for dim, code in filters:
+            match = self.codes[dim] == code
+            mask = match if mask is None else mask & match
+        return mask
+
+    def counts(self, by, filters=()):
+        """Incident counts per combination of the ``by`` dimensions, as records with a nonzero count."""
+        mask = self.mask(filters)
+        codes = [self.codes[dim] if mask is None else self.codes[dim][mask] for dim in by]
+        valid = np.logical_and.reduce([code >= 0 for code in codes])
+        shape = [len(self.labels[dim]) for dim in by]
+        flat = np.ravel_multi_index([code[valid] for code in codes], shape)
+        counts = np.bincount(flat, minlength=int(np.prod(shape)))
+        records = []
+        for position in np.flatnonzero(counts):
+            record = {dim: self.labels[dim][i] for dim, i in zip(by, np.unravel_index(position, shape))}
+            record['count'] = int(counts[position])
+            records.append(record)
+        return records
+
+    def location_cells(self, resolution):
+        """H3 cell code of each distinct location, and the cell names; cached per resolution."""
+        # Queries in other worker threads wait for the map rather than building it again
+        with self._cells_lock:
+            if resolution in self._cells:
+                return self._cells[resolution]
+            import h3
+            from location_index import decode
+
+            lat, lon = decode(self.locations.keys, self.locations.precision)
+            cells = [h3.latlng_to_cell(y, x, resolution) for y, x in zip(lat, lon)]
+            codes, names = pd.factorize(np.array(cells, dtype=object))
+            self._cells[resolution] = (codes.astype(np.int64), [str(name) for name in names])
+        return self._cells[resolution]
+
+    def h3_counts(self, resolution, filters=()):
+        """Incident counts per H3 cell at ``resolution``, largest first."""
+        cell_of_location, cell_names = self.location_cells(resolution)
+        mask = self.mask(filters)
+        location_counts = self.locations.counts if mask is None else self.locations.counts_where(mask)
+        counts = np.bincount(cell_of_location, weights=location_counts, minlength=len(cell_names)).astype(np.int64)
+        order = np.flatnonzero(counts)
+        order = order[np.argsort(-counts[order], kind='stable')]
+        return [{'hex': cell_names[i], 'count': int(counts[i])} for i in order]
+
+    def top_locations(self, n, filters=()):
+        """The ``n`` locations with the most matching incidents."""
+        mask = self.mask(filters)
+        counts = self.locations.counts if mask is None else self.locations.counts_where(mask)
+        top = self.locations.top_k(n, counts)
+        top = top[counts[top] > 0]
+        locations = self.locations.locations(top, counts)
+        # Undo the float error of decoding the quantized coordinates
+        locations[['latitude', 'longitude']] = locations[['latitude', 'longitude']].round(self.locations.precision)
+        return locations.to_dict(orient='records')
+
+
+def load_counts(path=DATA_PATH):
+    """Read only the needed columns of the processed data, without geometries."""
+    import geopandas as gpd
+
+    df = gpd.read_file(path, ignore_geometry=True,
+                       columns=['DATE OCC', 'Hour', 'DayOfWeek', 'AREA NAME', 'Part 1-2', 'LAT', 'LON'])
+    return IncidentCounts(df)
+
+
+def _int_param(query, name, default, low, high):
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise HttpError(400, f"{name} must be an integer")
+    if not low <= value <= high:
+        raise HttpError(400, f"{name} must be between {low} and {high}")
+    return value
+
+
+def encode(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def make_handler(data, cache):
+    filter_names = set(data.codes)
+
+    def check_params(query, allowed):
+        unknown = set(query) - filter_names - set(allowed)
+        if unknown:
+            raise HttpError(400, f"Unknown parameters: {', '.join(sorted(unknown))}")
+
+    async def handler(method, path, query, body):
+        if method != 'GET':
+            raise HttpError(405, "Only GET is supported")
+        if path == '/health':
+            return {'rows': data.n_rows, 'dimensions': data.labels,
+                    'h3_resolutions': data.resolutions, 'cache': cache.stats()}
+
+        if path == '/counts':
+            check_params(query, ['by'])
+            by = tuple(query.get('by', '').split(','))
+            if not all(by) or any(dim not in filter_names for dim in by) or len(set(by)) != len(by):
+                raise HttpError(400, f"by must be one or more of {', '.join(data.codes)}")
+            filters = data.parse_filters(query)
+            return await cache.get((path, by, filters),
+                                   lambda: encode({'by': by, 'filters': data.describe(filters), 'counts':
+                                                   data.counts(by, filters)}))
+        if path == '/h3':
+            check_params(query, ['resolution'])
+            resolution = _int_param(query, 'resolution', DEFAULT_RESOLUTION, 0, 15)
+            filters = data.parse_filters(query)
+            return await cache.get((path, resolution, filters),
+                                   lambda: encode({'resolution': resolution, 'filters': data.describe(filters), 'cells':
+                                                   data.h3_counts(resolution, filters)}))
+        if path == '/top':
+            check_params(query, ['n'])
+            n = _int_param(query, 'n', 100, 1, MAX_TOP_N)
+            filters = data.parse_filters(query)
+            return await cache.get((path, n, filters),
+                                   lambda: encode({'n': n, 'filters': data.describe(filters), 'locations':
+                                                   data.top_locations(n, filters)}))
+        raise HttpError(404, f"Unknown path {path}")
+
+    return handler
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Serve incident counts from the processed data')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--cache-size', type=int, default=1024, help='query results kept (0 disables the cache)')
+    parser.add_argument('--preload-resolutions', type=int, nargs='*', default=[DEFAULT_RESOLUTION],
+                        help='H3 resolutions whose location-to-cell maps are built at startup')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    data = load_counts(args.data)
+    for resolution in args.preload_resolutions:
+        data.location_cells(resolution)
+    logging.info(f"Loaded {data.n_rows} incidents at {len(data.locations)} locations "
+                 f"in {time.perf_counter() - start:.1f}s")
+    asyncio.run(serve(make_handler(data, LruCache(args.cache_size)), args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
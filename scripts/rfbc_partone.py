@@ -1,106 +1,192 @@
-import geopandas as gpd
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
-from sklearn.impute import SimpleImputer
-from imblearn.ensemble import BalancedRandomForestClassifier
-import matplotlib.pyplot as plt
-import seaborn as sns
 import logging
-
-logging.basicConfig(level=logging.INFO)
-
-# Load and preprocess data (same as before)
-logging.info("Starting data loading")
-gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
-logging.info(f"Data loaded. Shape: {gdf.shape}")
-
-logging.info("Creating target variables")
-gdf['Part_I_Offense'] = (gdf['Part 1-2'] == 1).astype(int)
-
-logging.info("Preparing features")
-features = ['Hour', 'DayOfWeek', 'Month', 'AREA NAME', 'Vict Age', 'Vict Sex', 'Vict Descent', 'Premis Cd', 'Weapon Used Cd']
-X = pd.get_dummies(gdf[features], columns=['AREA NAME', 'Vict Sex', 'Vict Descent'])
-y = gdf['Part_I_Offense']
-logging.info(f"Features prepared. X shape: {X.shape}")
-
-logging.info("Handling missing values")
-imputer = SimpleImputer(strategy='median')
-X = pd.DataFrame(imputer.fit_transform(X), columns=X.columns)
-
-logging.info("Splitting data")
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-logging.info("Scaling features")
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-
-logging.info("Training Balanced Random Forest Classifier")
-brf_model = BalancedRandomForestClassifier(n_estimators=100, random_state=42)
-
-prev_roc_auc = 0
-for i in range(1, 101):
-    brf_model.set_params(n_estimators=i)
-    brf_model.fit(X_train_scaled, y_train)
-    
+import argparse
+import time
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--encoding', choices=['dense', 'sparse'], default='dense',
+                        help="'sparse' builds a float32 CSR matrix with a fitted encoder "
+                             "and scales only numeric columns")
+    parser.add_argument('--n-jobs', type=int, default=-1,
+                        help='worker processes for the cross-validation folds and the permutation importance '
+                             '(-1 uses all cores)')
+    args = parser.parse_args(argv)
+
+    # pandas, scikit-learn and matplotlib take seconds to import, so they are loaded
+    # only once the arguments are valid
+    import numpy as np
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+    from imblearn.ensemble import BalancedRandomForestClassifier
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from scipy import sparse
+    from feature_store import load_features, load_raw_features
+    from sparse_features import SparseFeatureEncoder, log_memory
+    from cv_harness import CACHE_DIR, cross_validate_cached
+    from model_artifacts import DenseFeaturePipeline, save_bundle
+    from group_importance import grouped_permutation_importance
+    from stage_trace import stage
+
+    if args.encoding == 'dense':
+        # Load the cached feature matrix (built from the GeoPackage on first use)
+        logging.info("Loading features")
+        with stage('load') as s:
+            X, y = load_features(impute=True)
+            s.rows = len(y)
+        logging.info(f"Features loaded. X shape: {X.shape}")
+        log_memory("features loaded", X)
+
+        logging.info("Splitting data")
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        log_memory("data split", X_train, X_test)
+
+        logging.info("Scaling features")
+        with stage('encode', rows=len(y)):
+            scaler = StandardScaler()
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
+        feature_names = X.columns
+    else:
+        # Un-encoded features: float32 numeric columns and categorical codes
+        logging.info("Loading raw features")
+        with stage('load') as s:
+            raw, y = load_raw_features()
+            s.rows = len(y)
+        logging.info(f"Raw features loaded. Shape: {raw.shape}")
+        log_memory("raw features loaded", raw)
+
+        logging.info("Splitting data")
+        raw_train, raw_test, y_train, y_test = train_test_split(raw, y, test_size=0.2, random_state=42)
+
+        logging.info("Encoding features (sparse float32)")
+        with stage('encode', rows=len(y)):
+            encoder = SparseFeatureEncoder().fit(raw_train)
+            X_train_scaled = encoder.transform(raw_train)
+            X_test_scaled = encoder.transform(raw_test)
+        feature_names = encoder.get_feature_names_out()
+        logging.info(f"Features encoded. X_train shape: {X_train_scaled.shape}, nnz: {X_train_scaled.nnz}")
+
+    log_memory("features scaled", X_train_scaled, X_test_scaled)
+
+    logging.info("Training Balanced Random Forest Classifier")
+    # Trees work on float32; convert once instead of on every fit below
+    if not sparse.issparse(X_train_scaled):
+        X_train_scaled = X_train_scaled.astype(np.float32)
+        X_test_scaled = X_test_scaled.astype(np.float32)
+
+    # warm_start adds one tree per step to the existing forest instead of
+    # refitting all i trees. Trees are still seeded from random_state, but
+    # imblearn draws the seeds differently under warm_start, so they are not
+    # identical to the trees of a fresh fit with n_estimators=i.
+    brf_model = BalancedRandomForestClassifier(n_estimators=100, random_state=42, warm_start=True)
+
+    # Running sum of the trees' Part I probabilities on the test set, so each
+    # step scores only the newly added tree
+    proba_sum = np.zeros(X_test_scaled.shape[0])
+    train_start = time.perf_counter()
+
+    with stage('fit', rows=len(y_train)):
+        prev_roc_auc = 0
+        for i in range(1, 101):
+            brf_model.set_params(n_estimators=i)
+            brf_model.fit(X_train_scaled, y_train)
+
+            proba_sum += brf_model.estimators_[-1].predict_proba(X_test_scaled)[:, 1]
+            y_pred_proba = proba_sum / i
+            # Same as predict(): class 1 only when its mean probability is higher
+            y_pred = (y_pred_proba > 0.5).astype(int)
+
+            accuracy = accuracy_score(y_test, y_pred)
+            precision = precision_score(y_test, y_pred)
+            recall = recall_score(y_test, y_pred)
+            f1 = f1_score(y_test, y_pred)
+            roc_auc = roc_auc_score(y_test, y_pred_proba)
+
+            print(f"Iteration {i}:")
+            print(f"Accuracy: {accuracy:.2f}")
+            print(f"Precision: {precision:.2f}")
+            print(f"Recall: {recall:.2f}")
+            print(f"F1-score: {f1:.2f}")
+            print(f"ROC AUC: {roc_auc:.2f}")
+            print("--------------------")
+
+            if i > 10 and abs(roc_auc - prev_roc_auc) < 0.001:
+                print(f"Early stopping at iteration {i}")
+                break
+            prev_roc_auc = roc_auc
+
+    logging.info(f"Trained {len(brf_model.estimators_)} trees in {time.perf_counter() - train_start:.1f}s")
+
+    logging.info("Performing cross-validation")
+    # Folds run in parallel; fitted fold models and predictions are cached on disk
+    with stage('cv', rows=len(y_train)):
+        cv_result = cross_validate_cached(brf_model, X_train_scaled, y_train, cv=5, n_jobs=args.n_jobs,
+                                          cache_dir=CACHE_DIR)
+    cv_scores = cv_result.scores()
+
+    print("Balanced Random Forest - Cross-validation scores:", cv_scores)
+    print("Balanced Random Forest - Mean CV score:", cv_scores.mean())
+    print("Balanced Random Forest - Mean CV ROC AUC:", cv_result.scores(roc_auc_score, proba=True).mean())
+
+    logging.info("Making final predictions")
     y_pred = brf_model.predict(X_test_scaled)
     y_pred_proba = brf_model.predict_proba(X_test_scaled)[:, 1]
-    
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-    roc_auc = roc_auc_score(y_test, y_pred_proba)
-    
-    print(f"Iteration {i}:")
-    print(f"Accuracy: {accuracy:.2f}")
-    print(f"Precision: {precision:.2f}")
-    print(f"Recall: {recall:.2f}")
-    print(f"F1-score: {f1:.2f}")
-    print(f"ROC AUC: {roc_auc:.2f}")
-    print("--------------------")
-
-    if i > 10 and abs(roc_auc - prev_roc_auc) < 0.001:
-        print(f"Early stopping at iteration {i}")
-        break
-    prev_roc_auc = roc_auc
-
-logging.info("Performing cross-validation")
-cv_scores = cross_val_score(brf_model, X_train_scaled, y_train, cv=5)
-
-print("Balanced Random Forest - Cross-validation scores:", cv_scores)
-print("Balanced Random Forest - Mean CV score:", cv_scores.mean())
-
-logging.info("Making final predictions")
-y_pred = brf_model.predict(X_test_scaled)
-y_pred_proba = brf_model.predict_proba(X_test_scaled)[:, 1]
-
-print("\nFinal Balanced Random Forest Model:")
-print(f"Accuracy: {accuracy_score(y_test, y_pred):.2f}")
-print(f"Precision: {precision_score(y_test, y_pred):.2f}")
-print(f"Recall: {recall_score(y_test, y_pred):.2f}")
-print(f"F1-score: {f1_score(y_test, y_pred):.2f}")
-print(f"ROC AUC: {roc_auc_score(y_test, y_pred_proba):.2f}")
-
-feature_importance = brf_model.feature_importances_
-
-plt.figure(figsize=(10, 6))
-sns.barplot(x=feature_importance, y=X.columns)
-plt.title("Feature Importance for Part I Offenses (Balanced Random Forest)")
-plt.tight_layout()
-plt.show()
-
-plt.figure(figsize=(10, 6))
-plt.hist([y_pred_proba[y_test == 0], y_pred_proba[y_test == 1]], 
-         label=['Non-offense', 'Offense'], bins=50, density=True, alpha=0.7)
-plt.xlabel("Predicted Probability")
-plt.ylabel("Density")
-plt.title("Distribution of Predicted Probabilities for Part I Offenses")
-plt.legend()
-plt.show()
-
-print("Class balance in test set:")
-print(y_test.value_counts(normalize=True))
\ No newline at end of file
+
+    print("\nFinal Balanced Random Forest Model:")
+    print(f"Accuracy: {accuracy_score(y_test, y_pred):.2f}")
+    print(f"Precision: {precision_score(y_test, y_pred):.2f}")
+    print(f"Recall: {recall_score(y_test, y_pred):.2f}")
+    print(f"F1-score: {f1_score(y_test, y_pred):.2f}")
+    print(f"ROC AUC: {roc_auc_score(y_test, y_pred_proba):.2f}")
+
+    # Save the model with its preprocessing so batch_score.py can reuse it
+    preprocessor = DenseFeaturePipeline.from_store(scaler=scaler) if args.encoding == 'dense' else encoder
+    with stage('save_bundle'):
+        bundle_path = save_bundle('brf', brf_model, preprocessor,
+                                  metrics={'accuracy': accuracy_score(y_test, y_pred),
+                                           'roc_auc': roc_auc_score(y_test, y_pred_proba)})
+    logging.info(f"Model bundle saved to {bundle_path}")
+
+    feature_importance = brf_model.feature_importances_
+
+    plt.figure(figsize=(10, 6))
+    sns.barplot(x=feature_importance, y=feature_names)
+    plt.title("Feature Importance for Part I Offenses (Balanced Random Forest)")
+    plt.tight_layout()
+    plt.show()
+
+    # Permutation importance of the original features on a test subsample,
+    # with the test predictions above as the unpermuted baseline
+    with stage('permutation_importance', rows=len(y_test)):
+        permutation_importance = grouped_permutation_importance(brf_model, X_test_scaled, y_test, feature_names,
+                                                                baseline_proba=y_pred_proba, n_jobs=args.n_jobs)
+    print("Permutation importance (ROC AUC drop):")
+    print(permutation_importance.round(4).to_string())
+
+    plt.figure(figsize=(10, 6))
+    sns.barplot(x=permutation_importance['mean'], y=permutation_importance.index)
+    plt.xlabel("ROC AUC drop when permuted")
+    plt.title("Permutation Importance for Part I Offenses (Balanced Random Forest)")
+    plt.tight_layout()
+    plt.show()
+
+    plt.figure(figsize=(10, 6))
+    plt.hist([y_pred_proba[y_test == 0], y_pred_proba[y_test == 1]], 
+             label=['Non-offense', 'Offense'], bins=50, density=True, alpha=0.7)
+    plt.xlabel("Predicted Probability")
+    plt.ylabel("Density")
+    plt.title("Distribution of Predicted Probabilities for Part I Offenses")
+    plt.legend()
+    plt.show()
+
+    print("Class balance in test set:")
+    print(y_test.value_counts(normalize=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""Row samples and splits shared by the tuning, benchmark and model scripts."""
+import numpy as np
+
+
+def stratified_order(y, random_state=42):
+    """Row order whose every prefix is a stratified sample of ``y``.
+
+    Each class is shuffled, and rows are interleaved so that after ``n`` rows
+    each class has contributed its share of ``n``.
+    """
+    rng = np.random.default_rng(random_state)
+    order, position = [], []
+    for label in np.unique(y):
+        rows = rng.permutation(np.flatnonzero(y == label))
+        order.append(rows)
+        # Fractional rank of each row within its class, in [0, 1)
+        position.append(np.arange(len(rows)) / len(rows))
+    order, position = np.concatenate(order), np.concatenate(position)
+    return order[np.argsort(position, kind='stable')]
+
+
+def split_rows(n_rows):
+    """Row indices of the 80/20 train/test split of the classifier scripts, test rows sorted."""
+    from sklearn.model_selection import train_test_split
+
+    train_rows, test_rows = train_test_split(np.arange(n_rows), test_size=0.2, random_state=42)
+    return train_rows, np.sort(test_rows)
@@ -0,0 +1,205 @@
+"""Data-size scaling benchmark for the Part I model families.
+
+Trains each model family on nested stratified samples of the training split
+(by default 10k, 100k, 1M rows and the full split) and scores it on the fixed
+20% test split the classifier scripts use. For each run it records fit time,
+predict time, peak memory and ROC AUC.
+
+Every run happens in a fresh process, so the peak resident set size of that
+process is the memory the run needed (including the interpreter and the
+memory-mapped features it touched); ``fit_rss_mb`` is the increase over the
+process size before fitting.
+
+    python scaling_benchmark.py [--models decision_tree brf ...] [--sizes 10000 100000 1000000 full]
+                                [--target-roc-auc 0.75]
+
+Writes ``../data/benchmarks/scaling.csv`` and ``scaling.png`` (fit time, ROC
+AUC and peak memory against training rows). With ``--target-roc-auc`` it
+prints the smallest size at which each family reaches the target.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+OUTPUT_DIR = '../data/benchmarks'
+MODELS = ['decision_tree', 'brf', 'gradient_boost', 'hist_gradient_boost', 'neural']
+DEFAULT_SIZES = ['10000', '100000', '1000000', 'full']
+
+
+def _dense(X, rows, medians=None):
+    X_rows = np.asarray(X[rows])
+    return X_rows if medians is None else np.where(np.isnan(X_rows), medians, X_rows)
+
+
+def _fit_predict(model, train_rows, test_rows):
+    """Fit one model family on ``train_rows``; returns (fit s, predict s, proba, fit RSS MB)."""
+    from feature_store import load_arrays, load_raw_features
+    from stage_trace import peak_rss_mb
+
+    X, y, manifest = load_arrays()
+    medians = np.asarray(manifest['medians'], dtype=np.float32)
+
+    if model == 'hist_gradient_boost':
+        from hist_boosting import HistFeatureEncoder, make_hist_model
+
+        raw, _ = load_raw_features()
+        encoder = HistFeatureEncoder().fit(raw.iloc[train_rows])
+        X_train, X_test = encoder.transform(raw.iloc[train_rows]), encoder.transform(raw.iloc[test_rows])
+        estimator = make_hist_model(encoder)
+    elif model == 'neural':
+        X_train, X_test = None, _dense(X, test_rows, medians)
+    else:
+        # Decision trees handle NaN natively, as in decision-tree-classifier-part-I.py;
+        # the ensembles are trained on median-imputed features like their scripts
+        fill = None if model == 'decision_tree' else medians
+        X_train, X_test = _dense(X, train_rows, fill), _dense(X, test_rows, fill)
+        if model == 'decision_tree':
+            from sklearn.tree import DecisionTreeClassifier
+            estimator = DecisionTreeClassifier(random_state=42)
+        elif model == 'brf':
+            from imblearn.ensemble import BalancedRandomForestClassifier
+            estimator = BalancedRandomForestClassifier(n_estimators=100, random_state=42)
+        else:
+            from imblearn.pipeline import make_pipeline
+            from imblearn.under_sampling import RandomUnderSampler
+            from sklearn.ensemble import GradientBoostingClassifier
+            estimator = make_pipeline(RandomUnderSampler(random_state=42),
+                                      GradientBoostingClassifier(n_estimators=100, learning_rate=0.1, max_depth=5,
+                                                                 subsample=0.8, random_state=42))
+
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    if model == 'neural':
+        estimator, mean, scale = _fit_neural(X, y, train_rows, medians)
+        fit_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        proba = estimator.predict((X_test - mean) / scale, batch_size=65536, verbose=0).ravel()
+    else:
+        estimator.fit(X_train, y[train_rows])
+        fit_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        proba = estimator.predict_proba(X_test)[:, 1]
+    predict_seconds = time.perf_counter() - start
+    return fit_seconds, predict_seconds, proba, peak_rss_mb() - rss_before
+
+
+def _fit_neural(X, y, train_rows, medians, epochs=20, batch_size=1024):
+    """The network of neural-classifier-part-I.py, streamed with early stopping."""
+    import tensorflow as tf
+    from streaming_input import make_dataset, streaming_scaler
+
+    split_at = int(np.ceil(len(train_rows) * 0.8))
+    fit_rows, val_rows = train_rows[:split_at], train_rows[split_at:]
+    mean, scale = streaming_scaler(X, fit_rows, medians)
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(X.shape[1],)),
+        tf.keras.layers.Dense(64, activation='relu'),
+        tf.keras.layers.Dense(32, activation='relu'),
+        tf.keras.layers.Dense(16, activation='relu'),
+        tf.keras.layers.Dense(1, activation='sigmoid')
+    ])
+    model.compile(optimizer='adam', loss='binary_crossentropy')
+    model.fit(make_dataset(X, y, fit_rows, medians, mean, scale, batch_size=batch_size, shuffle=True),
+              validation_data=make_dataset(X, y, val_rows, medians, mean, scale, batch_size=batch_size),
+              epochs=epochs, verbose=0,
+              callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=3,
+                                                          restore_best_weights=True)])
+    return model, mean, scale
+
+
+def run_one(model, train_rows, test_rows):
+    """One benchmark run, in its own process."""
+    from sklearn.metrics import roc_auc_score
+    from feature_store import load_arrays
+    from stage_trace import peak_rss_mb
+
+    fit_seconds, predict_seconds, proba, fit_rss = _fit_predict(model, train_rows, test_rows)
+    _, y, _ = load_arrays()
+    return {
+        'model': model,
+        'train_rows': len(train_rows),
+        'fit_seconds': round(fit_seconds, 3),
+        'predict_seconds': round(predict_seconds, 3),
+        'test_rows_per_s': round(len(test_rows) / max(predict_seconds, 1e-9)),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'fit_rss_mb': round(fit_rss, 1),
+        'roc_auc': roc_auc_score(y[test_rows], proba)
+    }
+
+
+def plot_scaling(results, output_file):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(18, 5))
+    axes = fig.subplots(1, 3)
+    for model, runs in results.groupby('model'):
+        for ax, column in zip(axes, ['fit_seconds', 'roc_auc', 'peak_rss_mb']):
+            ax.plot(runs['train_rows'], runs[column], marker='o', label=model)
+    for ax, title in zip(axes, ['Fit time (s)', 'Test ROC AUC', 'Peak memory (MB)']):
+        ax.set_xscale('log')
+        ax.set_xlabel('Training rows')
+        ax.set_title(title)
+    axes[0].set_yscale('log')
+    axes[0].legend()
+    fig.tight_layout()
+    fig.savefig(output_file, dpi=120)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Fit time, memory and ROC AUC of each model family by data size')
+    parser.add_argument('--models', nargs='+', choices=MODELS, default=MODELS)
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help="training rows per run, or 'full'")
+    parser.add_argument('--target-roc-auc', type=float, default=None)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args(argv)
+
+    from feature_store import load_arrays
+    from sampling import split_rows, stratified_order
+
+    _, y, _ = load_arrays()
+    train_rows, test_rows = split_rows(len(y))
+    # Nested stratified samples: every size contains the rows of the smaller ones
+    order = train_rows[stratified_order(y[train_rows])]
+    sizes = sorted({len(train_rows) if size == 'full' else min(int(size), len(train_rows)) for size in args.sizes})
+
+    if 'neural' in args.models:
+        try:
+            import tensorflow  # noqa: F401
+        except ImportError:
+            logging.warning("TensorFlow is not installed; skipping the neural model")
+            args.models = [model for model in args.models if model != 'neural']
+
+    # A fresh process per run, so peak memory is measured per run
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for model in args.models:
+        for size in sizes:
+            rows = np.sort(order[:size])
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_one, model, rows, test_rows).result()
+            logging.info(f"{model} on {size} rows: fit {result['fit_seconds']}s, "
+                         f"ROC AUC {result['roc_auc']:.4f}, peak {result['peak_rss_mb']} MB")
+            results.append(result)
+
+    results = pd.DataFrame(results)
+    os.makedirs(args.output_dir, exist_ok=True)
+    results.to_csv(os.path.join(args.output_dir, 'scaling.csv'), index=False)
+    plot_scaling(results, os.path.join(args.output_dir, 'scaling.png'))
+    print(results.round(4).to_string(index=False))
+
+    if args.target_roc_auc is not None:
+        print(f"\nSmallest training size reaching ROC AUC {args.target_roc_auc}:")
+        for model, runs in results.groupby('model', sort=False):
+            passing = runs[runs['roc_auc'] >= args.target_roc_auc]
+            print(f"  {model}: {passing['train_rows'].min() if len(passing) else 'not reached'}")
+
+
+if __name__ == '__main__':
+    main()
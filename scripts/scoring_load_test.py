@@ -0,0 +1,87 @@
+"""Load test for scoring_server.py.
+
+Opens ``--concurrency`` keep-alive connections to a running scoring server
+and sends ``--requests`` POST /predict requests in total, each with
+``--rows-per-request`` incidents sampled from the feature store. Prints the
+p50/p90/p99 latency, the request and row throughput, and the server's batch
+statistics, and saves them as JSON:
+
+    python scoring_server.py --model brf &
+    python scoring_load_test.py --concurrency 64 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import numpy as np
+
+from feature_store import load_raw_features
+from http_service import HttpClient, latency_report
+
+
+def sample_incidents(n=2000, random_state=42):
+    """Incident dicts (the nine features, JSON-ready) drawn from the feature store."""
+    raw, _ = load_raw_features()
+    rows = raw.sample(n=min(n, len(raw)), random_state=random_state)
+    rows = rows.astype(object).where(rows.notna(), None)
+    return rows.to_dict(orient='records')
+
+
+async def run_load_test(host, port, incidents, concurrency, n_requests, rows_per_request):
+    latencies = []
+    errors = 0
+    sent = 0
+    rng = np.random.default_rng(0)
+
+    async def worker():
+        nonlocal errors, sent
+        client = await HttpClient(host, port).connect()
+        try:
+            while sent < n_requests:
+                sent += 1
+                picks = rng.integers(0, len(incidents), rows_per_request)
+                payload = {'incidents': [incidents[i] for i in picks]}
+                start = time.perf_counter()
+                status, _ = await client.request('POST', '/predict', payload)
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors += 1
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    report = latency_report(latencies, time.perf_counter() - start, errors)
+    report['rows_per_s'] = round(report['requests_per_s'] * rows_per_request, 1)
+
+    client = await HttpClient(host, port).connect()
+    _, report['server'] = await client.request('GET', '/health')
+    await client.close()
+    return report
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Load test the local scoring server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--rows-per-request', type=int, default=1)
+    parser.add_argument('--output', default='../data/scoring_load_test.json')
+    args = parser.parse_args(argv)
+
+    incidents = sample_incidents()
+    report = asyncio.run(run_load_test(args.host, args.port, incidents, args.concurrency,
+                                       args.requests, args.rows_per_request))
+    report.update(concurrency=args.concurrency, rows_per_request=args.rows_per_request)
+    print(json.dumps(report, indent=2))
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    logging.info(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
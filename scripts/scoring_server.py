@@ -0,0 +1,195 @@
+"""Local HTTP scoring service for Part I probabilities.
+
+Loads a saved model bundle (see ``model_artifacts.py``) once and answers on
+localhost:
+
+    POST /predict   {"incidents": [{"Hour": 14, "AREA NAME": "Central", ...}, ...]}
+                    -> {"probabilities": [0.71, ...]}
+    GET  /health    model name and version plus batching statistics
+
+Incidents carry the nine model features, or ``DATE OCC``/``TIME OCC`` in
+place of ``Hour``, ``DayOfWeek`` and ``Month``; missing features are NaN.
+Each request is converted to model features, and validated, on its own, and
+a batch whose prediction fails is rescored request by request, so a request
+with a bad value gets a 400 without affecting the others.
+
+Requests arriving within ``--max-latency-ms`` of each other are gathered into
+one micro-batch (at most ``--max-batch-rows`` incidents) and scored with a
+single vectorized prediction in a worker thread, so the event loop keeps
+accepting requests meanwhile.
+
+    python scoring_server.py --model brf [--port 8765] [--max-latency-ms 5] [--flat-trees]
+
+``--flat-trees`` scores tree models with ``flat_trees.FlatTreeModel``, which
+gives the same probabilities with far less overhead per micro-batch.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_store import FEATURES
+from http_service import HttpError, serve
+from model_artifacts import incident_features, load_bundle
+
+DATE_FEATURES = ['Hour', 'DayOfWeek', 'Month']
+
+
+class MicroBatcher:
+    """Gather concurrent scoring requests into batches for ``predict``.
+
+    Each request is a DataFrame of incident features; ``predict`` takes the
+    concatenated frames and returns one probability per row. A batch is
+    closed ``max_latency`` seconds after its first request arrives, or as
+    soon as it holds ``max_batch_rows`` incidents.
+    """
+
+    def __init__(self, predict, max_latency=0.005, max_batch_rows=4096):
+        self.predict = predict
+        self.max_latency = max_latency
+        self.max_batch_rows = max_batch_rows
+        self.queue = asyncio.Queue()
+        self.n_batches = 0
+        self.n_rows = 0
+        self.predict_seconds = 0.0
+
+    async def submit(self, frame):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((frame, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            n_rows = len(batch[0][0])
+            deadline = loop.time() + self.max_latency
+            while n_rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+            await self._score(batch)
+
+    async def _score(self, batch):
+        start = time.perf_counter()
+        try:
+            frame = pd.concat([request_frame for request_frame, _ in batch], ignore_index=True)
+            proba = await asyncio.to_thread(self.predict, frame)
+        except Exception as error:
+            if len(batch) > 1:
+                # Score the requests one by one, so only the request that fails gets the error
+                for item in batch:
+                    await self._score([item])
+                return
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        self.predict_seconds += time.perf_counter() - start
+        self.n_batches += 1
+        self.n_rows += len(frame)
+
+        proba = np.round(np.asarray(proba, dtype=np.float64), 6).tolist()
+        offset = 0
+        for request_frame, future in batch:
+            if not future.done():
+                future.set_result(proba[offset:offset + len(request_frame)])
+            offset += len(request_frame)
+
+    def stats(self):
+        return {
+            'batches': self.n_batches,
+            'rows': self.n_rows,
+            'mean_batch_rows': round(self.n_rows / self.n_batches, 1) if self.n_batches else 0,
+            'predict_seconds': round(self.predict_seconds, 3)
+        }
+
+
+def make_handler(bundle, batcher):
+    async def handler(method, path, query, body):
+        if path == '/health':
+            return {'model': bundle.name, 'version': bundle.version, **batcher.stats()}
+        if path != '/predict':
+            raise HttpError(404, f"Unknown path {path}")
+        if method != 'POST':
+            raise HttpError(405, "Use POST for /predict")
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HttpError(400, "Body is not valid JSON")
+        incidents = payload.get('incidents') if isinstance(payload, dict) else payload
+        if isinstance(incidents, dict):
+            incidents = [incidents]
+        if not isinstance(incidents, list) or not all(isinstance(row, dict) for row in incidents):
+            raise HttpError(400, "Expected {'incidents': [ {feature: value, ...}, ... ]}")
+        if not incidents:
+            return {'probabilities': []}
+        try:
+            return {'probabilities': await batcher.submit(request_features(incidents))}
+        except (KeyError, ValueError, TypeError) as error:
+            raise HttpError(400, f"Cannot score incidents: {error}")
+
+    return handler
+
+
+def request_features(incidents):
+    """The model features of one request's incidents, with features it lacks set to NaN.
+
+    Date features are derived here, per request, so a batch can mix requests
+    that send ``DATE OCC``/``TIME OCC`` with requests that send ``Hour``,
+    ``DayOfWeek`` and ``Month``. Raises ``ValueError`` on an unparseable date.
+    """
+    frame = pd.DataFrame(incidents, index=range(len(incidents)))
+    derived = 'DATE OCC' in frame.columns and 'TIME OCC' in frame.columns
+    for col in FEATURES:
+        if col not in frame.columns and not (derived and col in DATE_FEATURES):
+            frame[col] = np.nan
+    return incident_features(frame)
+
+
+async def run_server(bundle, host, port, max_latency, max_batch_rows):
+    batcher = MicroBatcher(bundle.predict_proba, max_latency, max_batch_rows)
+    batch_task = asyncio.create_task(batcher.run())
+    try:
+        await serve(make_handler(bundle, batcher), host, port)
+    finally:
+        batch_task.cancel()
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Serve Part I probabilities from a saved model bundle')
+    parser.add_argument('--model', required=True, help='bundle name, e.g. brf or gradient_boost')
+    parser.add_argument('--version', default=None, help='bundle version (default: latest)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-latency-ms', type=float, default=5.0,
+                        help='how long a batch waits for more requests after its first one')
+    parser.add_argument('--max-batch-rows', type=int, default=4096)
+    parser.add_argument('--flat-trees', action='store_true',
+                        help='score tree models from flattened node arrays (flat_trees.py)')
+    args = parser.parse_args(argv)
+
+    bundle = load_bundle(args.model, args.version)
+    logging.info(f"Loaded {bundle.name} {bundle.version} ({bundle.manifest['model']})")
+    if args.flat_trees:
+        from flat_trees import FlatTreeModel
+        bundle.model = FlatTreeModel(bundle.model)
+        logging.info(f"Scoring with {bundle.model.n_estimators} flattened trees ({bundle.model.engine})")
+    # Warm up once so the first request does not pay for lazy initialization
+    bundle.predict_proba(request_features([{}]))
+    asyncio.run(run_server(bundle, args.host, args.port, args.max_latency_ms / 1000, args.max_batch_rows))
+
+
+if __name__ == '__main__':
+    main()
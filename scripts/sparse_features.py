@@ -0,0 +1,116 @@
+"""Sparse float32 encoding of the Part I classifier features.
+
+``pd.get_dummies`` followed by ``SimpleImputer`` and ``StandardScaler``
+materializes several dense copies of an (incidents x ~50) matrix, mostly
+zeros. ``SparseFeatureEncoder`` instead builds a float32 CSR matrix with one
+stored value per numeric feature plus one per categorical feature and row.
+Missing numeric values are filled with the training medians and only the
+numeric columns are standardized; the one-hot columns stay 0/1, so the matrix
+stays sparse. The encoder is fitted once and reused for any later data.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from feature_store import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+from stage_trace import peak_rss_mb
+
+
+def nbytes(obj):
+    """Memory held by a NumPy array, sparse matrix or DataFrame."""
+    if sparse.issparse(obj):
+        return obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(obj.memory_usage(deep=True).sum())
+    return np.asarray(obj).nbytes
+
+
+def log_memory(stage, *objs):
+    """Log the size of the given objects and the process peak RSS."""
+    size = sum(nbytes(obj) for obj in objs) / 2 ** 20
+    logging.info(f"[memory] {stage}: {size:.1f} MB in data, peak RSS {peak_rss_mb():.1f} MB")
+
+
+class SparseFeatureEncoder:
+    """Median-impute and scale numeric columns, one-hot encode categoricals.
+
+    Output columns are the numeric features followed by one column per
+    category, named like ``pd.get_dummies`` names them (``AREA NAME_Central``).
+    Categories unseen during ``fit`` and missing categories encode as all
+    zeros.
+    """
+
+    def __init__(self, numeric=NUMERIC_FEATURES, categorical=CATEGORICAL_FEATURES, dtype=np.float32):
+        self.numeric = list(numeric)
+        self.categorical = list(categorical)
+        self.dtype = dtype
+
+    def fit(self, df):
+        values = df[self.numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+        self.medians_ = np.nanmedian(values, axis=0)
+        values = np.where(np.isnan(values), self.medians_, values)
+        self.means_ = values.mean(axis=0)
+        scales = values.std(axis=0)
+        self.scales_ = np.where(scales == 0, 1.0, scales)
+
+        self.categories_ = {}
+        for col in self.categorical:
+            column = df[col]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                # Only categories that actually occur, as get_dummies would
+                present = np.unique(column.cat.codes[column.cat.codes >= 0])
+                self.categories_[col] = list(column.cat.categories[present])
+            else:
+                self.categories_[col] = sorted(column.dropna().unique())
+        return self
+
+    def get_feature_names_out(self):
+        names = list(self.numeric)
+        for col in self.categorical:
+            names.extend(f'{col}_{value}' for value in self.categories_[col])
+        return names
+
+    def transform(self, df):
+        n_rows = len(df)
+        n_numeric = len(self.numeric)
+
+        numeric = df[self.numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+        numeric = np.where(np.isnan(numeric), self.medians_, numeric)
+        numeric = ((numeric - self.means_) / self.scales_).astype(self.dtype)
+
+        # Column index of each row's category, -1 where missing or unseen
+        offset = n_numeric
+        cat_columns = np.empty((n_rows, len(self.categorical)), dtype=np.int64)
+        for i, col in enumerate(self.categorical):
+            categories = self.categories_[col]
+            codes = pd.Categorical(df[col], categories=categories).codes.astype(np.int64)
+            cat_columns[:, i] = np.where(codes >= 0, codes + offset, -1)
+            offset += len(categories)
+
+        # Assemble CSR arrays directly: numeric entries first, then the ones
+        present = cat_columns >= 0
+        row_nnz = n_numeric + present.sum(axis=1)
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(row_nnz, out=indptr[1:])
+
+        if indptr[-1] < 2 ** 31:
+            indptr = indptr.astype(np.int32)
+        indices = np.empty(indptr[-1], dtype=indptr.dtype)
+        data = np.empty(indptr[-1], dtype=self.dtype)
+        starts = indptr[:-1]
+        for j in range(n_numeric):
+            indices[starts + j] = j
+            data[starts + j] = numeric[:, j]
+        slot = starts + n_numeric
+        for i in range(len(self.categorical)):
+            rows = present[:, i]
+            indices[slot[rows]] = cat_columns[rows, i]
+            data[slot[rows]] = 1
+            slot = slot + rows
+
+        return sparse.csr_matrix((data, indices, indptr), shape=(n_rows, offset))
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
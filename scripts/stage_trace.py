@@ -0,0 +1,329 @@
+"""Stage-level timing and memory traces for the scripts.
+
+Wrap the expensive parts of a script in stages:
+
+    from stage_trace import stage, traced
+
+    with stage('read_gpkg') as s:
+        gdf = gpd.read_file('../data/processed_crime_data_2010_2023.gpkg')
+        s.rows = len(gdf)
+
+    @traced('h3_index')
+    def index_cells(df): ...
+
+Library modules use ``nested_stage``, which is recorded only inside a stage
+the running script opened, so importing and calling them from anywhere else
+never starts a trace or writes a file.
+
+Each stage records wall time, CPU time of this process (worker processes
+are not included), peak resident memory and an optional row count
+(``@traced`` takes it from the ``shape`` of the return value). Stages nest;
+the run totals cover the time from the first stage to exit.
+On Linux a stage's peak is the process peak (``VmHWM``) when that rose during
+the stage, else the highest resident memory sampled every 10 ms while the
+stage ran; the kernel counter is never reset, so other readers of it are
+unaffected. Elsewhere the process peak so far is recorded.
+
+When the script exits, its trace is written as JSON to
+``../data/traces/<script>-<time>-<pid>.json`` (``STAGE_TRACE_DIR`` overrides
+the directory and ``STAGE_TRACE=0`` disables writing). Compare runs with:
+
+    python stage_trace.py summary [--script process-crime-data] [--last 5] [--metric wall_s]
+    python stage_trace.py compare [OLD.json NEW.json] [--script ...]
+"""
+import argparse
+import atexit
+import functools
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+TRACE_DIR = '../data/traces'
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_INTERVAL = 0.01
+
+
+def _status_mb(key):
+    """A memory line of /proc/self/status (e.g. ``VmHWM``) in MB, or None off Linux."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(key + ':'):
+                    return int(line.split()[1]) / 2 ** 10
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    # On Linux prefer VmHWM: ru_maxrss survives exec, so a spawned worker
+    # would report its parent's peak
+    peak = _status_mb('VmHWM')
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes on Linux
+        peak = peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+    return peak
+
+
+class _RssSampler(threading.Thread):
+    """Raises the peak of every open stage to the resident memory sampled every ``interval`` seconds."""
+
+    def __init__(self, stack, interval=SAMPLE_INTERVAL):
+        super().__init__(name='stage_trace', daemon=True)
+        self.stack = stack
+        self.interval = interval
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            if self.stack:
+                rss = _status_mb('VmRSS')
+                for record in list(self.stack):
+                    record._peak = max(record._peak, rss)
+
+
+@dataclass
+class StageRecord:
+    name: str
+    path: str
+    depth: int
+    start_s: float = 0.0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_mb: float = 0.0
+    rss_start_mb: float = None
+    rss_end_mb: float = None
+    rows: int = None
+    status: str = 'ok'
+    _peak: float = field(default=0.0, repr=False)
+    _peak_before: float = field(default=0.0, repr=False)
+
+
+class RunTrace:
+    """The stages of one script run."""
+
+    def __init__(self, script):
+        self.script = script
+        self.argv = sys.argv[1:]
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self._wall0, self._cpu0 = time.perf_counter(), time.process_time()
+        self.records = []
+        self._stack = []
+        self._sampler = None
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        parent = self._stack[-1] if self._stack else None
+        record = StageRecord(name, f'{parent.path}/{name}' if parent else name, len(self._stack), rows=rows,
+                             start_s=round(time.perf_counter() - self._wall0, 4), rss_start_mb=_status_mb('VmRSS'))
+        record._peak_before = peak_rss_mb()
+        record._peak = record.rss_start_mb or 0.0
+        if self._sampler is None and record.rss_start_mb is not None:
+            self._sampler = _RssSampler(self._stack)
+            self._sampler.start()
+
+        self._stack.append(record)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except BaseException:
+            record.status = 'error'
+            raise
+        finally:
+            record.wall_s = round(time.perf_counter() - wall, 4)
+            record.cpu_s = round(time.process_time() - cpu, 4)
+            record.rss_end_mb = _status_mb('VmRSS')
+            self._stack.pop()
+            peak_after = peak_rss_mb()
+            if record.rss_end_mb is None or peak_after > record._peak_before:
+                # A new process peak was reached during this stage (or memory is not sampled here)
+                peak = peak_after
+            else:
+                peak = max(record._peak, record.rss_end_mb)
+            record.peak_rss_mb = round(peak, 1)
+            if parent:
+                parent._peak = max(parent._peak, peak)
+            self.records.append(record)
+
+    def to_dict(self):
+        stages = []
+        for record in sorted(self.records, key=lambda r: r.start_s):
+            stage = asdict(record)
+            del stage['_peak'], stage['_peak_before']
+            stages.append(stage)
+        return {
+            'script': self.script,
+            'argv': self.argv,
+            'started': self.started,
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'wall_s': round(time.perf_counter() - self._wall0, 4),
+            'cpu_s': round(time.process_time() - self._cpu0, 4),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'stages': stages
+        }
+
+    def write(self, trace_dir=None):
+        trace_dir = trace_dir or os.environ.get('STAGE_TRACE_DIR') or TRACE_DIR
+        os.makedirs(trace_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(trace_dir, f'{self.script}-{stamp}-{os.getpid()}.json')
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+        return path
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, check=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+_trace = None
+
+
+def _write_at_exit():
+    if _trace is not None and _trace.records and os.environ.get('STAGE_TRACE', '1') != '0':
+        try:
+            _trace.write()
+        except OSError as error:
+            print(f"Could not write the stage trace: {error}", file=sys.stderr)
+
+
+def get_trace():
+    """This process's trace, created (and set to be written at exit) on first use."""
+    global _trace
+    if _trace is None:
+        _trace = RunTrace(os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0])
+        atexit.register(_write_at_exit)
+    return _trace
+
+
+def stage(name, rows=None):
+    """Context manager recording one stage of this run."""
+    return get_trace().stage(name, rows)
+
+
+def nested_stage(name, rows=None):
+    """Like ``stage``, but recorded only while a stage of this process is open.
+
+    For library code: when no script in this process traces its stages the
+    block runs untraced, and no trace is created or written.
+    """
+    if _trace is None or not _trace._stack:
+        return nullcontext(StageRecord(name, name, 0, rows=rows))
+    return _trace.stage(name, rows)
+
+
+def traced(name=None):
+    """Decorator recording each call as a stage named ``name`` (default: the function name)."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name or function.__name__) as record:
+                result = function(*args, **kwargs)
+                if record.rows is None and hasattr(result, 'shape'):
+                    record.rows = int(result.shape[0])
+                return result
+        return wrapper
+    return decorate
+
+
+def load_traces(paths=None, script=None, trace_dir=TRACE_DIR):
+    """Traces from ``paths`` (default: every trace in ``trace_dir``), oldest first."""
+    paths = paths or glob.glob(os.path.join(trace_dir, '*.json'))
+    traces = []
+    for path in paths:
+        with open(path) as file:
+            trace = json.load(file)
+        trace['file'] = os.path.basename(path)
+        if script is None or trace['script'] == script:
+            traces.append(trace)
+    return sorted(traces, key=lambda trace: (trace['started'], trace['file']))
+
+
+def stage_table(trace):
+    """One row per stage path; repeated stages are summed (peak: max)."""
+    import pandas as pd
+
+    stages = pd.DataFrame(trace['stages'], columns=['path', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rows', 'status'])
+    table = stages.groupby('path', sort=False).agg(calls=('wall_s', 'size'), wall_s=('wall_s', 'sum'),
+                                                  cpu_s=('cpu_s', 'sum'), peak_rss_mb=('peak_rss_mb', 'max'),
+                                                  rows=('rows', lambda rows: rows.sum(min_count=1)))
+    table.loc['(total)'] = [1, trace['wall_s'], trace['cpu_s'], trace['peak_rss_mb'], None]
+    return table
+
+
+def summarize(traces, metric='wall_s'):
+    """``metric`` of every stage (rows) in every run (columns)."""
+    import pandas as pd
+
+    columns = {f"{trace['script']} {trace['started']} {trace.get('commit') or ''}".strip(): stage_table(trace)[metric]
+               for trace in traces}
+    return pd.DataFrame(columns)
+
+
+def compare(old, new, threshold=0.2, min_seconds=0.1):
+    """Per-stage change from the ``old`` trace to the ``new`` one, largest wall-time change first.
+
+    Stages slower by more than ``threshold`` (and by at least ``min_seconds``,
+    so sub-second noise is not flagged) are marked ``slower``.
+    """
+    old_table, new_table = stage_table(old), stage_table(new)
+    table = old_table[['wall_s', 'cpu_s', 'peak_rss_mb', 'rows']].join(
+        new_table[['wall_s', 'cpu_s', 'peak_rss_mb', 'rows']], how='outer', lsuffix='_old', rsuffix='_new')
+    table['wall_change'] = table['wall_s_new'] / table['wall_s_old'] - 1
+    table['slower'] = (table['wall_change'] > threshold) & (table['wall_s_new'] - table['wall_s_old'] >= min_seconds)
+    return table.reindex(table['wall_s_new'].sub(table['wall_s_old']).abs().sort_values(ascending=False).index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize and compare stage traces')
+    parser.add_argument('--trace-dir', default=TRACE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    summary_parser = commands.add_parser('summary', help='one column per run, one row per stage')
+    summary_parser.add_argument('traces', nargs='*', help='trace files (default: all in --trace-dir)')
+    summary_parser.add_argument('--script', default=None, help='only runs of this script')
+    summary_parser.add_argument('--last', type=int, default=5, help='most recent runs to show')
+    summary_parser.add_argument('--metric', choices=['wall_s', 'cpu_s', 'peak_rss_mb', 'rows'], default='wall_s')
+    compare_parser = commands.add_parser('compare', help='stage-by-stage change between two runs')
+    compare_parser.add_argument('traces', nargs='*', help='OLD and NEW trace files (default: the last two runs)')
+    compare_parser.add_argument('--script', default=None, help='only runs of this script')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help='wall-time increase flagged as slower')
+    compare_parser.add_argument('--min-seconds', type=float, default=0.1, help='smallest increase flagged as slower')
+    args = parser.parse_args(argv)
+
+    import pandas as pd
+
+    traces = load_traces(args.traces, args.script, args.trace_dir)
+    pd.set_option('display.width', 200)
+    if args.command == 'summary':
+        if not traces:
+            raise SystemExit(f"No traces found in {args.trace_dir}")
+        print(summarize(traces[-args.last:], args.metric).round(3).to_string())
+        return
+
+    if len(traces) < 2:
+        raise SystemExit("Need two traces to compare")
+    old, new = traces[-2:]
+    if old['script'] != new['script']:
+        print(f"Note: comparing different scripts ({old['script']} and {new['script']})")
+    print(f"Old: {old['file']} ({old.get('commit')})\nNew: {new['file']} ({new.get('commit')})\n")
+    print(compare(old, new, args.threshold, args.min_seconds).round(3).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Streaming pairwise correlation of the classifier features.
+
+``DataFrame.corr()`` converts the whole matrix to float64 before its
+O(n * p^2) pass. ``StreamingCovariance`` reads the rows in chunks instead,
+in float64 one chunk at a time, from a dense float32 array (a memory map
+works), a DataFrame or a sparse matrix. Each chunk's co-moments are merged
+into the running totals with the pairwise update of Chan et al., so the
+result does not lose precision as rows accumulate.
+
+Like ``DataFrame.corr()``, NaNs are skipped pairwise: each pair of columns
+uses the rows where both are present, and the results match pandas.
+
+``streaming_correlation(..., sample_rows=k)`` estimates the matrix from a
+random subset of rows; ``fisher_interval`` turns that into per-entry
+confidence bounds.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+
+# Rows per chunk; a chunk of 100k rows x 60 columns is ~50 MB in float64
+CHUNK_ROWS = 100_000
+
+
+def _divide(a, b):
+    return np.divide(a, b, out=np.zeros(np.broadcast(a, b).shape), where=b > 0)
+
+
+def _chunk_moments(chunk, shift):
+    """Pairwise counts, means and co-moments of one chunk.
+
+    ``n[i, j]`` counts rows where both columns are present, ``mean[i, j]`` is
+    the mean of column i over those rows, and ``comoment``/``m2`` are the
+    sums of centered cross products and squares over the same rows.
+    """
+    if sparse.issparse(chunk) and not np.isnan(chunk.data).any():
+        # NaN-free sparse chunk: every pair is present in every row, and the
+        # products stay sparse (no shift, which would make the chunk dense)
+        chunk = sparse.csr_matrix(chunk, dtype=np.float64)
+        n_cols = chunk.shape[1]
+        n = np.full((n_cols, n_cols), float(chunk.shape[0]))
+        sums = np.broadcast_to(np.asarray(chunk.sum(axis=0)).ravel()[:, None], n.shape)
+        products = (chunk.T @ chunk).toarray()
+        squares = np.broadcast_to(np.asarray(chunk.multiply(chunk).sum(axis=0)).ravel()[:, None], n.shape)
+    else:
+        if sparse.issparse(chunk):
+            chunk = chunk.toarray()
+        # Shifting by a rough column mean keeps the products small
+        chunk = np.asarray(chunk, dtype=np.float64) - shift
+        present = ~np.isnan(chunk)
+        values = np.where(present, chunk, 0.0)
+        present = present.astype(np.float64)
+        n = present.T @ present
+        sums = values.T @ present
+        products = values.T @ values
+        squares = (values * values).T @ present
+
+    mean = _divide(sums, n)
+    comoment = products - _divide(sums * sums.T, n)
+    m2 = squares - _divide(sums * sums, n)
+    return n, mean, comoment, m2
+
+
+class StreamingCovariance:
+    """Pairwise-complete covariance and correlation accumulated over chunks."""
+
+    def __init__(self, n_features):
+        self.n = np.zeros((n_features, n_features))
+        self.mean = np.zeros((n_features, n_features))
+        self.comoment = np.zeros((n_features, n_features))
+        self.m2 = np.zeros((n_features, n_features))
+        self.shift = None
+
+    def update(self, chunk):
+        if self.shift is None:
+            if sparse.issparse(chunk):
+                self.shift = np.zeros(chunk.shape[1])
+            else:
+                with np.errstate(all='ignore'):
+                    self.shift = np.nan_to_num(np.nanmean(np.asarray(chunk, dtype=np.float64), axis=0))
+        n_b, mean_b, comoment_b, m2_b = _chunk_moments(chunk, self.shift)
+
+        # Chan et al.: combine two sets of centered sums via the mean difference
+        n = self.n + n_b
+        weight = _divide(self.n * n_b, n)
+        delta = mean_b - self.mean
+        self.comoment += comoment_b + delta * delta.T * weight
+        self.m2 += m2_b + delta * delta * weight
+        self.mean += delta * _divide(n_b, n)
+        self.n = n
+        return self
+
+    def covariance(self, ddof=1):
+        cov = self.comoment / (self.n - ddof)
+        cov[self.n <= ddof] = np.nan
+        return cov
+
+    def correlation(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        corr[self.n < 2] = np.nan
+        return np.clip(corr, -1, 1)
+
+
+def streaming_correlation(X, columns=None, chunk_rows=CHUNK_ROWS, sample_rows=None, random_state=42):
+    """Correlation matrix of ``X`` as a DataFrame, computed chunk by chunk.
+
+    With ``sample_rows`` only that many randomly chosen rows are read; the
+    pairwise row counts are returned in ``.attrs['n']`` for
+    ``fisher_interval``.
+    """
+    if isinstance(X, pd.DataFrame):
+        columns = X.columns if columns is None else columns
+        X = X.to_numpy(copy=False)
+    if sparse.issparse(X):
+        X = X.tocsr()
+
+    n_rows = X.shape[0]
+    if sample_rows is not None and sample_rows < n_rows:
+        rows = np.sort(np.random.default_rng(random_state).choice(n_rows, size=sample_rows, replace=False))
+    else:
+        rows = None
+
+    acc = StreamingCovariance(X.shape[1])
+    n_selected = n_rows if rows is None else len(rows)
+    for start in range(0, n_selected, chunk_rows):
+        if rows is None:
+            acc.update(X[start:start + chunk_rows])
+        else:
+            acc.update(X[rows[start:start + chunk_rows]])
+
+    corr = pd.DataFrame(acc.correlation(), index=columns, columns=columns)
+    corr.attrs['n'] = acc.n
+    return corr
+
+
+def fisher_interval(corr, n, confidence=0.95):
+    """Confidence bounds of sample correlations from the Fisher z-transform.
+
+    ``n`` is the number of rows behind each entry (``corr.attrs['n']``).
+    Returns ``(lower, upper)`` arrays.
+    """
+    r = np.clip(np.asarray(corr, dtype=np.float64), -0.999999, 0.999999)
+    z = np.arctanh(r)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        se = 1 / np.sqrt(np.asarray(n) - 3)
+    half_width = stats.norm.ppf(0.5 + confidence / 2) * se
+    return np.tanh(z - half_width), np.tanh(z + half_width)
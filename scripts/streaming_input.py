@@ -0,0 +1,92 @@
+"""Streaming ``tf.data`` input for the neural classifier.
+
+Instead of scaling the whole feature matrix in memory, batches are read from
+the memory-mapped feature store as training needs them. The scaling
+statistics are computed chunk by chunk over the training rows. Batch reads
+and scaling run in parallel ``tf.data`` map calls, and batches are prefetched
+while the previous step trains.
+
+Missing values are filled with the stored column medians before scaling, as
+``load_features(impute=True)`` does; the network cannot train on NaN.
+"""
+import math
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+# Rows per chunk when computing the scaling statistics
+CHUNK_ROWS = 1_000_000
+
+
+def split_indices(n_rows, test_size=0.2, validation_split=0.2, random_state=42):
+    """Train, validation and test row indices.
+
+    The test rows match ``train_test_split(X, y, test_size, random_state)``
+    and the validation rows are the last ``validation_split`` of the training
+    rows, like Keras ``fit(validation_split=...)`` takes them.
+    """
+    train, test = train_test_split(np.arange(n_rows), test_size=test_size, random_state=random_state)
+    split_at = int(math.ceil(len(train) * (1.0 - validation_split)))
+    return train[:split_at], train[split_at:], test
+
+
+def read_rows(X, rows, medians):
+    """Rows of ``X`` (sorted for sequential reads) in float64 with NaN filled."""
+    chunk = np.asarray(X[np.sort(rows)], dtype=np.float64)
+    return np.where(np.isnan(chunk), medians, chunk)
+
+
+def streaming_scaler(X, rows, medians, chunk_size=CHUNK_ROWS):
+    """Column means and scales of ``X[rows]``, as ``StandardScaler`` fits them.
+
+    Chunk means and sums of squared deviations are merged with the pairwise
+    update of Chan et al., which stays accurate in float64 over any number of
+    rows.
+    """
+    count = 0
+    mean = np.zeros(X.shape[1])
+    m2 = np.zeros(X.shape[1])
+    for start in range(0, len(rows), chunk_size):
+        chunk = read_rows(X, rows[start:start + chunk_size], medians)
+        n = len(chunk)
+        chunk_mean = chunk.mean(axis=0)
+        delta = chunk_mean - mean
+        total = count + n
+        mean = mean + delta * n / total
+        m2 = m2 + ((chunk - chunk_mean) ** 2).sum(axis=0) + delta ** 2 * count * n / total
+        count = total
+    std = np.sqrt(m2 / count)
+    return mean, np.where(std == 0, 1.0, std)
+
+
+def make_dataset(X, y, rows, medians, mean, scale, batch_size=1024, shuffle=False, parallel_calls=None, seed=42):
+    """``tf.data.Dataset`` of scaled float32 ``(x, y)`` batches of ``X[rows]``.
+
+    With ``shuffle=True`` the rows are permuted once and the order of the
+    batches is reshuffled every epoch. ``parallel_calls=None`` lets tf.data
+    tune the number of parallel batch reads.
+    """
+    import tensorflow as tf
+
+    rows = np.asarray(rows)
+    if shuffle:
+        rows = np.random.default_rng(seed).permutation(rows)
+    n_batches = int(math.ceil(len(rows) / batch_size))
+    n_features = X.shape[1]
+
+    def load_batch(i):
+        batch = np.sort(rows[i * batch_size:(i + 1) * batch_size])
+        x = (read_rows(X, batch, medians) - mean) / scale
+        return x.astype(np.float32), y[batch].astype(np.float32)
+
+    def parse(i):
+        x, target = tf.numpy_function(load_batch, [i], (tf.float32, tf.float32))
+        x.set_shape([None, n_features])
+        target.set_shape([None])
+        return x, target
+
+    dataset = tf.data.Dataset.range(n_batches)
+    if shuffle:
+        dataset = dataset.shuffle(n_batches, seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.map(parse, num_parallel_calls=parallel_calls or tf.data.AUTOTUNE, deterministic=not shuffle)
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,346 @@
+"""Synthetic LAPD crime exports for benchmarking without the real data.
+
+Writes the two CSV files process-crime-data.py reads, with the columns of the
+LAPD open-data exports (the 2010-2019 export names the area code column
+``AREA `` with a trailing space; the 2020-present export names it ``AREA``),
+plus a simplified LA County boundary as ``Base_Map/tl_2024_us_county.shp`` for
+the scripts that draw the county outline.
+
+Rows are generated in vectorized chunks. Marginals follow the real exports
+closely enough for the analysis and models to do representative work:
+
+* ``AREA``/``AREA NAME``: the 21 LAPD divisions, weighted by their share of
+  incidents.
+* ``Crm Cd``/``Crm Cd Desc``/``Part 1-2``: the most common offenses, about
+  60% Part I. Weapon, premise and victim fields depend on the offense, so
+  the Part I classifiers have signal to learn.
+* ``Status Desc``: mostly ``Invest Cont``, with adult and juvenile arrests.
+* ``DATE OCC``: 2010-01-01 to 2024-10-28 with seasonal, weekly and
+  first-of-month peaks; ``TIME OCC`` with the noon spike and rounding to the
+  hour and half hour of real reports.
+* ``LAT``/``LON``: scattered around each division's center, to 4 decimals,
+  and always inside LA County.
+
+    python synthetic_data.py --rows 1M [--output-dir ../data/synthetic/1M] [--seed 42]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+OUTPUT_DIR = '../data/synthetic'
+CHUNK_ROWS = 1_000_000
+START_DATE, END_DATE = '2010-01-01', '2024-10-28'
+EXPORT_2010 = 'Crime_Data_from_2010_to_2019_20241123.csv'
+EXPORT_2020 = 'Crime_Data_from_2020_to_Present_20241028.csv'
+COUNTY_SHAPEFILE = 'Base_Map/tl_2024_us_county.shp'
+# Bumped whenever the generated data changes, so stale workspaces are regenerated
+GENERATOR_VERSION = 2
+# DR_NO is the two-digit year followed by an eight-digit row number
+MAX_ROWS = 10 ** 8
+
+COLUMNS = ['DR_NO', 'Date Rptd', 'DATE OCC', 'TIME OCC', 'AREA', 'AREA NAME', 'Rpt Dist No', 'Part 1-2', 'Crm Cd',
+           'Crm Cd Desc', 'Mocodes', 'Vict Age', 'Vict Sex', 'Vict Descent', 'Premis Cd', 'Premis Desc',
+           'Weapon Used Cd', 'Weapon Desc', 'Status', 'Status Desc', 'Crm Cd 1', 'Crm Cd 2', 'Crm Cd 3', 'Crm Cd 4',
+           'LOCATION', 'Cross Street', 'LAT', 'LON']
+
+# (code, name, center latitude, center longitude, share of incidents)
+AREAS = [
+    (1, 'Central', 34.0443, -118.2504, 6.8), (2, 'Rampart', 34.0617, -118.2790, 4.6),
+    (3, 'Southwest', 34.0134, -118.3059, 5.6), (4, 'Hollenbeck', 34.0469, -118.2133, 3.6),
+    (5, 'Harbor', 33.7573, -118.2896, 4.1), (6, 'Hollywood', 34.0951, -118.3310, 5.0),
+    (7, 'Wilshire', 34.0584, -118.3551, 4.7), (8, 'West LA', 34.0437, -118.4330, 4.4),
+    (9, 'Van Nuys', 34.1839, -118.4451, 4.5), (10, 'West Valley', 34.1935, -118.5474, 4.2),
+    (11, 'Northeast', 34.1190, -118.2491, 4.2), (12, '77th Street', 33.9707, -118.2784, 6.3),
+    (13, 'Newton', 34.0126, -118.2566, 4.6), (14, 'Pacific', 33.9920, -118.4200, 5.6),
+    (15, 'N Hollywood', 34.1718, -118.3859, 5.2), (16, 'Foothill', 34.2530, -118.4100, 3.4),
+    (17, 'Devonshire', 34.2565, -118.5310, 4.1), (18, 'Southeast', 33.9390, -118.2750, 4.9),
+    (19, 'Mission', 34.2700, -118.4600, 4.2), (20, 'Olympic', 34.0503, -118.2913, 4.7),
+    (21, 'Topanga', 34.2210, -118.6000, 4.1)
+]
+
+# (code, description, Part 1-2, share, probability a weapon is recorded, typical victim)
+CRIMES = [
+    (510, 'VEHICLE - STOLEN', 1, 11.0, 0.00, 'none'),
+    (330, 'BURGLARY FROM VEHICLE', 1, 6.5, 0.01, 'person'),
+    (310, 'BURGLARY', 1, 6.5, 0.01, 'person'),
+    (230, 'ASSAULT WITH DEADLY WEAPON, AGGRAVATED ASSAULT', 1, 6.0, 1.00, 'person'),
+    (440, 'THEFT PLAIN - PETTY ($950 & UNDER)', 1, 6.5, 0.01, 'person'),
+    (341, 'THEFT-GRAND ($950.01 & OVER)EXCPT,GUNS,FOWL,LIVESTK,PROD', 1, 3.8, 0.01, 'person'),
+    (420, 'THEFT FROM MOTOR VEHICLE - PETTY ($950 & UNDER)', 1, 3.3, 0.00, 'person'),
+    (210, 'ROBBERY', 1, 3.8, 0.95, 'person'),
+    (331, 'THEFT FROM MOTOR VEHICLE - GRAND ($950.01 AND OVER)', 1, 2.5, 0.00, 'person'),
+    (350, 'THEFT, PERSON', 1, 1.0, 0.05, 'person'),
+    (410, 'BURGLARY FROM VEHICLE, ATTEMPTED', 1, 0.6, 0.01, 'person'),
+    (121, 'RAPE, FORCIBLE', 1, 0.4, 0.70, 'person'),
+    (442, 'SHOPLIFTING - PETTY THEFT ($950 & UNDER)', 1, 2.2, 0.02, 'business'),
+    (624, 'BATTERY - SIMPLE ASSAULT', 2, 8.0, 0.98, 'person'),
+    (740, 'VANDALISM - FELONY ($400 & OVER, ALL CHURCH VANDALISMS)', 2, 6.8, 0.03, 'person'),
+    (626, 'INTIMATE PARTNER - SIMPLE ASSAULT', 2, 5.0, 0.99, 'person'),
+    (354, 'THEFT OF IDENTITY', 2, 5.0, 0.00, 'person'),
+    (745, 'VANDALISM - MISDEAMEANOR ($399 OR UNDER)', 2, 2.6, 0.03, 'person'),
+    (930, 'CRIMINAL THREATS - NO WEAPON DISPLAYED', 2, 2.4, 0.90, 'person'),
+    (900, 'VIOLATION OF COURT ORDER', 2, 1.6, 0.10, 'person'),
+    (888, 'TRESPASSING', 2, 1.3, 0.05, 'business'),
+    (236, 'INTIMATE PARTNER - AGGRAVATED ASSAULT', 2, 1.5, 1.00, 'person'),
+    (946, 'OTHER MISCELLANEOUS CRIME', 2, 1.4, 0.10, 'business'),
+    (761, 'BRANDISH WEAPON', 2, 0.9, 1.00, 'person')
+]
+
+# (code, description, share, share among vehicle offenses)
+PREMISES = [
+    (101, 'STREET', 22.0, 55.0), (501, 'SINGLE FAMILY DWELLING', 17.0, 6.0),
+    (502, 'MULTI-UNIT DWELLING (APARTMENT, DUPLEX, ETC)', 12.5, 4.0), (108, 'PARKING LOT', 7.0, 20.0),
+    (102, 'SIDEWALK', 5.0, 1.0), (203, 'OTHER BUSINESS', 4.5, 1.0), (122, 'VEHICLE, PASSENGER/TRUCK', 3.0, 3.0),
+    (103, 'ALLEY', 1.2, 1.0), (404, 'DEPARTMENT STORE', 1.5, 0.0), (210, 'RESTAURANT/FAST FOOD', 1.5, 0.2),
+    (707, 'GARAGE/CARPORT', 1.4, 4.0), (405, 'CLOTHING STORE', 0.8, 0.0), (104, 'DRIVEWAY', 1.0, 3.0),
+    (503, 'HOTEL', 0.9, 0.3), (710, 'OTHER PREMISE', 1.0, 0.5), (402, 'MARKET', 1.0, 0.0),
+    (504, 'OTHER RESIDENCE', 1.0, 0.5), (801, 'MTA BUS', 0.4, 0.0), (119, 'PORCH, RESIDENTIAL', 0.6, 0.0),
+    (406, 'OTHER STORE', 0.9, 0.0)
+]
+
+# (code, description, share among incidents with a weapon)
+WEAPONS = [
+    (400, 'STRONG-ARM (HANDS, FIST, FEET OR BODILY FORCE)', 52.0), (500, 'UNKNOWN WEAPON/OTHER WEAPON', 11.0),
+    (511, 'VERBAL THREAT', 8.5), (102, 'HAND GUN', 5.5), (200, 'KNIFE WITH BLADE 6INCHES OR LESS', 2.2),
+    (109, 'SEMI-AUTOMATIC PISTOL', 1.8), (207, 'OTHER KNIFE', 1.5), (106, 'UNKNOWN FIREARM', 1.4),
+    (307, 'VEHICLE', 1.2), (308, 'STICK', 0.9), (512, 'MACE/PEPPER SPRAY', 0.8), (216, 'OTHER CUTTING INSTRUMENT', 0.5),
+    (306, 'ROCK/THROWN OBJECT', 0.9), (312, 'PIPE/METAL PIPE', 0.4)
+]
+
+# (code, description, share)
+STATUSES = [('IC', 'Invest Cont', 76.0), ('AO', 'Adult Other', 12.5), ('AA', 'Adult Arrest', 10.0),
+            ('JA', 'Juv Arrest', 0.9), ('JO', 'Juv Other', 0.55), ('CC', 'UNK', 0.05)]
+
+VICT_SEX = [('M', 41.0), ('F', 37.0), ('X', 9.0), ('H', 0.01), (None, 12.99)]
+VICT_DESCENT = [('H', 30.0), ('W', 20.0), ('B', 14.0), ('X', 10.0), ('O', 8.0), ('A', 2.2), ('K', 0.5),
+                ('F', 0.4), ('C', 0.4), (None, 14.5)]
+
+# Relative incidents per hour of the day (0-23)
+HOUR_WEIGHTS = [4.0, 2.6, 2.3, 1.9, 1.5, 1.5, 2.3, 2.9, 4.1, 4.2, 4.5, 4.4, 7.0, 4.9, 4.9, 5.3, 5.3, 5.7, 5.8, 5.5,
+                5.6, 5.0, 4.7, 4.1]
+
+# Simplified LA County mainland boundary (lon, lat)
+LA_COUNTY = [(-118.94, 34.04), (-118.65, 34.24), (-118.88, 34.82), (-117.65, 34.82), (-117.65, 34.10),
+             (-117.78, 33.95), (-117.98, 33.86), (-118.12, 33.74), (-118.28, 33.70), (-118.42, 33.75),
+             (-118.40, 33.88), (-118.52, 34.03), (-118.80, 34.00)]
+
+STREETS = ['MAIN', 'BROADWAY', 'FIGUEROA', 'VERMONT', 'WESTERN', 'SUNSET', 'HOLLYWOOD', 'WILSHIRE', 'OLYMPIC',
+           'PICO', 'VENICE', 'SEPULVEDA', 'VENTURA', 'VAN NUYS', 'RESEDA', 'SHERMAN', 'ROSCOE', 'CRENSHAW',
+           'MANCHESTER', 'FLORENCE', 'SLAUSON', 'VERNON', 'CESAR E CHAVEZ', 'SAN FERNANDO', 'EAGLE ROCK']
+STREET_TYPES = ['ST', 'AV', 'BL', 'DR', 'WY']
+
+
+def parse_rows(value):
+    """Row count from ``10k``, ``1M``, ``20M`` or a plain integer."""
+    value = str(value).strip().upper()
+    scale = {'K': 1_000, 'M': 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip('KM')) * scale)
+
+
+def _weights(values):
+    weights = np.asarray(values, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def _day_table():
+    """Every day in the date range, its DATE OCC string and its weight."""
+    days = pd.date_range(START_DATE, END_DATE, freq='D')
+    weights = (1 + 0.08 * np.sin(2 * np.pi * (days.dayofyear - 100) / 365.25)
+               + 0.06 * (days.dayofweek == 4)
+               # Many reports carry the first of the month (or January 1st) as an estimated date
+               + 0.8 * (days.day == 1) + 2.0 * ((days.month == 1) & (days.day == 1)))
+    return days, np.asarray(days.strftime('%m/%d/%Y 12:00:00 AM'), dtype=object), _weights(weights)
+
+
+class _Tables:
+    """Lookup arrays built once and indexed by the sampled codes."""
+
+    def __init__(self):
+        self.days, self.day_strings, self.day_weights = _day_table()
+        self.area_code = np.array([a[0] for a in AREAS])
+        self.area_name = np.array([a[1] for a in AREAS], dtype=object)
+        self.area_center = np.array([(a[2], a[3]) for a in AREAS])
+        self.area_weights = _weights([a[4] for a in AREAS])
+        self.crime_code = np.array([c[0] for c in CRIMES])
+        self.crime_desc = np.array([c[1] for c in CRIMES], dtype=object)
+        self.crime_part = np.array([c[2] for c in CRIMES])
+        self.crime_weights = _weights([c[3] for c in CRIMES])
+        self.crime_weapon_rate = np.array([c[4] for c in CRIMES])
+        self.crime_victim = np.array([c[5] for c in CRIMES], dtype=object)
+        self.crime_vehicle = np.array(['VEHICLE' in c[1] for c in CRIMES])
+        self.premis_code = np.array([p[0] for p in PREMISES], dtype=np.float64)
+        self.premis_desc = np.array([p[1] for p in PREMISES], dtype=object)
+        self.premis_weights = _weights([p[2] for p in PREMISES])
+        self.premis_vehicle_weights = _weights([p[3] for p in PREMISES])
+        self.weapon_code = np.array([w[0] for w in WEAPONS], dtype=np.float64)
+        self.weapon_desc = np.array([w[1] for w in WEAPONS], dtype=object)
+        self.weapon_weights = _weights([w[2] for w in WEAPONS])
+        self.status_code = np.array([s[0] for s in STATUSES], dtype=object)
+        self.status_desc = np.array([s[1] for s in STATUSES], dtype=object)
+        self.status_weights = _weights([s[2] for s in STATUSES])
+        self.sex = np.array([s[0] for s in VICT_SEX], dtype=object)
+        self.sex_weights = _weights([s[1] for s in VICT_SEX])
+        self.descent = np.array([d[0] for d in VICT_DESCENT], dtype=object)
+        self.descent_weights = _weights([d[1] for d in VICT_DESCENT])
+        self.hour_weights = _weights(HOUR_WEIGHTS)
+
+        rng = np.random.default_rng(0)
+        self.locations = np.array([f'{number:>5} {street:<35} {kind}' for number, street, kind in zip(
+            rng.integers(1, 200, 20_000) * 100 + rng.integers(0, 100, 20_000),
+            rng.choice(STREETS, 20_000), rng.choice(STREET_TYPES, 20_000))], dtype=object)
+        self.mocodes = np.array([' '.join(f'{code:04d}' for code in rng.integers(100, 2100, rng.integers(1, 4)))
+                                 for _ in range(5_000)], dtype=object)
+
+
+def _inside_county(lon, lat):
+    import shapely
+    return shapely.contains_xy(shapely.Polygon(LA_COUNTY), lon, lat)
+
+
+def generate_chunk(n, rng, tables, first_row=0):
+    """``n`` incident rows in the LAPD export schema (dates as strings)."""
+    t = tables
+    day = rng.choice(len(t.days), n, p=t.day_weights)
+    # Most incidents are reported within days; a few months later
+    delay = rng.geometric(0.45, n) - 1
+    late = rng.random(n) < 0.04
+    delay[late] = rng.integers(30, 366, late.sum())
+    reported = np.minimum(day + delay, len(t.days) - 1)
+
+    hour = rng.choice(24, n, p=t.hour_weights)
+    minute = rng.integers(0, 60, n)
+    rounding = rng.random(n)
+    minute[rounding < 0.45] = 0
+    minute[(rounding >= 0.45) & (rounding < 0.57)] = 30
+    time_occ = hour * 100 + minute
+
+    area = rng.choice(len(t.area_code), n, p=t.area_weights)
+    crime = rng.choice(len(t.crime_code), n, p=t.crime_weights)
+    vehicle = t.crime_vehicle[crime]
+    premis = np.where(vehicle, rng.choice(len(t.premis_code), n, p=t.premis_vehicle_weights),
+                      rng.choice(len(t.premis_code), n, p=t.premis_weights))
+    has_weapon = rng.random(n) < t.crime_weapon_rate[crime]
+    weapon = rng.choice(len(t.weapon_code), n, p=t.weapon_weights)
+    status = rng.choice(len(t.status_code), n, p=t.status_weights)
+
+    victim = t.crime_victim[crime]
+    age = np.clip(np.round(rng.normal(38, 15, n)), 2, 99).astype(np.int64)
+    sex = t.sex[rng.choice(len(t.sex), n, p=t.sex_weights)]
+    descent = t.descent[rng.choice(len(t.descent), n, p=t.descent_weights)]
+    # Stolen vehicles and offenses against businesses record no victim person
+    no_person = (victim == 'none') | ((victim == 'business') & (rng.random(n) < 0.7))
+    age[no_person] = 0
+    sex[no_person] = np.where(victim[no_person] == 'business', 'X', None)
+    descent[no_person] = np.where(victim[no_person] == 'business', 'X', None)
+
+    lat = t.area_center[area, 0] + rng.normal(0, 0.022, n)
+    lon = t.area_center[area, 1] + rng.normal(0, 0.028, n)
+    outside = ~_inside_county(lon, lat)
+    lat[outside], lon[outside] = t.area_center[area[outside], 0], t.area_center[area[outside], 1]
+
+    # int64 before multiplying: the int32 years would overflow from 2022 on
+    year = t.days.year.to_numpy().astype(np.int64)[day]
+    dr_no = (year % 100) * MAX_ROWS + (first_row + np.arange(n)) % MAX_ROWS
+    if (dr_no <= 0).any() or len(np.unique(dr_no)) != n:
+        raise ValueError("Generated DR_NO values must be positive and unique")
+    df = pd.DataFrame({
+        'DR_NO': dr_no,
+        'Date Rptd': t.day_strings[reported],
+        'DATE OCC': t.day_strings[day],
+        'TIME OCC': time_occ,
+        'AREA': t.area_code[area],
+        'AREA NAME': t.area_name[area],
+        'Rpt Dist No': t.area_code[area] * 100 + rng.integers(0, 100, n),
+        'Part 1-2': t.crime_part[crime],
+        'Crm Cd': t.crime_code[crime],
+        'Crm Cd Desc': t.crime_desc[crime],
+        'Mocodes': np.where(rng.random(n) < 0.85, t.mocodes[rng.integers(0, len(t.mocodes), n)], None),
+        'Vict Age': age,
+        'Vict Sex': sex,
+        'Vict Descent': descent,
+        'Premis Cd': t.premis_code[premis],
+        'Premis Desc': t.premis_desc[premis],
+        'Weapon Used Cd': np.where(has_weapon, t.weapon_code[weapon], np.nan),
+        'Weapon Desc': np.where(has_weapon, t.weapon_desc[weapon], None),
+        'Status': t.status_code[status],
+        'Status Desc': t.status_desc[status],
+        'Crm Cd 1': t.crime_code[crime].astype(np.float64),
+        'Crm Cd 2': np.where(rng.random(n) < 0.07, 998.0, np.nan),
+        'Crm Cd 3': np.nan,
+        'Crm Cd 4': np.nan,
+        'LOCATION': t.locations[rng.integers(0, len(t.locations), n)],
+        'Cross Street': np.where(rng.random(n) < 0.15, t.locations[rng.integers(0, len(t.locations), n)], None),
+        'LAT': np.round(lat, 4),
+        'LON': np.round(lon, 4)
+    }, columns=COLUMNS)
+    return df, year
+
+
+def write_county_shapefile(output_dir):
+    """The simplified county outline, in the TIGER/Line county schema the map scripts filter on."""
+    import geopandas as gpd
+    from shapely.geometry import Polygon
+
+    path = os.path.join(output_dir, COUNTY_SHAPEFILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    gpd.GeoDataFrame({'STATEFP': ['06'], 'COUNTYFP': ['037'], 'COUNTYNS': ['00277283'], 'GEOID': ['06037'],
+                      'NAME': ['Los Angeles'], 'NAMELSAD': ['Los Angeles County']},
+                     geometry=[Polygon(LA_COUNTY)], crs='EPSG:4269').to_file(path)
+    return path
+
+
+def write_exports(rows, output_dir=OUTPUT_DIR, seed=42, chunk_rows=CHUNK_ROWS):
+    """Write ``rows`` synthetic incidents as the two LAPD export CSVs under ``output_dir/data``.
+
+    Returns the path of the generation manifest.
+    """
+    if rows > MAX_ROWS:
+        raise ValueError(f"At most {MAX_ROWS} rows fit the DR_NO numbering")
+    data_dir = os.path.join(output_dir, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    paths = {'2010': os.path.join(data_dir, EXPORT_2010), '2020': os.path.join(data_dir, EXPORT_2020)}
+    rng = np.random.default_rng(seed)
+    tables = _Tables()
+    start = time.perf_counter()
+    written = {'2010': 0, '2020': 0}
+
+    for first_row in range(0, rows, chunk_rows):
+        df, year = generate_chunk(min(chunk_rows, rows - first_row), rng, tables, first_row)
+        for export, part in (('2010', df[year < 2020]), ('2020', df[year >= 2020])):
+            # The 2010-2019 export names the area code column 'AREA ' (with a trailing space)
+            part = part.rename(columns={'AREA': 'AREA '}) if export == '2010' else part
+            part.to_csv(paths[export], mode='a' if first_row else 'w', header=not first_row, index=False)
+            written[export] += len(part)
+        logging.info(f"Wrote {first_row + len(df)}/{rows} rows ({time.perf_counter() - start:.1f}s)")
+
+    write_county_shapefile(output_dir)
+    manifest = {'rows': rows, 'seed': seed, 'generator_version': GENERATOR_VERSION, 'rows_per_export': written, 'start_date': START_DATE,
+                'end_date': END_DATE, 'seconds': round(time.perf_counter() - start, 1)}
+    # The manifest is written last so a partial dataset is never reused
+    manifest_path = os.path.join(output_dir, 'synthetic.json')
+    with open(manifest_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest_path
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Write synthetic LAPD crime exports')
+    parser.add_argument('--rows', default='1M', help='incidents to generate, e.g. 10k, 1M, 20M')
+    parser.add_argument('--output-dir', default=None, help=f'default: {OUTPUT_DIR}/<rows>')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    output_dir = args.output_dir or os.path.join(OUTPUT_DIR, args.rows)
+    manifest = write_exports(parse_rows(args.rows), output_dir, args.seed, args.chunk_rows)
+    print(f"Synthetic exports written under {output_dir} (manifest: {manifest})")
+
+
+if __name__ == '__main__':
+    main()
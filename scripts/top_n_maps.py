@@ -0,0 +1,205 @@
+"""3D maps of the top-N offense locations.
+
+The data is loaded once, every incident location is indexed once and the
+per-location counts are computed once per offense class. Any number of
+(N, offense class) variants are then rendered from those counts:
+
+    python top_n_maps.py --n 50 100 --offense part1 all
+"""
+import argparse
+import os
+import geopandas as gpd
+import pandas as pd
+import pydeck as pdk
+from location_index import LocationIndex
+from hex_layers import aggregated_layer
+from deck_html import save_deck
+from stage_trace import stage
+
+# Set your Mapbox API key
+MAPBOX_API_KEY = "<Your_MapBox_Api_Key>"
+os.environ['MAPBOX_ACCESS_TOKEN'] = MAPBOX_API_KEY
+
+# Offense class -> (label used in titles, slug used in file names)
+OFFENSE_CLASSES = {
+    'part1': ('Part I', 'part_I'),
+    'all': ('All', 'all')
+}
+
+COLOR_RANGE = [[35, 197, 82], [248, 79, 49]]
+
+# Title and legend injected into every map
+OVERLAY_TEMPLATE = """
+<div style="position: absolute; bottom: 10px; left: 50%; transform: translateX(-50%);
+            background-color: rgba(255, 255, 255, 0.8); padding: 10px; border-radius: 5px; text-align: center;">
+    <b>{title}</b>
+</div>
+<div style="position: absolute; top: 10px; left: 50%; transform: translateX(-50%);
+            background-color: rgba(255, 255, 255, 0.8); padding: 10px; border-radius: 5px; text-align: center;">
+    <b>Legend</b><br>
+    <span style="display: inline-block; width: 20px; height: 10px; background-color: #23C552;"></span> Less than {threshold}<br>
+    <span style="display: inline-block; width: 20px; height: 10px; background-color: #F84F31;"></span> More than {threshold}
+</div>
+"""
+
+
+def load_incidents(path='../data/processed_crime_data_2010_2023.gpkg'):
+    """Load the processed data as a DataFrame of coordinates and offense type."""
+    gdf = gpd.read_file(path)
+    return pd.DataFrame({
+        'year': gdf['DATE OCC'].dt.year,
+        'offense_type': gdf['Part 1-2'],
+        'latitude': gdf.geometry.y,
+        'longitude': gdf.geometry.x,
+        'count': 1
+    })
+
+
+def build_counts(df, offenses):
+    """Index all locations once and count each offense class per location.
+
+    Returns the index and a dict of offense -> (row mask, per-location counts).
+    """
+    index = LocationIndex(df['latitude'].to_numpy(), df['longitude'].to_numpy())
+    counts = {}
+    for offense in offenses:
+        if offense == 'all':
+            counts[offense] = (None, index.counts)
+        else:
+            is_part1 = (df['offense_type'] == 1).to_numpy()
+            counts[offense] = (is_part1, index.counts_where(is_part1))
+    return index, counts
+
+
+def render_top_n(df, index, rows, counts, n, offense, aggregate='browser', elevation_scale=None,
+                 output_dir='../maps'):
+    """Render one top-N map and return its statistics."""
+    label, slug = OFFENSE_CLASSES[offense]
+    # The original top 50 / top 100 maps used an elevation scale equal to N
+    elevation_scale = n if elevation_scale is None else elevation_scale
+
+    top = index.top_k(n, counts)
+    top_locations = index.locations(top, counts)
+
+    # Select the incidents at the top N locations with a row mask
+    mask = index.row_mask(top)
+    if rows is not None:
+        mask &= rows
+    df_top = df[mask]
+
+    # Create layers for visualization
+    if aggregate == 'browser':
+        hex_layer = pdk.Layer(
+            'HexagonLayer',
+            data=df_top,
+            get_position=['longitude', 'latitude'],
+            radius=200,
+            elevation_scale=elevation_scale,
+            elevation_range=[0, 1000],
+            pickable=True,
+            extruded=True,
+            coverage=1,
+            color_range=COLOR_RANGE,
+            aggregation='sum',
+        )
+        tooltip_html = '<b>Count:</b> {elevationValue}'
+    else:
+        # Only per-cell counts are written to the HTML
+        hex_layer = aggregated_layer(
+            df_top,
+            aggregate,
+            radius_m=200,
+            elevation_scale=elevation_scale,
+            color_range=COLOR_RANGE
+        )
+        tooltip_html = '<b>Count:</b> {count}'
+
+    # Add text layer for count numbers
+    text_layer = pdk.Layer(
+        'TextLayer',
+        data=top_locations,
+        get_position=['longitude', 'latitude'],
+        get_text='count',
+        get_size=16,
+        get_color=[0, 0, 0],  # Black text
+        get_angle=0,
+        pickable=True,
+        get_alignment_baseline='top',  # Position text above the bars
+        get_text_anchor='middle'
+    )
+
+    # Create view state
+    view_state = pdk.ViewState(
+        latitude=34.0522,
+        longitude=-118.2437,
+        zoom=10,
+        pitch=45,
+        bearing=0,
+        height=600,
+        width=800
+    )
+
+    # Create deck
+    r = pdk.Deck(
+        layers=[hex_layer, text_layer],
+        initial_view_state=view_state,
+        map_provider='mapbox',
+        map_style='mapbox://styles/mapbox/streets-v11',
+        api_keys={'mapbox': MAPBOX_API_KEY},
+        tooltip={
+            'html': tooltip_html,
+            'style': {
+                'backgroundColor': 'steelblue',
+                'color': 'white'
+            }
+        }
+    )
+
+    # Save visualization with the title and legend in one write
+    output_file = f'{output_dir}/la_top{n}_{slug}_offenses.html'
+    overlay = OVERLAY_TEMPLATE.format(
+        title=f'Top {n} {label} Offense Locations in Los Angeles',
+        threshold=2000
+    )
+    save_deck(r, output_file, overlay)
+
+    # Print statistics
+    print(f"\nTop {n} locations statistics:")
+    print(f"Total {label} offenses in top {n} locations: {len(df_top)}")
+    print("\nLocation distribution:")
+    print(top_locations.describe())
+    print(f"Saved {output_file}")
+    return top_locations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='3D maps of the top N offense locations')
+    parser.add_argument('--n', type=int, nargs='+', default=[50, 100],
+                        help='number of top locations; several values render several maps')
+    parser.add_argument('--offense', choices=list(OFFENSE_CLASSES), nargs='+', default=['part1', 'all'],
+                        help='offense classes to map')
+    parser.add_argument('--aggregate', choices=['browser', 'h3', 'hex'], default='browser',
+                        help="'browser' embeds every incident for HexagonLayer; 'h3' or 'hex' pre-aggregate "
+                             "to per-cell counts in Python")
+    parser.add_argument('--elevation-scale', type=float, default=None,
+                        help='column elevation scale (defaults to N)')
+    args = parser.parse_args(argv)
+
+    # Load the data and build the location counts once for every variant
+    with stage('read_gpkg') as s:
+        df = load_incidents()
+        s.rows = len(df)
+    with stage('build_counts', rows=len(df)):
+        index, counts = build_counts(df, args.offense)
+
+    for offense in args.offense:
+        rows, offense_counts = counts[offense]
+        for n in args.n:
+            with stage('render_top_n') as s:
+                top_locations = render_top_n(df, index, rows, offense_counts, n, offense, args.aggregate,
+                                             args.elevation_scale)
+                s.rows = len(top_locations)
+
+
+if __name__ == '__main__':
+    main()
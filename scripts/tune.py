@@ -0,0 +1,161 @@
+"""Successive-halving hyperparameter search for the Part I classifiers.
+
+Round 0 cross-validates many sampled configurations on a small stratified
+subsample of the training rows. Each following round keeps the best
+``1/factor`` of them and gives those ``factor`` times more rows, until one
+configuration is left or the full training split is used. Subsamples are
+nested, so a configuration promoted to the next round sees its previous rows
+plus new ones. The (configuration, fold) fits of every round run in one
+process pool of ``--n-jobs`` workers.
+
+    python tune.py --model gradient_boost [--candidates 81] [--min-rows 20000] [--factor 3]
+
+Writes the best configuration to ``../data/tuning/<model>_best.json`` and one
+row per evaluation (round, rows, parameters, ROC AUC, fit seconds summed
+over the folds, cumulative seconds) to ``../data/tuning/<model>_log.csv``.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+from imblearn.ensemble import BalancedRandomForestClassifier
+from imblearn.pipeline import make_pipeline
+from imblearn.under_sampling import RandomUnderSampler
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterSampler, train_test_split
+from sklearn.tree import DecisionTreeClassifier
+
+from cv_harness import cross_validate_many, effective_n_jobs
+from feature_store import load_arrays
+from sampling import stratified_order
+
+OUTPUT_DIR = '../data/tuning'
+
+# The settings the classifier scripts use are included in every space
+SEARCH_SPACES = {
+    'gradient_boost': {
+        'n_estimators': [50, 100, 200],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_depth': [3, 4, 5, 6, 8],
+        'subsample': [0.6, 0.8, 1.0],
+        'min_samples_leaf': [1, 20, 100]
+    },
+    'decision_tree': {
+        'max_depth': [None, 5, 8, 12, 16, 24],
+        'min_samples_leaf': [1, 5, 20, 100, 500],
+        'criterion': ['gini', 'entropy'],
+        'max_features': [None, 'sqrt']
+    },
+    'brf': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [None, 10, 20],
+        'min_samples_leaf': [1, 5, 20],
+        'max_features': ['sqrt', 0.5]
+    }
+}
+
+
+def make_estimator(model, params):
+    if model == 'gradient_boost':
+        # Same undersampling as gradient-boost-part-I.py, applied inside each fold
+        return make_pipeline(RandomUnderSampler(random_state=42),
+                             GradientBoostingClassifier(random_state=42, **params))
+    if model == 'decision_tree':
+        return DecisionTreeClassifier(random_state=42, **params)
+    return BalancedRandomForestClassifier(random_state=42, **params)
+
+
+def successive_halving(model, X, y, pool, medians, n_candidates=81, min_rows=20_000, factor=3, cv=3,
+                       n_jobs=-1, random_state=42):
+    """Search over subsamples of the rows ``pool`` of ``X`` and ``y``.
+
+    ``X`` may be the memory-mapped feature matrix; only the rows of each
+    round are read. All rounds submit their (candidate, fold) fits to one
+    pool of ``n_jobs`` processes. Returns the evaluation log as a DataFrame.
+    """
+    order = pool[stratified_order(y[pool], random_state)]
+    candidates = list(ParameterSampler(SEARCH_SPACES[model], n_candidates, random_state=random_state))
+    log = []
+    start = time.perf_counter()
+
+    n_jobs = effective_n_jobs(n_jobs, len(candidates) * cv)
+    with ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else nullcontext() as executor:
+        for round_ in range(math.ceil(math.log(n_candidates, factor)) + 1):
+            n_rows = min(min_rows * factor ** round_, len(pool))
+            rows = np.sort(order[:n_rows])
+            X_round = np.asarray(X[rows])
+            X_round = np.where(np.isnan(X_round), medians, X_round)
+            y_round = y[rows]
+            logging.info(f"Round {round_}: {len(candidates)} candidates on {n_rows} rows, {n_jobs} processes")
+
+            estimators = [make_estimator(model, params) for params in candidates]
+            results = cross_validate_many(estimators, X_round, y_round, cv=cv, executor=executor)
+            scores = []
+            for params, result in zip(candidates, results):
+                fold_scores = result.scores(roc_auc_score, proba=True)
+                scores.append(fold_scores.mean())
+                log.append({'round': round_, 'rows': n_rows, 'params': json.dumps(params, sort_keys=True),
+                            'roc_auc': fold_scores.mean(), 'roc_auc_std': fold_scores.std(),
+                            'seconds': sum(result.seconds),
+                            'cumulative_seconds': time.perf_counter() - start})
+                logging.info(f"  {params}: ROC AUC {fold_scores.mean():.4f} ({log[-1]['seconds']:.1f}s)")
+
+            if len(candidates) == 1 or n_rows == len(pool):
+                break
+            keep = max(1, math.ceil(len(candidates) / factor))
+            candidates = [candidates[i] for i in np.argsort(scores, kind='stable')[::-1][:keep]]
+
+    return pd.DataFrame(log)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Successive-halving search over stratified subsamples')
+    parser.add_argument('--model', choices=list(SEARCH_SPACES), default='gradient_boost')
+    parser.add_argument('--candidates', type=int, default=81, help='configurations sampled for round 0')
+    parser.add_argument('--min-rows', type=int, default=20_000, help='rows per configuration in round 0')
+    parser.add_argument('--factor', type=int, default=3, help='keep 1/factor per round, with factor times the rows')
+    parser.add_argument('--cv', type=int, default=3)
+    parser.add_argument('--n-jobs', type=int, default=-1, help='processes shared by all fits (-1 uses all cores)')
+    parser.add_argument('--random-state', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    X, y, manifest = load_arrays()
+    # Tune on the training split only; the scripts keep the same 20% for testing
+    train_rows, _ = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42)
+    medians = np.asarray(manifest['medians'], dtype=np.float32)
+
+    log = successive_halving(args.model, X, y, np.sort(train_rows), medians, args.candidates,
+                             args.min_rows, args.factor, args.cv, args.n_jobs, args.random_state)
+
+    last_round = log[log['round'] == log['round'].max()]
+    best = last_round.loc[last_round['roc_auc'].idxmax()]
+    summary = {
+        'model': args.model,
+        'params': json.loads(best['params']),
+        'roc_auc': float(best['roc_auc']),
+        'rows': int(best['rows']),
+        'evaluations': len(log),
+        'seconds': float(log['cumulative_seconds'].max())
+    }
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    log.to_csv(os.path.join(OUTPUT_DIR, f'{args.model}_log.csv'), index=False)
+    with open(os.path.join(OUTPUT_DIR, f'{args.model}_best.json'), 'w') as file:
+        json.dump(summary, file, indent=2)
+
+    print(log.groupby(['round', 'rows']).agg(candidates=('roc_auc', 'size'), best_roc_auc=('roc_auc', 'max'),
+                                             seconds=('seconds', 'sum')).to_string())
+    print(f"Best configuration: {summary['params']} (ROC AUC {summary['roc_auc']:.4f} on {summary['rows']} rows)")
+
+
+if __name__ == '__main__':
+    main()